@@ -0,0 +1,182 @@
+import argparse
+import importlib.util
+import os
+import threading
+import time
+
+import numpy as np
+
+# Inference backend selection
+# pytorch | onnx | onnx_int8 | openvino | auto (fastest installed FP32 runtime on CPU, pytorch on GPU)
+INFERENCE_BACKEND = os.getenv("INFERENCE_BACKEND", "pytorch").lower()
+EXPORT_IMGSZ = int(os.getenv("EXPORT_IMGSZ", "640"))
+# Post-training INT8 calibration (onnx_int8, see quantize.py)
+CALIBRATION_IMAGES = int(os.getenv("CALIBRATION_IMAGES", "100"))
+CALIBRATION_METHOD = os.getenv("CALIBRATION_METHOD", "minmax") # minmax | entropy | percentile
+BACKENDS = ("pytorch", "onnx", "onnx_int8", "openvino")
+
+# Runtime package each exported format needs at inference time
+RUNTIMES = {"onnx": "onnxruntime", "onnx_int8": "onnxruntime", "openvino": "openvino"}
+
+_export_lock = threading.RLock()
+
+
+def runtime_available(backend):
+    if backend == "pytorch":
+        return True
+    return importlib.util.find_spec(RUNTIMES[backend]) is not None
+
+
+def resolve_backend(backend=INFERENCE_BACKEND):
+    """Maps the configured name to a concrete backend ("auto" picks the fastest installed one)."""
+    backend = (backend or "pytorch").lower()
+    if backend == "auto":
+        import torch
+        if torch.cuda.is_available():
+            return "pytorch" # Exports here target CPU servers
+        for candidate in ("openvino", "onnx"):
+            if runtime_available(candidate):
+                return candidate
+        return "pytorch"
+    if backend not in BACKENDS:
+        print(f"Unknown INFERENCE_BACKEND '{backend}', using pytorch")
+        return "pytorch"
+    return backend
+
+
+def export_path(model_path, backend):
+    """Where ultralytics writes the export of model_path (next to the weights)."""
+    stem = os.path.splitext(model_path)[0]
+    if backend == "onnx":
+        return stem + ".onnx"
+    if backend == "onnx_int8":
+        return stem + "_int8.onnx"
+    if backend == "openvino":
+        return stem + "_openvino_model"
+    return model_path
+
+
+def export_settings(backend):
+    """Everything besides the .pt weights that the model run by `backend` depends on (for cache keys)."""
+    if backend in (None, "pytorch"):
+        return {"backend": backend}
+    settings = {"backend": backend, "imgsz": EXPORT_IMGSZ, "dynamic": True}
+    if backend == "onnx_int8":
+        settings.update(calibration_images=CALIBRATION_IMAGES, calibration_method=CALIBRATION_METHOD)
+    return settings
+
+
+def ensure_export(model_path, backend, imgsz=EXPORT_IMGSZ):
+    """
+    Exports the .pt weights to `backend` once and reuses the result while it
+    is newer than the weights. Dynamic axes, so the scheduler can batch any
+    number of frames and tiles of any size.
+    """
+    if backend == "pytorch":
+        return model_path
+    target = export_path(model_path, backend)
+    with _export_lock:
+        if backend == "onnx_int8":
+            try:
+                from backend.app.quantize import ensure_int8
+            except ImportError:
+                from .quantize import ensure_int8
+            return ensure_int8(model_path, imgsz=imgsz)
+        if os.path.exists(target) and os.path.getmtime(target) >= os.path.getmtime(model_path):
+            return target
+        from ultralytics import YOLO
+        print(f"Exporting {model_path} to {backend} (one-off)...")
+        started = time.perf_counter()
+        exported = YOLO(model_path).export(format=backend, imgsz=imgsz, dynamic=True, device="cpu", verbose=False)
+        print(f"Exported {exported} in {time.perf_counter() - started:.1f}s")
+        return str(exported)
+
+
+def load_model(model_path, backend=INFERENCE_BACKEND):
+    """
+    Loads a YOLO model on the requested backend. Exported models are still
+    ultralytics YOLO objects, so predict() - and with it the scheduler,
+    TrackSession and all counting code - works unchanged. Falls back to
+    PyTorch when the runtime is missing or the export fails.
+    Returns (model, backend actually used).
+    """
+    from ultralytics import YOLO
+    backend = resolve_backend(backend)
+    if backend != "pytorch":
+        if not runtime_available(backend):
+            print(f"{RUNTIMES[backend]} is not installed, using pytorch")
+        else:
+            try:
+                return YOLO(ensure_export(model_path, backend), task="detect"), backend
+            except Exception as e:
+                print(f"Error loading {backend} backend, using pytorch: {e}")
+    return YOLO(model_path), "pytorch"
+
+
+# --- Benchmark ---
+
+def load_frames(source=None, count=50, size=(1280, 720)):
+    """Frames from a video file, or random noise (latency only, no detections) without one."""
+    if source:
+        import cv2
+        cap = cv2.VideoCapture(source)
+        frames = []
+        while len(frames) < count:
+            ok, frame = cap.read()
+            if not ok:
+                break
+            frames.append(frame)
+        cap.release()
+        if frames:
+            return frames
+        print(f"Could not read frames from {source}, using random frames")
+    rng = np.random.default_rng(0)
+    return [rng.integers(0, 255, (size[1], size[0], 3), dtype=np.uint8) for _ in range(count)]
+
+
+def benchmark(model, frames, batch=1, warmup=3, **params):
+    """Per-frame latency of model.predict() in ms: mean / p50 / p95 over all batches."""
+    params = dict(dict(conf=0.25, classes=[0], verbose=False), **params)
+    for i in range(min(warmup, len(frames))):
+        model.predict(frames[i], **params)
+    per_frame = []
+    for i in range(0, len(frames), batch):
+        chunk = frames[i:i + batch]
+        started = time.perf_counter()
+        model.predict(chunk, **params)
+        per_frame.append((time.perf_counter() - started) * 1000 / len(chunk))
+    per_frame = np.array(per_frame)
+    return {
+        "batch": batch,
+        "frames": len(frames),
+        "mean_ms": round(float(per_frame.mean()), 1),
+        "p50_ms": round(float(np.percentile(per_frame, 50)), 1),
+        "p95_ms": round(float(np.percentile(per_frame, 95)), 1),
+        "fps": round(1000 / float(per_frame.mean()), 1),
+    }
+
+
+def main(argv=None):
+    models_dir = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "models")
+    parser = argparse.ArgumentParser(description="Export the detector and compare per-frame latency across backends")
+    parser.add_argument("--model", default=os.path.join(models_dir, "sacks_custom.pt"))
+    parser.add_argument("--backends", default=",".join(BACKENDS))
+    parser.add_argument("--source", help="Video file to take frames from (default: random frames)")
+    parser.add_argument("--frames", type=int, default=50)
+    parser.add_argument("--batch", type=int, nargs="+", default=[1, 4])
+    args = parser.parse_args(argv)
+
+    frames = load_frames(args.source, args.frames)
+    print(f"{'backend':<10} {'batch':>5} {'mean ms':>8} {'p50 ms':>8} {'p95 ms':>8} {'fps':>7}")
+    for name in args.backends.split(","):
+        model, used = load_model(args.model, name.strip())
+        if used != name.strip():
+            print(f"{name:<10} skipped (not available)")
+            continue
+        for batch in args.batch:
+            r = benchmark(model, frames, batch)
+            print(f"{used:<10} {batch:>5} {r['mean_ms']:>8} {r['p50_ms']:>8} {r['p95_ms']:>8} {r['fps']:>7}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,346 @@
+import argparse
+import json
+import os
+import platform
+import statistics
+import sys
+import tempfile
+import time
+
+import cv2
+import numpy as np
+import torch
+import torchvision # noqa: F401 (registers torch.ops.torchvision.nms; model loading does it in the app)
+from ultralytics.engine.results import Results
+
+try:
+    from backend.app.cameras import CameraRegistry
+    from backend.app.planner import available_cpus
+    from backend.app.quantize import BACKEND_DIR
+    from backend.app.tracking import TrackSession
+    from backend.app.tracker import (JuteBagTracker, tiling_params, tile_regions, enhance_tiles, merge_tiles,
+                                     dedup_centroids, filter_boxes)
+    from backend.app.zone_tracker import ModularZoneTracker
+except ImportError:
+    from .cameras import CameraRegistry
+    from .planner import available_cpus
+    from .quantize import BACKEND_DIR
+    from .tracking import TrackSession
+    from .tracker import (JuteBagTracker, tiling_params, tile_regions, enhance_tiles, merge_tiles, dedup_centroids,
+                          filter_boxes)
+    from .zone_tracker import ModularZoneTracker
+
+# Micro-benchmarks of the tracking hot paths: a stub detector, no weights, CPU only
+BENCH_BASELINE = os.getenv("BENCH_BASELINE", os.path.join(BACKEND_DIR, "data", "bench_baseline.json"))
+BENCH_TOLERANCE = float(os.getenv("BENCH_TOLERANCE", "0.25")) # --check fails a stage this much slower
+BENCH_MIN_DELTA_MS = float(os.getenv("BENCH_MIN_DELTA_MS", "0.05")) # Smaller slowdowns are timer noise
+BENCH_GROUPS = ("tiling", "zone", "video", "live")
+UNCHECKED_STAGES = {"tiling.stub_inference"} # Time spent in the stub itself, reported for reference only
+BENCH_FPS = 25
+
+
+class SyntheticScene:
+    """
+    `density` sacks crossing the frame left to right at `speed` px/frame
+    (wrapping around), at fixed rows and sizes drawn from `seed`. Same
+    arguments -> same boxes and pixels at every frame t.
+    """
+    def __init__(self, width=1280, height=720, density=20, speed=12.0, seed=0):
+        rng = np.random.default_rng(seed)
+        self.width = width
+        self.height = height
+        self.speed = speed
+        self.w = rng.uniform(0.05, 0.09, density) * width
+        self.h = self.w / rng.uniform(1.1, 2.0, density) # Landscape, like a sack lying on a belt
+        self.span = width + 2 * self.w.max() # Sacks leave the frame completely before wrapping
+        self.x0 = rng.uniform(0, self.span, density)
+        self.cy = rng.uniform(0.2, 0.8, density) * height
+        self.conf = rng.uniform(0.35, 0.95, density).astype(np.float32)
+        self.background = rng.integers(40, 90, (height, width, 3), dtype=np.uint8)
+
+    def boxes(self, t):
+        """(N, 5) xyxy + conf of the sacks at least partly in view at frame t."""
+        cx = (self.x0 + self.speed * t) % self.span - self.w.max()
+        xyxy = np.stack([cx - self.w / 2, self.cy - self.h / 2, cx + self.w / 2, self.cy + self.h / 2], axis=1)
+        visible = (xyxy[:, 2] > 0) & (xyxy[:, 0] < self.width)
+        return np.concatenate([xyxy, self.conf[:, None]], axis=1)[visible].astype(np.float32)
+
+    def frame(self, t):
+        frame = self.background.copy()
+        for x1, y1, x2, y2, _ in self.boxes(t):
+            cv2.rectangle(frame, (int(x1), int(y1)), (int(x2), int(y2)), (150, 190, 205), -1)
+            cv2.rectangle(frame, (int(x1), int(y1)), (int(x2), int(y2)), (60, 90, 110), 2)
+        return frame
+
+
+class StubDetector:
+    """
+    Stands in for the YOLO model: predict() returns real ultralytics Results
+    holding the scene's boxes at time t. Each image is one frame, and t
+    advances after it. With `regions` set to the tile layout, consecutive
+    images are the tiles of one frame, in order (the scheduler may split
+    them over several calls). A tile sees the sacks that are mostly inside
+    it, in tile coordinates and slightly jittered, so cross-tile NMS and the
+    centroid dedup get the duplicates a real detector produces.
+    """
+    names = {0: "sack"}
+
+    def __init__(self, scene, jitter=2.0):
+        self.scene = scene
+        self.jitter = jitter
+        self.regions = None
+        self.t = 0
+        self._tile = 0
+
+    def seek(self, t):
+        """Next image is (the first tile of) frame t."""
+        self.t = t
+        self._tile = 0
+
+    def _detect(self, image, region, index):
+        rx1, ry1, rx2, ry2 = region
+        boxes = self.scene.boxes(self.t)
+        clipped = boxes[:, :4].copy()
+        clipped[:, [0, 2]] = clipped[:, [0, 2]].clip(rx1, rx2)
+        clipped[:, [1, 3]] = clipped[:, [1, 3]].clip(ry1, ry2)
+        area = (boxes[:, 2] - boxes[:, 0]) * (boxes[:, 3] - boxes[:, 1])
+        seen = (clipped[:, 2] - clipped[:, 0]) * (clipped[:, 3] - clipped[:, 1]) >= 0.5 * area
+        xyxy = clipped[seen] - np.array([rx1, ry1, rx1, ry1], dtype=np.float32)
+        if self.jitter and len(xyxy):
+            rng = np.random.default_rng((self.t, index))
+            xyxy += rng.uniform(-self.jitter, self.jitter, xyxy.shape).astype(np.float32)
+        # The tile image may be resized relative to its region
+        scale_x = image.shape[1] / (rx2 - rx1)
+        scale_y = image.shape[0] / (ry2 - ry1)
+        xyxy *= np.array([scale_x, scale_y, scale_x, scale_y], dtype=np.float32)
+        data = np.concatenate([xyxy, boxes[seen, 4:5], np.zeros((len(xyxy), 1), np.float32)], axis=1)
+        return data
+
+    def predict(self, source, conf=0.25, **kwargs):
+        images = source if isinstance(source, list) else [source]
+        results = []
+        for image in images:
+            if self.regions:
+                region = self.regions[self._tile]
+                data = self._detect(image, region, self._tile)
+                self._tile += 1
+            else:
+                data = self._detect(image, (0, 0, self.scene.width, self.scene.height), 0)
+            data = data[data[:, 4] >= conf]
+            results.append(Results(image, "synthetic", self.names, boxes=torch.from_numpy(data)))
+            if not self.regions or self._tile == len(self.regions):
+                self.seek(self.t + 1)
+        return results
+
+
+def clock(totals, stage, fn, *args):
+    """fn(*args), adding its wall time to totals[stage]."""
+    started = time.perf_counter()
+    result = fn(*args)
+    totals[stage] = totals.get(stage, 0.0) + time.perf_counter() - started
+    return result
+
+
+def tracked_columns(result):
+    """(xywh, track IDs, classes) of a tracked Results, as process_video reads them."""
+    if result.boxes.id is None:
+        return [], [], []
+    return result.boxes.xywh.cpu().numpy(), result.boxes.id.int().cpu().tolist(), result.boxes.cls.int().cpu().tolist()
+
+
+def bench_tiling(scene, stub, frames, strict=False):
+    """Each step of detect_with_tiling on its own, then the whole call (through the scheduler)."""
+    tracker = JuteBagTracker(None)
+    tracker.model = stub
+    params = tiling_params(strict)
+    width, height = scene.width, scene.height
+    stub.regions = tile_regions(width, height, params["layout"])
+    totals, counts = {}, {"raw": 0, "nms": 0, "dedup": 0, "kept": 0}
+    for t in range(frames):
+        frame = scene.frame(t)
+        stub.seek(t)
+        tile_imgs, tile_offsets = clock(totals, "tiling.crop_enhance", enhance_tiles, frame, stub.regions)
+        tile_results = clock(totals, "tiling.stub_inference", lambda: stub.predict(tile_imgs, conf=params["conf"]))
+        counts["raw"] += sum(len(r.boxes) for r in tile_results)
+        merged = clock(totals, "tiling.nms", merge_tiles, tile_offsets, tile_results, params["nms"])
+        if merged is not None:
+            counts["nms"] += len(merged[0])
+            deduped = clock(totals, "tiling.dedup", dedup_centroids, *merged, params["dedup"])
+            counts["dedup"] += len(deduped)
+            if deduped:
+                kept = clock(totals, "tiling.filter", filter_boxes, torch.stack(deduped), width, height, strict)
+                counts["kept"] += len(kept)
+        stub.seek(t)
+        clock(totals, "tiling.total", tracker.detect_with_tiling, frame, strict)
+    stub.regions = None
+    return totals, {f"boxes_{k}": round(v / frames, 1) for k, v in counts.items()}
+
+
+def bench_zone(scene, stub, frames):
+    """ModularZoneTracker per frame: ByteTrack update, counting state, annotation."""
+    zone = ModularZoneTracker(None)
+    zone.reset_state()
+    x1, y1 = zone.set_roi(scene.width, scene.height)
+    session = TrackSession(frame_rate=BENCH_FPS)
+    ids_confirmed_inside = set()
+    totals = {}
+    stub.seek(0)
+    for t in range(frames):
+        frame = scene.frame(t)
+        result = stub.predict(frame, **zone.infer_params)[0]
+        tracked = clock(totals, "zone.track", session.track, result)
+        marks = clock(totals, "zone.count", lambda: zone.count_frame(*tracked_columns(tracked), t, scene.width,
+                                                                     scene.height, ids_confirmed_inside))
+        clock(totals, "zone.annotate", zone.draw_frame, frame, marks, t, scene.width, x1, y1)
+    return totals, {"zone_count": zone.total_count}
+
+
+def bench_video(scene, stub, frames):
+    """ModularZoneTracker.process_video end to end on a synthetic clip (decode, track, count, draw, encode)."""
+    zone = ModularZoneTracker(None)
+    zone.model = stub
+    with tempfile.TemporaryDirectory() as tmp:
+        source = os.path.join(tmp, "synthetic.mp4")
+        writer = cv2.VideoWriter(source, cv2.VideoWriter_fourcc(*"mp4v"), BENCH_FPS, (scene.width, scene.height))
+        for t in range(frames):
+            writer.write(scene.frame(t))
+        writer.release()
+        stub.seek(0)
+        totals = {}
+        result = clock(totals, "video.process_video", zone.process_video, source, os.path.join(tmp, "out.mp4"))
+    return totals, {"video_status": result["status"], "video_count": result["count"]}
+
+
+def bench_live(scene, stub, frames):
+    """One camera through the registry's inference pass: motion gate, inference call, tracking, counting, overlay, JPEG."""
+    tracker = JuteBagTracker(None)
+    tracker.model = stub
+    registry = CameraRegistry(lambda: tracker)
+    camera = registry.add("bench", None) # Never started: frames are handed in directly
+    stub.seek(0)
+    totals = {}
+    for t in range(frames):
+        frame = scene.frame(t)
+        clock(totals, "live.camera_frame", registry._process, [(camera, frame)])
+    return totals, {"live_count": camera.total_count}
+
+
+BENCHES = {"tiling": bench_tiling, "zone": bench_zone, "video": bench_video, "live": bench_live}
+
+
+def environment():
+    """What the numbers depend on besides the code: a baseline only compares well on the same setup."""
+    return {
+        "machine": platform.machine(),
+        "processor": platform.processor(),
+        "cpus": len(available_cpus()),
+        "python": platform.python_version(),
+        "torch": torch.__version__,
+        "opencv": cv2.__version__,
+        "numpy": np.__version__,
+    }
+
+
+def run(frames=60, width=1280, height=720, density=20, speed=12.0, repeat=3, groups=BENCH_GROUPS, seed=0):
+    """ms/frame of every stage (median over `repeat` runs) plus what the stub produced."""
+    scene = SyntheticScene(width, height, density, speed, seed)
+    stub = StubDetector(scene)
+    runs, info = {}, {}
+    for group in groups:
+        for _ in range(repeat):
+            totals, info_group = BENCHES[group](scene, stub, frames)
+            for stage, seconds in totals.items():
+                runs.setdefault(stage, []).append(seconds)
+            info.update(info_group)
+    return {
+        "params": {"frames": frames, "size": f"{width}x{height}", "density": density, "speed": speed, "seed": seed},
+        "environment": environment(),
+        "stages": {stage: round(1000 * statistics.median(s) / frames, 3) for stage, s in runs.items()},
+        "info": info,
+    }
+
+
+def compare(report, baseline, tolerance=BENCH_TOLERANCE, min_delta_ms=BENCH_MIN_DELTA_MS):
+    """(stage, baseline ms, ms, change) for stages slower than baseline * (1 + tolerance)."""
+    regressions = []
+    for stage, ms in report["stages"].items():
+        base = baseline["stages"].get(stage)
+        if stage in UNCHECKED_STAGES or not base:
+            continue
+        if ms > base * (1 + tolerance) and ms - base > min_delta_ms:
+            regressions.append((stage, base, ms, ms / base - 1))
+    return regressions
+
+
+def print_report(report, baseline=None):
+    print(f"{'stage':28} {'ms/frame':>10} {'baseline':>10} {'change':>8}")
+    for stage, ms in report["stages"].items():
+        base = baseline["stages"].get(stage) if baseline else None
+        change = f"{100 * (ms / base - 1):+.0f}%" if base else ""
+        print(f"{stage:28} {ms:>10.3f} {base if base is not None else '':>10} {change:>8}")
+    print(" ".join(f"{k}={v}" for k, v in report["info"].items()))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the tracking hot paths with a stub detector (CPU, no weights)")
+    parser.add_argument("--frames", type=int, default=60)
+    parser.add_argument("--size", default="1280x720", help="Frame size WxH")
+    parser.add_argument("--density", type=int, default=20, help="Sacks in the scene")
+    parser.add_argument("--speed", type=float, default=12.0, help="Sack motion (px/frame)")
+    parser.add_argument("--repeat", type=int, default=3, help="Runs per stage; the median is reported")
+    parser.add_argument("--only", default=",".join(BENCH_GROUPS), help=f"Stage groups ({', '.join(BENCH_GROUPS)})")
+    parser.add_argument("--threads", type=int, default=1, help="torch / OpenCV threads (1: steadiest numbers)")
+    parser.add_argument("--baseline", default=BENCH_BASELINE)
+    parser.add_argument("--save-baseline", action="store_true", help="Store this run as the baseline")
+    parser.add_argument("--check", action="store_true",
+                        help=f"Exit 1 if a stage is over {BENCH_TOLERANCE:.0%} slower than the baseline")
+    parser.add_argument("--tolerance", type=float, default=BENCH_TOLERANCE)
+    parser.add_argument("--output", help="Also write this run as JSON")
+    args = parser.parse_args(argv)
+
+    torch.set_num_threads(args.threads)
+    cv2.setNumThreads(args.threads)
+    width, height = (int(v) for v in args.size.lower().split("x"))
+    groups = [g for g in args.only.split(",") if g]
+    unknown = set(groups) - set(BENCHES)
+    if unknown:
+        parser.error(f"unknown stage group(s): {', '.join(sorted(unknown))}")
+
+    report = run(args.frames, width, height, args.density, args.speed, args.repeat, groups)
+    report["environment"]["threads"] = args.threads
+
+    baseline = None
+    if os.path.exists(args.baseline) and not args.save_baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+    print_report(report, baseline)
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+    if args.save_baseline:
+        os.makedirs(os.path.dirname(os.path.abspath(args.baseline)), exist_ok=True)
+        with open(args.baseline, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"Baseline saved to {args.baseline}")
+        return 0
+    if not args.check:
+        return 0
+    if baseline is None:
+        print(f"No baseline at {args.baseline}; run with --save-baseline first")
+        return 2
+    if baseline["params"] != report["params"]:
+        print(f"Baseline was recorded with {baseline['params']}; rerun with the same settings")
+        return 2
+    if baseline["environment"] != report["environment"]:
+        print("Warning: baseline comes from a different machine / library versions; timings may not compare")
+    regressions = compare(report, baseline, args.tolerance)
+    for stage, base, ms, change in regressions:
+        print(f"REGRESSION {stage}: {base:.3f} -> {ms:.3f} ms/frame ({change:+.0%})")
+    if not regressions:
+        print(f"No stage more than {args.tolerance:.0%} slower than the baseline")
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,361 @@
+import os
+import threading
+import time
+
+import cv2
+
+from .capture import FrameGrabber
+from .live_state import LiveCountState
+from .live_stream import FrameBroadcaster, LIVE_JPEG_QUALITY
+from .motion import MotionGate, MOTION_GATE_ENABLED
+from .scheduler import infer, LIVE
+from .tracking import TrackSession, xyxy_to_xywh
+
+# "id=source" pairs: webcam index, RTSP/HTTP URL, or file:<path> (looped, for testing)
+CAMERA_SOURCES = os.getenv("CAMERA_SOURCES", "default=0")
+DEFAULT_CAMERA_ID = os.getenv("DEFAULT_CAMERA_ID", "default")
+MAX_CAMERA_BATCH = int(os.getenv("MAX_CAMERA_BATCH", "8")) # Frames per batched forward pass
+
+# Detection thresholds of the live path (lower conf than video jobs, no TTA for speed)
+LIVE_CONF = 0.3
+LIVE_IOU = 0.6
+
+
+def parse_camera_sources(spec: str):
+    """'dock=0,yard=rtsp://host/stream,test=file:videos/a.mp4' -> [(id, source)]"""
+    sources = []
+    for item in (spec or "").split(","):
+        item = item.strip()
+        if not item:
+            continue
+        camera_id, sep, source = item.partition("=")
+        if not sep:
+            camera_id, source = f"cam{len(sources)}", item
+        sources.append((camera_id.strip(), source.strip()))
+    return sources
+
+
+class LoopingFileCapture:
+    """Plays a local video file forever at its native frame rate (test cameras)."""
+    def __init__(self, path: str):
+        self.cap = cv2.VideoCapture(path)
+        fps = self.cap.get(cv2.CAP_PROP_FPS) or 25
+        self.interval = 1.0 / fps
+        self._next_due = time.perf_counter()
+
+    def isOpened(self):
+        return self.cap.isOpened()
+
+    def set(self, prop, value):
+        return self.cap.set(prop, value)
+
+    def read(self):
+        # Pace like a real camera instead of decoding as fast as possible
+        delay = self._next_due - time.perf_counter()
+        if delay > 0:
+            time.sleep(delay)
+        self._next_due = max(self._next_due + self.interval, time.perf_counter())
+
+        success, frame = self.cap.read()
+        if not success:
+            self.cap.set(cv2.CAP_PROP_POS_FRAMES, 0)
+            success, frame = self.cap.read()
+        return success, frame
+
+    def release(self):
+        self.cap.release()
+
+
+def open_source(source):
+    """Opens a webcam index, a stream URL, or a looping local file."""
+    source = str(source)
+    if source.isdigit():
+        return cv2.VideoCapture(int(source))
+    if source.startswith("file:"):
+        return LoopingFileCapture(source[len("file:"):])
+    if os.path.isfile(source):
+        return LoopingFileCapture(source)
+    return cv2.VideoCapture(source) # RTSP / HTTP
+
+
+class Camera:
+    """One live source: capture worker, per-camera track/count state and its MJPEG output."""
+    def __init__(self, camera_id: str, source, on_frame=None):
+        self.camera_id = camera_id
+        self.source = source
+        self.on_frame = on_frame
+        self.broadcaster = FrameBroadcaster()
+        self.motion_gate = MotionGate() if MOTION_GATE_ENABLED else None
+        self.session = None # Created on first inference (needs ultralytics)
+
+        # Per-camera Counting State
+        self.live_counts = LiveCountState()
+        self.total_count = 0
+        self.last_detections = []
+        self.last_boxes = []
+
+        self.cap = None
+        self.grabber = None
+        self.last_seq = 0
+        self.frames_processed = 0
+        self.fps = 0.0
+        self.error = None
+        self._window_start, self._window_frames = time.perf_counter(), 0
+
+    @property
+    def active(self):
+        return self.grabber is not None and not self.grabber.failed
+
+    def start(self):
+        if self.grabber is not None:
+            return True
+        self.cap = open_source(self.source)
+        if not self.cap.isOpened():
+            self.error = f"Could not open source {self.source}"
+            self.cap.release()
+            self.cap = None
+            return False
+        self.error = None
+        self.last_seq = 0
+        self.grabber = FrameGrabber(self.cap, name=f"capture-{self.camera_id}", on_frame=self.on_frame).start()
+        print(f"Camera {self.camera_id} started ({self.source})")
+        return True
+
+    def stop(self):
+        if self.grabber is not None:
+            self.grabber.stop()
+            self.grabber = None
+        if self.cap is not None:
+            self.cap.release()
+            self.cap = None
+        print(f"Camera {self.camera_id} stopped")
+
+    def mark_published(self):
+        self.frames_processed += 1
+        self._window_frames += 1
+        elapsed = time.perf_counter() - self._window_start
+        if elapsed >= 1.0:
+            self.fps = self._window_frames / elapsed
+            self._window_start, self._window_frames = time.perf_counter(), 0
+
+    def tracking_session(self):
+        if self.session is None:
+            self.session = TrackSession()
+        return self.session
+
+    def reset_counts(self):
+        self.live_counts.reset()
+        self.total_count = 0
+        self.last_detections = []
+        self.last_boxes = []
+        if self.session is not None:
+            self.session.reset()
+        if self.motion_gate is not None:
+            self.motion_gate.reset()
+
+    def stats(self):
+        return {
+            "camera_id": self.camera_id,
+            "source": str(self.source),
+            "active": self.active,
+            "count": self.total_count,
+            "frames_processed": self.frames_processed,
+            "fps": round(self.fps, 2),
+            "subscribers": self.broadcaster.subscribers,
+            "error": self.error,
+            "live_state": self.live_counts.stats(),
+            "capture": self.grabber.stats() if self.grabber else None,
+            "motion_gate": self.motion_gate.stats() if self.motion_gate else None,
+        }
+
+
+class CameraRegistry:
+    """
+    Registry of live cameras plus the single inference loop serving them.
+    Each camera has its own capture thread; the loop gathers the newest
+    frame of every camera that produced one and runs a single batched
+    forward pass over them, then updates each camera's own ByteTrack
+    session and count, and publishes one encoded JPEG per camera.
+    """
+    def __init__(self, get_tracker, max_batch=MAX_CAMERA_BATCH, jpeg_quality=LIVE_JPEG_QUALITY, on_count=None):
+        self.get_tracker = get_tracker
+        self.on_count = on_count # on_count(camera_id, n) for every batch of newly counted bags
+        self.max_batch = max_batch
+        self.jpeg_quality = jpeg_quality
+        self.cameras: dict = {}
+
+        self.batches = 0
+        self.batched_frames = 0
+        self.last_batch_ms = 0.0
+
+        self._lock = threading.Lock()
+        self._frame_ready = threading.Event()
+        self._stop = threading.Event()
+        self._thread = None
+
+    # --- Registry ---
+
+    def load(self, spec: str = CAMERA_SOURCES):
+        for camera_id, source in parse_camera_sources(spec):
+            self.add(camera_id, source)
+
+    def add(self, camera_id: str, source):
+        with self._lock:
+            if camera_id in self.cameras:
+                raise ValueError(f"Camera {camera_id} already registered")
+            camera = Camera(camera_id, source, on_frame=self._frame_ready.set)
+            self.cameras[camera_id] = camera
+            return camera
+
+    def remove(self, camera_id: str):
+        with self._lock:
+            camera = self.cameras.pop(camera_id, None)
+        if camera is not None:
+            camera.stop()
+        return camera
+
+    def get(self, camera_id: str = None):
+        """Camera by id; with no id, the default camera (or the first registered)."""
+        if camera_id is None:
+            camera_id = DEFAULT_CAMERA_ID
+            if camera_id not in self.cameras and self.cameras:
+                camera_id = next(iter(self.cameras))
+        return self.cameras.get(camera_id)
+
+    def start_camera(self, camera_id: str):
+        camera = self.cameras[camera_id]
+        ok = camera.start()
+        if ok:
+            self._ensure_loop()
+        return ok
+
+    def stop_camera(self, camera_id: str):
+        self.cameras[camera_id].stop()
+
+    def stop_all(self):
+        for camera in list(self.cameras.values()):
+            camera.stop()
+        self._stop.set()
+        self._frame_ready.set()
+        if self._thread is not None:
+            self._thread.join(2.0)
+            self._thread = None
+
+    def reset_counts(self):
+        for camera in list(self.cameras.values()):
+            camera.reset_counts()
+
+    # --- Inference loop ---
+
+    def _ensure_loop(self):
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name="camera-inference", daemon=True)
+            self._thread.start()
+
+    def _collect(self):
+        """Newest unprocessed frame of every active camera."""
+        pending = []
+        for camera in list(self.cameras.values()):
+            grabber = camera.grabber
+            if grabber is None:
+                continue
+            if grabber.failed:
+                camera.error = "Camera read failed"
+                camera.stop()
+                continue
+            seq, frame = grabber.read_latest(camera.last_seq, timeout=0)
+            if frame is not None:
+                camera.last_seq = seq
+                pending.append((camera, frame))
+        return pending
+
+    def _run(self):
+        print("Camera inference loop started.")
+        while not self._stop.is_set():
+            self._frame_ready.wait(0.5)
+            self._frame_ready.clear()
+            pending = self._collect()
+            if not pending:
+                continue
+            try:
+                self._process(pending)
+            except Exception as e:
+                print(f"Camera inference failed: {e}")
+        print("Camera inference loop stopped.")
+
+    def _process(self, pending):
+        tracker = self.get_tracker()
+        model = getattr(tracker, "model", None)
+        if model is None or not hasattr(tracker, "count_live_detections"):
+            # No real model (mock mode): pass frames through unannotated
+            for camera, frame in pending:
+                self._publish(camera, frame)
+            return
+
+        to_infer = []
+        for camera, frame in pending:
+            gate = camera.motion_gate
+            if gate is not None and not gate.should_infer(frame):
+                self._publish(camera, self._redraw(tracker, camera, frame))
+                continue
+            if gate is not None and gate.last_gap:
+                camera.tracking_session().advance(gate.last_gap)
+            to_infer.append((camera, frame))
+
+        for i in range(0, len(to_infer), self.max_batch):
+            chunk = to_infer[i:i + self.max_batch]
+            started = time.perf_counter()
+            # One forward pass for every camera in the chunk, ahead of any queued batch work
+            results = infer(model, [frame for _, frame in chunk], LIVE, conf=LIVE_CONF, iou=LIVE_IOU,
+                            agnostic_nms=True, classes=[0], augment=False, verbose=False)
+            self.last_batch_ms = (time.perf_counter() - started) * 1000
+            self.batches += 1
+            self.batched_frames += len(chunk)
+            for (camera, frame), result in zip(chunk, results):
+                self._publish(camera, self._annotate(tracker, camera, frame, result))
+
+    def _annotate(self, tracker, camera, frame, result):
+        height, width = frame.shape[:2]
+        zone = tracker.live_zone(width, height)
+        xyxy, track_ids, _, _ = camera.tracking_session().update(result)
+        detections = tracker.count_live_detections(camera, xyxy_to_xywh(xyxy), track_ids.tolist(), zone)
+        new = sum(1 for _, _, state in detections if state == "new")
+        if new and self.on_count is not None:
+            self.on_count(camera.camera_id, new)
+
+        annotated_frame = frame.copy()
+        boxes = [tuple(map(int, b)) for b in xyxy.tolist()]
+        for (x1, y1, x2, y2), track_id in zip(boxes, track_ids.tolist()):
+            cv2.rectangle(annotated_frame, (x1, y1), (x2, y2), (255, 0, 0), 2)
+            cv2.putText(annotated_frame, f"ID:{track_id}", (x1, y1 - 5), cv2.FONT_HERSHEY_SIMPLEX, 0.5, (255, 0, 0), 1)
+        camera.last_boxes = boxes
+        camera.last_detections = detections
+        return tracker._draw_live_overlay(annotated_frame, detections, zone, camera.total_count)
+
+    def _redraw(self, tracker, camera, frame):
+        """Static scene: reuse the camera's last annotations on the new frame."""
+        height, width = frame.shape[:2]
+        annotated_frame = frame.copy()
+        for x1, y1, x2, y2 in camera.last_boxes:
+            cv2.rectangle(annotated_frame, (x1, y1), (x2, y2), (255, 0, 0), 2)
+        detections = [(cx, cy, "counted" if state == "new" else state) for cx, cy, state in camera.last_detections]
+        return tracker._draw_live_overlay(annotated_frame, detections, tracker.live_zone(width, height), camera.total_count)
+
+    def _publish(self, camera, frame):
+        cv2.putText(frame, camera.camera_id, (20, frame.shape[0] - 20), cv2.FONT_HERSHEY_SIMPLEX, 0.6, (255, 255, 255), 2)
+        ok, buffer = cv2.imencode('.jpg', frame, [int(cv2.IMWRITE_JPEG_QUALITY), self.jpeg_quality])
+        if ok:
+            camera.broadcaster.publish(buffer.tobytes())
+        camera.mark_published()
+
+    def stats(self):
+        return {
+            "batches": self.batches,
+            "batched_frames": self.batched_frames,
+            "avg_batch_size": round(self.batched_frames / self.batches, 2) if self.batches else 0.0,
+            "last_batch_ms": round(self.last_batch_ms, 1),
+            "cameras": [c.stats() for c in list(self.cameras.values())],
+        }
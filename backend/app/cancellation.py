@@ -0,0 +1,55 @@
+import threading
+
+
+class TaskCancelled(Exception):
+    """Raised when work is abandoned because its task was cancelled."""
+
+
+class CancelToken:
+    """
+    Cooperative stop / pause switch for one background task. Frame loops
+    call should_stop() once per frame: it blocks while the task is paused
+    (holding no CPU) and returns True once it is cancelled, so capacity
+    comes back within one frame.
+    """
+    def __init__(self):
+        self._cancelled = threading.Event()
+        self._running = threading.Event()
+        self._running.set()
+        # Run by the task's own thread around a pause, e.g. to lend its job slot out;
+        # on_resume() returns False if the task was cancelled while taking it back
+        self.on_pause = None
+        self.on_resume = None
+
+    @property
+    def cancelled(self):
+        return self._cancelled.is_set()
+
+    @property
+    def paused(self):
+        return not self._running.is_set()
+
+    def cancel(self):
+        self._cancelled.set()
+        self._running.set() # Wake a paused loop so it can exit
+
+    def pause(self):
+        if not self.cancelled:
+            self._running.clear()
+
+    def resume(self):
+        self._running.set()
+
+    def should_stop(self):
+        if not self._running.is_set() and self.on_pause is not None:
+            self.on_pause()
+            self._running.wait()
+            if self.on_resume is not None and not self.cancelled:
+                self.on_resume()
+        self._running.wait()
+        return self.cancelled
+
+    def check(self):
+        """Same as should_stop() but raises TaskCancelled."""
+        if self.should_stop():
+            raise TaskCancelled()
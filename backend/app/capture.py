@@ -0,0 +1,98 @@
+import threading
+import time
+
+import cv2
+
+
+class FrameGrabber:
+    """
+    Dedicated capture thread that drains the device as fast as it delivers
+    and keeps only the newest frame (latest-frame-wins). Consumers always get
+    the freshest frame, so live latency is bounded by one inference time
+    instead of growing with OpenCV's internal buffer.
+    """
+    def __init__(self, cap, name="capture", on_frame=None):
+        self.cap = cap
+        self.name = name
+        self.on_frame = on_frame # Optional notification (no arguments) after each new frame
+        try:
+            # Best effort: not every backend honours a 1-frame driver buffer
+            self.cap.set(cv2.CAP_PROP_BUFFERSIZE, 1)
+        except Exception:
+            pass
+
+        self.seq = 0
+        self.frame = None
+        self.timestamp = 0.0
+        self.failed = False
+
+        self.captured = 0
+        self.consumed = 0
+        self.dropped = 0 # Frames overwritten before anyone read them
+        self.last_latency = 0.0 # Age of the frame at the moment it was consumed
+
+        self._cond = threading.Condition()
+        self._stop = threading.Event()
+        self._last_consumed_seq = 0
+        self._thread = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name=self.name, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self, timeout=2.0):
+        self._stop.set()
+        with self._cond:
+            self._cond.notify_all()
+        if self._thread is not None and self._thread is not threading.current_thread():
+            self._thread.join(timeout)
+
+    def _run(self):
+        while not self._stop.is_set():
+            success, frame = self.cap.read()
+            now = time.perf_counter()
+            with self._cond:
+                if not success:
+                    self.failed = True
+                    self._cond.notify_all()
+                    break
+                if self.seq > self._last_consumed_seq:
+                    self.dropped += 1
+                self.seq += 1
+                self.frame = frame
+                self.timestamp = now
+                self.captured += 1
+                self._cond.notify_all()
+            if self.on_frame is not None:
+                self.on_frame()
+        if self.failed and self.on_frame is not None:
+            self.on_frame() # Let the consumer notice the failure promptly
+
+    def read_latest(self, after_seq=0, timeout=1.0):
+        """
+        Blocks until a frame newer than after_seq exists.
+        Returns (seq, frame), or (after_seq, None) on timeout / capture failure.
+        """
+        deadline = time.perf_counter() + timeout
+        with self._cond:
+            while self.seq <= after_seq and not self.failed and not self._stop.is_set():
+                remaining = deadline - time.perf_counter()
+                if remaining <= 0:
+                    return after_seq, None
+                self._cond.wait(remaining)
+            if self.seq <= after_seq:
+                return after_seq, None
+            self._last_consumed_seq = self.seq
+            self.consumed += 1
+            self.last_latency = time.perf_counter() - self.timestamp
+            return self.seq, self.frame
+
+    def stats(self):
+        return {
+            "captured": self.captured,
+            "consumed": self.consumed,
+            "dropped": self.dropped,
+            "frame_age_ms": round(self.last_latency * 1000, 1),
+            "failed": self.failed,
+        }
@@ -0,0 +1,190 @@
+import os
+import pickle
+import subprocess
+import time
+
+import cv2
+
+from .encoder import ffmpeg_path
+
+# Checkpointing of long video jobs
+CHECKPOINTS_ENABLED = os.getenv("CHECKPOINTS_ENABLED", "true").lower() == "true"
+# Seconds between checkpoints; each one also starts a new output segment, joined at the end
+CHECKPOINT_INTERVAL = float(os.getenv("CHECKPOINT_INTERVAL", "60"))
+CHECKPOINT_VERSION = 2 # 2: track state as plain data (was the pickled BYTETracker)
+
+
+def concat_supported():
+    """Segments can be joined without re-encoding (ffmpeg stream copy); otherwise jobs are not segmented."""
+    return ffmpeg_path() is not None
+
+
+def concat_videos(segments, output_path, open_writer):
+    """Joins finished segment files; stream copy with ffmpeg when available, else re-encode."""
+    segments = [s for s in segments if os.path.exists(s)]
+    if len(segments) == 1:
+        os.replace(segments[0], output_path)
+        return
+    ffmpeg = ffmpeg_path()
+    if ffmpeg and segments:
+        list_path = output_path + ".segments.txt"
+        with open(list_path, "w") as f:
+            for segment in segments:
+                f.write(f"file '{os.path.abspath(segment)}'\n")
+        try:
+            subprocess.run([ffmpeg, "-y", "-loglevel", "error", "-f", "concat", "-safe", "0", "-i", list_path,
+                            "-c", "copy", output_path], check=True)
+            return
+        except (subprocess.CalledProcessError, OSError) as e:
+            print(f"ffmpeg concat failed, re-encoding segments: {e}")
+        finally:
+            os.remove(list_path)
+
+    out = None
+    for segment in segments:
+        cap = cv2.VideoCapture(segment)
+        if out is None:
+            fps = cap.get(cv2.CAP_PROP_FPS) or 25
+            size = (int(cap.get(cv2.CAP_PROP_FRAME_WIDTH)), int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT)))
+            out = open_writer(output_path, fps, size)
+        while True:
+            ok, frame = cap.read()
+            if not ok:
+                break
+            out.write(frame)
+        cap.release()
+    if out is not None:
+        out.release()
+
+
+class SegmentedWriter:
+    """
+    VideoWriter drop-in that writes the output as a series of closed segment
+    files. An mp4 that is still open has no index and is unreadable after a
+    crash, so every checkpoint rolls to a new segment; release() joins them.
+    """
+    def __init__(self, output_path, fps, size, open_writer, segments=None, concat_writer=None):
+        self.output_path = output_path
+        self.fps = fps
+        self.size = size
+        self.open_writer = open_writer
+        self.concat_writer = concat_writer or open_writer # Re-encode fallback of the final join
+        self.segments = list(segments or [])
+        self._writer = None
+        self._open_next()
+
+    def _open_next(self):
+        path = f"{self.output_path}.part{len(self.segments):04d}.mp4"
+        self.segments.append(path)
+        self._writer = self.open_writer(path, self.fps, self.size)
+
+    def write(self, frame):
+        self._writer.write(frame)
+
+    @property
+    def closed_segments(self):
+        """Segments that are complete on disk (all but the one being written)."""
+        return self.segments[:-1] if self._writer is not None else list(self.segments)
+
+    def roll(self):
+        """Closes the current segment (making it durable) and starts the next one."""
+        self._writer.release()
+        self._open_next()
+
+    def close_segments(self):
+        if self._writer is not None:
+            self._writer.release()
+            self._writer = None
+
+    def release(self):
+        self.close_segments()
+        concat_videos(self.segments, self.output_path, self.concat_writer)
+        self.discard()
+
+    def discard(self):
+        self.close_segments()
+        for segment in self.segments:
+            if os.path.exists(segment):
+                os.remove(segment)
+
+    def abort(self):
+        """
+        Failed job: stops the current segment's encoder without flushing and
+        removes that partial file. Closed segments belong to the checkpoint.
+        """
+        if self._writer is not None:
+            self._writer.abort()
+            self._writer = None
+            partial = self.segments.pop()
+            if os.path.exists(partial):
+                os.remove(partial)
+
+
+class VideoCheckpoint:
+    """
+    Periodic, atomically replaced checkpoint of one video job: a small pickle
+    with the next frame index, the tracker's counters / track state and the
+    list of finished output segments.
+    """
+    def __init__(self, task_id, root, interval=CHECKPOINT_INTERVAL):
+        self.task_id = task_id
+        self.root = root
+        self.interval = interval
+        self.path = os.path.join(root, f"{task_id}.ckpt")
+        self.last_saved = time.perf_counter()
+        self.saves = 0
+        os.makedirs(root, exist_ok=True)
+
+    def _read(self):
+        if not os.path.exists(self.path):
+            return None
+        try:
+            with open(self.path, "rb") as f:
+                return pickle.load(f)
+        except Exception as e:
+            print(f"Ignoring unreadable checkpoint for {self.task_id}: {e}")
+            return None
+
+    def load(self):
+        state = self._read()
+        if state is not None and state.get("version") != CHECKPOINT_VERSION:
+            print(f"Checkpoint of {self.task_id} is from another version, starting over")
+            self.discard() # Its segments would otherwise be left behind
+            return None
+        return state
+
+    def due(self):
+        return time.perf_counter() - self.last_saved >= self.interval
+
+    def save(self, state):
+        state = dict(state, version=CHECKPOINT_VERSION, saved_at=time.time())
+        tmp = self.path + ".tmp"
+        with open(tmp, "wb") as f:
+            pickle.dump(state, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp, self.path)
+        self.last_saved = time.perf_counter()
+        self.saves += 1
+
+    def discard(self):
+        """Removes the checkpoint and any output segments it recorded."""
+        state = self._read() or {}
+        for path in (self.path, *state.get("segments", ())):
+            if os.path.exists(path):
+                os.remove(path)
+
+    def writer(self, output_path, fps, size, open_writer, state=None, concat_writer=None):
+        """Segmented output; resumes after the segments recorded in `state`."""
+        return SegmentedWriter(output_path, fps, size, open_writer, (state or {}).get("segments"), concat_writer)
+
+
+def seek(cap, frame_idx):
+    """Positions a capture at frame_idx (falls back to grabbing when seeking is inexact)."""
+    if frame_idx <= 0:
+        return
+    cap.set(cv2.CAP_PROP_POS_FRAMES, frame_idx)
+    if int(cap.get(cv2.CAP_PROP_POS_FRAMES)) == frame_idx:
+        return
+    cap.set(cv2.CAP_PROP_POS_FRAMES, 0)
+    for _ in range(frame_idx):
+        if not cap.grab():
+            break
@@ -0,0 +1,254 @@
+import asyncio
+import os
+import time
+from collections import deque
+
+from fastapi import WebSocket
+
+from .protocol import DeltaChannel, PROTOCOL_VERSION, encode, split_update, supported_encodings
+
+# Per-connection send policy
+FRAME_QUEUE_SIZE = 2 # Frames are replaceable: keep only the newest few (drop-oldest)
+SEND_TIMEOUT = 5.0 # Seconds before a stalled send counts as a failure
+MAX_SEND_FAILURES = 3 # Consecutive failures before the socket is pruned
+TICK_INTERVAL = float(os.getenv("WS_TICK_MS", "100")) / 1000 # Delta batching period (protocol v2)
+CHANNEL_TTL = float(os.getenv("WS_CHANNEL_TTL", "300")) # Seconds a user's delta state outlives their last socket
+
+
+def is_droppable(message):
+    """Frame previews can be superseded; counts and events must always arrive."""
+    return isinstance(message, dict) and message.get("type") == "frame"
+
+
+class ClientConnection:
+    """
+    One WebSocket plus its own send queues and writer task.
+    Broadcasters only enqueue, so a slow client never delays the others.
+    """
+    def __init__(self, user_id: str, websocket: WebSocket, on_dead=None, protocol=1, encoding="json"):
+        self.user_id = user_id
+        self.websocket = websocket
+        self.on_dead = on_dead
+        self.protocol = protocol
+        self.encoding = encoding
+
+        # Critical messages (count / event / reset) are never dropped
+        self.messages = deque()
+        # Frame messages: bounded, deque(maxlen) silently drops the oldest
+        self.frames = deque(maxlen=FRAME_QUEUE_SIZE)
+
+        self.failures = 0
+        self.frames_dropped = 0
+        self.sent = 0
+        self.closed = False
+
+        self._wakeup = asyncio.Event()
+        self._writer = None
+
+    def start(self):
+        self._writer = asyncio.create_task(self._write_loop())
+
+    def enqueue(self, message):
+        if self.closed:
+            return
+        if is_droppable(message):
+            if len(self.frames) == self.frames.maxlen:
+                self.frames_dropped += 1
+            self.frames.append(message)
+        else:
+            self.messages.append(message)
+        self._wakeup.set()
+
+    def _next_message(self):
+        # Critical messages always jump ahead of previews
+        if self.messages:
+            return self.messages.popleft()
+        if self.frames:
+            return self.frames.popleft()
+        return None
+
+    async def _write_loop(self):
+        try:
+            while not self.closed:
+                await self._wakeup.wait()
+                self._wakeup.clear()
+
+                message = self._next_message()
+                while message is not None and not self.closed:
+                    try:
+                        await asyncio.wait_for(self._send(message), SEND_TIMEOUT)
+                        self.failures = 0
+                        self.sent += 1
+                    except asyncio.CancelledError:
+                        raise
+                    except Exception as e:
+                        self.failures += 1
+                        print(f"WebSocket send failed for {self.user_id} ({self.failures}/{MAX_SEND_FAILURES}): {e}")
+                        if self.failures >= MAX_SEND_FAILURES:
+                            await self._mark_dead()
+                            return
+                        # Keep critical messages for a retry; stale frames are not worth it
+                        if not is_droppable(message):
+                            self.messages.appendleft(message)
+                    message = self._next_message()
+        except asyncio.CancelledError:
+            pass
+
+    def _send(self, message):
+        # Protocol v2 payloads arrive pre-encoded (msgpack bytes or compact JSON text)
+        if isinstance(message, bytes):
+            return self.websocket.send_bytes(message)
+        if isinstance(message, str):
+            return self.websocket.send_text(message)
+        return self.websocket.send_json(message)
+
+    async def _mark_dead(self):
+        self.closed = True
+        try:
+            await self.websocket.close()
+        except Exception:
+            pass
+        if self.on_dead:
+            self.on_dead(self)
+
+    async def close(self):
+        self.closed = True
+        self._wakeup.set()
+        if self._writer and self._writer is not asyncio.current_task():
+            self._writer.cancel()
+
+    def stats(self):
+        return {
+            "user_id": self.user_id,
+            "protocol": self.protocol,
+            "encoding": self.encoding,
+            "pending_messages": len(self.messages),
+            "pending_frames": len(self.frames),
+            "frames_dropped": self.frames_dropped,
+            "sent": self.sent,
+            "failures": self.failures,
+        }
+
+
+# WebSocket Manager with User Scoping
+class ConnectionManager:
+    """
+    Legacy (v1) clients receive every update dict as it happens. Protocol v2
+    clients receive per-user delta batches once per tick, stamped with a
+    sequence number so a reconnecting client can resync. A user's channel
+    is dropped once they have had no socket for channel_ttl seconds.
+    """
+    def __init__(self, tick_interval=TICK_INTERVAL, channel_ttl=CHANNEL_TTL):
+        self.active_connections: dict = {} # userId -> [ClientConnection]
+        self.channels: dict = {} # userId -> DeltaChannel (protocol v2 state)
+        self.idle_since: dict = {} # userId -> monotonic time their channel lost its last socket
+        self.tick_interval = tick_interval
+        self.channel_ttl = channel_ttl
+        self.loop = None # Event loop that owns the sockets (set on first connect)
+        self._ticker = None
+
+    async def connect(self, userId: str, websocket: WebSocket, protocol: int = 1,
+                      encoding: str = "json", since_seq: int = None):
+        await websocket.accept()
+        self.loop = asyncio.get_running_loop()
+        if encoding not in supported_encodings():
+            encoding = "json"
+        client = ClientConnection(userId, websocket, on_dead=self._prune,
+                                  protocol=protocol, encoding=encoding)
+        client.start()
+        self.active_connections.setdefault(userId, []).append(client)
+        self.idle_since.pop(userId, None)
+        if protocol >= PROTOCOL_VERSION:
+            self.resync(client, since_seq)
+            if self._ticker is None or self._ticker.done():
+                self._ticker = asyncio.create_task(self._tick_loop())
+        return client
+
+    def disconnect(self, userId: str, websocket: WebSocket):
+        for client in list(self.active_connections.get(userId, [])):
+            if client.websocket is websocket:
+                self._remove(client)
+                asyncio.ensure_future(client.close())
+
+    def _prune(self, client: ClientConnection):
+        print(f"Pruning dead WebSocket for user {client.user_id}")
+        self._remove(client)
+
+    def _remove(self, client: ClientConnection):
+        conns = self.active_connections.get(client.user_id)
+        if conns and client in conns:
+            conns.remove(client)
+            if not conns:
+                del self.active_connections[client.user_id]
+        self.expire_channels()
+
+    def expire_channels(self, now=None):
+        """Drops the delta state of users without a socket for longer than channel_ttl."""
+        now = time.monotonic() if now is None else now
+        for userId in list(self.channels):
+            if userId in self.active_connections:
+                continue
+            idle_since = self.idle_since.setdefault(userId, now)
+            if now - idle_since >= self.channel_ttl:
+                del self.channels[userId]
+                del self.idle_since[userId]
+
+    def _targets(self, userId: str = None):
+        if userId:
+            return list(self.active_connections.get(userId, []))
+        # Global broadcast (system alerts etc)
+        return [c for conns in self.active_connections.values() for c in conns]
+
+    def channel(self, userId: str):
+        if userId not in self.channels:
+            self.channels[userId] = DeltaChannel()
+        return self.channels[userId]
+
+    def _enqueue(self, message: dict, userId: str = None, task_id: str = None):
+        for client in self._targets(userId):
+            if client.protocol < PROTOCOL_VERSION:
+                client.enqueue(message)
+
+        if is_droppable(message):
+            return # Previews have their own channel in protocol v2
+        fields, event = split_update(message)
+        users = [userId] if userId else list(self.channels.keys() | self.active_connections.keys())
+        for uid in users:
+            self.channel(uid).apply(task_id, fields, event)
+
+    async def broadcast(self, message: dict, userId: str = None, task_id: str = None):
+        """Queues the message for every target; never waits on a socket."""
+        self._enqueue(message, userId, task_id)
+
+    def broadcast_threadsafe(self, message: dict, userId: str = None, task_id: str = None):
+        """Entry point for worker threads (background tasks run outside the event loop)."""
+        if self.loop is None or self.loop.is_closed():
+            return # Nobody has connected yet
+        self.loop.call_soon_threadsafe(self._enqueue, message, userId, task_id)
+
+    def resync(self, client: ClientConnection, since_seq: int = None):
+        """Sends buffered deltas after since_seq, or a snapshot if they are gone."""
+        for batch in self.channel(client.user_id).resync(since_seq):
+            client.enqueue(encode(batch, client.encoding))
+
+    def flush(self):
+        """Emits one delta batch per user with pending changes."""
+        self.expire_channels()
+        for userId, channel in self.channels.items():
+            batch = channel.flush()
+            if batch is None:
+                continue
+            encoded = {}
+            for client in self._targets(userId):
+                if client.protocol >= PROTOCOL_VERSION:
+                    if client.encoding not in encoded:
+                        encoded[client.encoding] = encode(batch, client.encoding)
+                    client.enqueue(encoded[client.encoding])
+
+    async def _tick_loop(self):
+        while True:
+            await asyncio.sleep(self.tick_interval)
+            self.flush()
+
+    def stats(self):
+        return [c.stats() for c in self._targets()]
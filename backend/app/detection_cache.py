@@ -0,0 +1,168 @@
+import hashlib
+import json
+import os
+import shutil
+import threading
+import time
+
+import numpy as np
+
+# Per-frame tracked boxes of finished jobs, so counting can be re-run without the model
+DETECTION_CACHE_ENABLED = os.getenv("DETECTION_CACHE_ENABLED", "true").lower() == "true"
+DETECTION_CACHE_MAX_BYTES = int(os.getenv("DETECTION_CACHE_MAX_BYTES", str(1024 ** 3)))
+DETECTION_CACHE_VERSION = 1
+COLUMNS = ("offsets", "xywh", "track_id", "conf", "cls")
+
+
+def detection_key(video_hash: str, weights_hash: str, backend: str, infer_params: dict, tracker_config: str):
+    """Same video + same weights / detector / tracker settings -> same boxes and track IDs."""
+    payload = json.dumps(
+        {"v": DETECTION_CACHE_VERSION, "video": video_hash, "weights": weights_hash, "backend": backend,
+         "infer": infer_params, "tracker": tracker_config},
+        sort_keys=True, separators=(",", ":"), default=str
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class DetectionRecorder:
+    """Collects the tracked boxes of each frame while a job runs."""
+    def __init__(self):
+        self.meta = {}
+        self.first_frame = None
+        self.frames = 0
+        self._counts = []
+        self._columns = {"xywh": [], "track_id": [], "conf": [], "cls": []}
+
+    def begin(self, width, height, fps, first_frame=0):
+        self.meta = {"width": width, "height": height, "fps": fps}
+        self.first_frame = first_frame # > 0 after a resume: the recording is incomplete
+
+    def add(self, frame_idx, xywh=None, track_ids=None, conf=None, cls=None):
+        """One frame's tracked boxes (none given: a frame without tracks)."""
+        n = 0 if track_ids is None else len(track_ids)
+        self._counts.append(n)
+        self.frames += 1
+        if n:
+            self._columns["xywh"].append(np.asarray(xywh, dtype=np.float32).reshape(-1, 4))
+            self._columns["track_id"].append(np.asarray(track_ids, dtype=np.int32))
+            self._columns["conf"].append(np.asarray(conf, dtype=np.float16))
+            self._columns["cls"].append(np.asarray(cls, dtype=np.int16))
+
+    @property
+    def complete(self):
+        return self.first_frame == 0 and self.frames > 0
+
+    def columns(self):
+        offsets = np.zeros(len(self._counts) + 1, dtype=np.int64)
+        np.cumsum(self._counts, out=offsets[1:])
+        empty = {"xywh": np.empty((0, 4), np.float32), "track_id": np.empty(0, np.int32),
+                 "conf": np.empty(0, np.float16), "cls": np.empty(0, np.int16)}
+        columns = {name: np.concatenate(parts) if parts else empty[name] for name, parts in self._columns.items()}
+        columns["offsets"] = offsets
+        return columns
+
+
+class Detections:
+    """
+    Cached detections of one video: one .npy per column, memory-mapped, so
+    opening is instant and only the frames read are paged in.
+    Frame i's rows are offsets[i]:offsets[i + 1].
+    """
+    def __init__(self, path):
+        self.path = path
+        with open(os.path.join(path, "meta.json")) as f:
+            self.meta = json.load(f)
+        self.width = self.meta["width"]
+        self.height = self.meta["height"]
+        self.fps = self.meta["fps"]
+        for name in COLUMNS:
+            setattr(self, name, np.load(os.path.join(path, f"{name}.npy"), mmap_mode="r"))
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def frame(self, i):
+        """(xywh, track_ids, classes) of frame i."""
+        start, end = self.offsets[i], self.offsets[i + 1]
+        return self.xywh[start:end], self.track_id[start:end], self.cls[start:end]
+
+
+class DetectionCache:
+    """
+    Directory of cached detections, one sub-directory per key. Entries are
+    evicted least recently used first once the total exceeds max_bytes.
+    """
+    def __init__(self, root: str, max_bytes: int = DETECTION_CACHE_MAX_BYTES):
+        self.root = root
+        self.max_bytes = max_bytes
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        os.makedirs(root, exist_ok=True)
+
+    def _path(self, key: str):
+        return os.path.join(self.root, key)
+
+    def get(self, key: str):
+        """Detections for key (marked recently used), or None."""
+        path = self._path(key)
+        try:
+            detections = Detections(path)
+        except (OSError, ValueError, KeyError):
+            self.misses += 1
+            return None
+        os.utime(path) # LRU order
+        self.hits += 1
+        return detections
+
+    def has(self, key: str):
+        """Whether detections for key are stored (without opening them or counting a hit)."""
+        return os.path.exists(os.path.join(self._path(key), "meta.json"))
+
+    def put(self, key: str, recorder: DetectionRecorder):
+        """Stores a complete recording; partial ones (resumed jobs) are skipped."""
+        if not recorder.complete:
+            return False
+        dest = self._path(key)
+        tmp = dest + ".tmp"
+        shutil.rmtree(tmp, ignore_errors=True)
+        os.makedirs(tmp)
+        for name, column in recorder.columns().items():
+            np.save(os.path.join(tmp, f"{name}.npy"), column)
+        with open(os.path.join(tmp, "meta.json"), "w") as f:
+            json.dump(dict(recorder.meta, frames=recorder.frames, created=time.time()), f)
+        with self.lock:
+            shutil.rmtree(dest, ignore_errors=True)
+            os.replace(tmp, dest)
+            self._evict()
+        return True
+
+    def _entries(self):
+        entries = []
+        for name in os.listdir(self.root):
+            path = self._path(name)
+            if name.endswith(".tmp") or not os.path.isdir(path):
+                continue
+            size = sum(os.path.getsize(os.path.join(path, f)) for f in os.listdir(path))
+            entries.append((os.path.getmtime(path), size, path))
+        return entries
+
+    def _evict(self):
+        entries = sorted(self._entries())
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in entries:
+            if total <= self.max_bytes:
+                break
+            shutil.rmtree(path, ignore_errors=True)
+            total -= size
+
+    def stats(self):
+        with self.lock:
+            entries = self._entries()
+        return {
+            "entries": len(entries),
+            "bytes": sum(size for _, size, _ in entries),
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+        }
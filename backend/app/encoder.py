@@ -0,0 +1,281 @@
+import os
+import queue
+import shutil
+import subprocess
+import threading
+import time
+
+import cv2
+
+# Output video encoding
+VIDEO_ENCODER = os.getenv("VIDEO_ENCODER", "auto").lower() # auto (ffmpeg, then OpenCV) | ffmpeg | opencv
+FFMPEG_BINARY = os.getenv("FFMPEG_BINARY", "ffmpeg")
+FFMPEG_PRESET = os.getenv("FFMPEG_PRESET", "veryfast")
+FFMPEG_CRF = int(os.getenv("FFMPEG_CRF", "23"))
+ENCODER_QUEUE_FRAMES = int(os.getenv("ENCODER_QUEUE_FRAMES", "32")) # Frames buffered ahead of the encoder
+OPENCV_CODECS = ("avc1", "mp4v") # Browser-playable H.264 first
+# Progressive HLS copy of the output, playable while the job is still running (ffmpeg only)
+HLS_ENABLED = os.getenv("HLS_ENABLED", "true").lower() == "true"
+HLS_SEGMENT_SECONDS = float(os.getenv("HLS_SEGMENT_SECONDS", "2"))
+HLS_PLAYLIST = "index.m3u8"
+
+
+def ffmpeg_path():
+    return shutil.which(FFMPEG_BINARY)
+
+
+_ffmpeg_usable = None
+_probe_lock = threading.Lock()
+
+
+def ffmpeg_usable():
+    """
+    Whether ffmpeg is installed and can encode with libx264 (probed once by
+    encoding one tiny frame; some builds ship without it).
+    """
+    global _ffmpeg_usable
+    with _probe_lock:
+        if _ffmpeg_usable is None:
+            path = ffmpeg_path()
+            if path is None:
+                _ffmpeg_usable = False
+            else:
+                cmd = [path, "-y", "-loglevel", "error", "-f", "rawvideo", "-pix_fmt", "bgr24", "-s", "16x16",
+                       "-i", "-", "-an", "-c:v", "libx264", "-pix_fmt", "yuv420p", "-f", "null", "-"]
+                try:
+                    probe = subprocess.run(cmd, input=bytes(16 * 16 * 3), capture_output=True, timeout=30)
+                    _ffmpeg_usable = probe.returncode == 0
+                    if not _ffmpeg_usable:
+                        print(f"ffmpeg cannot encode H.264, using OpenCV: {probe.stderr.decode(errors='replace').strip()}")
+                except (OSError, subprocess.TimeoutExpired) as e:
+                    print(f"ffmpeg probe failed, using OpenCV: {e}")
+                    _ffmpeg_usable = False
+        return _ffmpeg_usable
+
+
+def hls_supported(encoder=VIDEO_ENCODER):
+    return HLS_ENABLED and encoder in ("auto", "ffmpeg") and ffmpeg_usable()
+
+
+def end_stream(hls_dir):
+    """Marks a task's HLS playlist complete, so players stop polling for segments."""
+    playlist = os.path.join(hls_dir, HLS_PLAYLIST) if hls_dir else None
+    if not playlist or not os.path.exists(playlist):
+        return
+    with open(playlist, "r+") as f:
+        if "#EXT-X-ENDLIST" not in f.read():
+            f.write("#EXT-X-ENDLIST\n")
+
+
+class FFmpegWriter:
+    """
+    H.264 (libx264, yuv420p, faststart) through an ffmpeg subprocess fed raw
+    BGR frames on stdin. Plays in every browser, unlike OpenCV's mp4v.
+    With hls_dir, the same encode is also muxed (tee) into HLS segments as it
+    goes; a later writer for the same job (next checkpoint segment, resume)
+    appends to that playlist after a discontinuity.
+    """
+    def __init__(self, path, fps, size, preset=FFMPEG_PRESET, crf=FFMPEG_CRF, hls_dir=None):
+        width, height = size
+        self.path = path
+        cmd = [
+            ffmpeg_path() or FFMPEG_BINARY, "-y", "-loglevel", "error",
+            "-f", "rawvideo", "-pix_fmt", "bgr24", "-s", f"{width}x{height}", "-r", str(fps), "-i", "-",
+            "-an", "-c:v", "libx264", "-preset", preset, "-crf", str(crf),
+            "-vf", "pad=ceil(iw/2)*2:ceil(ih/2)*2", # yuv420p needs even dimensions
+            "-pix_fmt", "yuv420p",
+        ]
+        if hls_dir:
+            os.makedirs(hls_dir, exist_ok=True)
+            playlist = os.path.join(hls_dir, HLS_PLAYLIST)
+            flags = "append_list+omit_endlist+temp_file" # Players only ever see finished segments
+            if os.path.exists(playlist):
+                flags += "+discont_start"
+            hls = (f"[f=hls:hls_time={HLS_SEGMENT_SECONDS:g}:hls_list_size=0:hls_playlist_type=event:hls_flags={flags}:"
+                   f"hls_segment_filename={os.path.join(hls_dir, 'seg_%05d.ts')}]{playlist}")
+            cmd += ["-map", "0:v", "-f", "tee", f"[f=mp4:movflags=+faststart]{path}|{hls}"]
+        else:
+            cmd += ["-movflags", "+faststart", path]
+        self.proc = subprocess.Popen(cmd, stdin=subprocess.PIPE, stderr=subprocess.PIPE)
+        self.error = None
+
+    def isOpened(self):
+        return self.proc.poll() is None
+
+    def write(self, frame):
+        if self.error is not None:
+            return
+        try:
+            self.proc.stdin.write(frame.tobytes())
+        except (BrokenPipeError, OSError) as e:
+            self.error = e
+
+    def release(self):
+        try:
+            self.proc.stdin.close()
+        except OSError:
+            pass
+        stderr = self.proc.stderr.read().decode(errors="replace").strip()
+        if self.proc.wait() != 0 or self.error is not None:
+            raise RuntimeError(f"ffmpeg failed writing {self.path}: {stderr or self.error}")
+
+    def abort(self):
+        """Stops ffmpeg without finishing the file (failed job); a write blocked on the pipe returns."""
+        try:
+            self.proc.stdin.close()
+        except (OSError, ValueError):
+            pass
+        if self.proc.poll() is None:
+            self.proc.kill()
+        self.proc.wait()
+        self.proc.stderr.close()
+
+
+_failed_codecs = set() # OpenCV codecs that did not open here (segmented output opens many writers)
+
+
+def opencv_writer(path, fps, size):
+    """cv2.VideoWriter with the first codec that opens; returns (writer, codec)."""
+    for codec in OPENCV_CODECS:
+        if codec in _failed_codecs and codec != OPENCV_CODECS[-1]:
+            continue
+        writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*codec), fps, size)
+        if writer.isOpened():
+            return writer, codec
+        writer.release()
+        _failed_codecs.add(codec)
+        print(f"Warning: OpenCV codec {codec} failed, trying the next one.")
+    return writer, OPENCV_CODECS[-1]
+
+
+class EncodeStats:
+    """Encoder time and output size of one task (summed over its segments)."""
+    def __init__(self):
+        self.backend = None
+        self.frames = 0
+        self.encode_seconds = 0.0 # Spent in the encoder thread
+        self.blocked_seconds = 0.0 # Producer waited on a full queue (encoder slower than inference)
+        self.bytes = 0
+        self.duration = 0.0
+        self._lock = threading.Lock()
+
+    def add(self, frames=0, encode_seconds=0.0, blocked_seconds=0.0):
+        with self._lock:
+            self.frames += frames
+            self.encode_seconds += encode_seconds
+            self.blocked_seconds += blocked_seconds
+
+    def finish(self, path, fps):
+        """Reads the final file's size and length for the bitrate."""
+        if not os.path.exists(path):
+            return
+        self.bytes = os.path.getsize(path)
+        cap = cv2.VideoCapture(path)
+        frames = cap.get(cv2.CAP_PROP_FRAME_COUNT)
+        cap.release()
+        self.duration = frames / fps if fps and frames > 0 else 0.0
+
+    def as_dict(self):
+        return {
+            "backend": self.backend,
+            "frames": self.frames,
+            "encode_seconds": round(self.encode_seconds, 2),
+            "blocked_seconds": round(self.blocked_seconds, 2),
+            "encode_fps": round(self.frames / self.encode_seconds, 1) if self.encode_seconds else None,
+            "bytes": self.bytes,
+            "bitrate_kbps": round(self.bytes * 8 / self.duration / 1000, 1) if self.duration else None,
+        }
+
+
+class AsyncVideoWriter:
+    """
+    VideoWriter drop-in that encodes on its own thread. write() only queues
+    the frame, so inference never waits on the encoder unless the bounded
+    queue is full.
+    """
+    def __init__(self, writer, stats, max_frames=ENCODER_QUEUE_FRAMES):
+        self.writer = writer
+        self.stats = stats
+        self._queue = queue.Queue(maxsize=max_frames)
+        self.error = None
+        self._aborted = False
+        self._thread = threading.Thread(target=self._run, name="video-encoder", daemon=True)
+        self._thread.start()
+
+    def isOpened(self):
+        return self.writer.isOpened()
+
+    def write(self, frame):
+        started = time.perf_counter()
+        self._queue.put(frame)
+        self.stats.add(blocked_seconds=time.perf_counter() - started)
+
+    def _run(self):
+        while True:
+            frame = self._queue.get()
+            if frame is None:
+                break
+            if self.error is not None or self._aborted:
+                continue # Keep draining so the producer never blocks
+            started = time.perf_counter()
+            try:
+                self.writer.write(frame)
+            except Exception as e:
+                self.error = e
+            self.stats.add(frames=1, encode_seconds=time.perf_counter() - started)
+
+    def release(self):
+        self._queue.put(None)
+        self._thread.join()
+        started = time.perf_counter()
+        try:
+            self.writer.release() # Flushes the encoder
+        finally:
+            self.stats.add(encode_seconds=time.perf_counter() - started)
+        if self.error is not None:
+            raise RuntimeError(f"Video encoding failed: {self.error}")
+
+    def abort(self):
+        """
+        Shuts down without flushing (the job failed): queued frames are
+        dropped, ffmpeg is killed, and the encoder thread exits.
+        """
+        self._aborted = True
+        abort = getattr(self.writer, "abort", None)
+        if abort is not None:
+            abort() # Before joining: unblocks a write stuck on a full pipe
+        while True:
+            try:
+                self._queue.get_nowait()
+            except queue.Empty:
+                break
+        self._queue.put(None)
+        self._thread.join()
+        if abort is None:
+            try:
+                self.writer.release()
+            except Exception as e:
+                print(f"Could not close the video writer: {e}")
+
+
+def open_video_writer(path, fps, size, stats=None, encoder=VIDEO_ENCODER, hls_dir=None):
+    """
+    Threaded writer for an output video: ffmpeg/libx264 when available
+    (VIDEO_ENCODER=auto|ffmpeg), else OpenCV avc1, else mp4v. hls_dir adds
+    a progressive HLS copy (ffmpeg only).
+    """
+    stats = stats if stats is not None else EncodeStats()
+    fps = fps or 25
+    writer = None
+    if encoder in ("auto", "ffmpeg") and ffmpeg_usable():
+        try:
+            writer = FFmpegWriter(path, fps, size, hls_dir=hls_dir if HLS_ENABLED else None)
+            stats.backend = f"ffmpeg/libx264 {FFMPEG_PRESET} crf{FFMPEG_CRF}"
+        except OSError as e:
+            print(f"Could not start ffmpeg, using OpenCV: {e}")
+    elif encoder == "ffmpeg":
+        print("ffmpeg (with libx264) not found, using OpenCV")
+    if writer is None:
+        writer, codec = opencv_writer(path, fps, size)
+        stats.backend = f"opencv/{codec}"
+    return AsyncVideoWriter(writer, stats)
@@ -0,0 +1,99 @@
+import os
+import time
+from collections import OrderedDict, deque
+
+# Live counting state (24/7 cameras)
+LIVE_TRACK_TTL = float(os.getenv("LIVE_TRACK_TTL", "300")) # Seconds a track ID is remembered after it was last seen
+LIVE_MAX_TRACK_IDS = int(os.getenv("LIVE_MAX_TRACK_IDS", "10000")) # Hard cap, oldest IDs go first
+ROLLUP_BUCKET_SECONDS = int(os.getenv("ROLLUP_BUCKET_SECONDS", "3600")) # 3600 = hourly, 28800 = 8h shifts
+ROLLUP_OFFSET_SECONDS = int(os.getenv("ROLLUP_OFFSET_SECONDS", "0")) # Shift start relative to midnight UTC, e.g. 21600 for 06:00
+ROLLUP_MAX_BUCKETS = int(os.getenv("ROLLUP_MAX_BUCKETS", "744")) # 31 days of hourly buckets
+
+
+class CountRollup:
+    """
+    Fixed-size time series of counts per bucket (hour or shift).
+    Only the bucket start and its count are kept; the oldest bucket
+    falls off once max_buckets is reached.
+    """
+    def __init__(self, bucket_seconds=ROLLUP_BUCKET_SECONDS, offset_seconds=ROLLUP_OFFSET_SECONDS,
+                 max_buckets=ROLLUP_MAX_BUCKETS):
+        self.bucket_seconds = bucket_seconds
+        self.offset_seconds = offset_seconds
+        self.buckets = deque(maxlen=max_buckets) # [bucket_start, count]
+
+    def bucket_start(self, ts):
+        return int((ts - self.offset_seconds) // self.bucket_seconds * self.bucket_seconds + self.offset_seconds)
+
+    def add(self, n=1, ts=None):
+        start = self.bucket_start(time.time() if ts is None else ts)
+        if self.buckets and self.buckets[-1][0] == start:
+            self.buckets[-1][1] += n
+        else:
+            self.buckets.append([start, n])
+
+    def series(self, since=None):
+        return [{"start": start, "count": count} for start, count in self.buckets if since is None or start >= since]
+
+
+class LiveCountState:
+    """
+    Counted track IDs for one live feed, bounded for long uptimes.
+    IDs are kept in last-seen order; any ID not seen for `ttl` seconds
+    (or beyond `max_ids`) is forgotten, so memory depends on how many
+    bags are in view recently, not on how long the camera has run.
+    A bag that reappears after expiry gets a new ByteTrack ID anyway.
+    """
+    def __init__(self, ttl=LIVE_TRACK_TTL, max_ids=LIVE_MAX_TRACK_IDS, rollup=None):
+        self.ttl = ttl
+        self.max_ids = max_ids
+        self.rollup = rollup if rollup is not None else CountRollup()
+        self._last_seen = OrderedDict() # track_id -> monotonic time, oldest first
+        self._counted = set()
+        self.expired = 0
+
+    def __len__(self):
+        return len(self._last_seen)
+
+    def __contains__(self, track_id):
+        return track_id in self._counted
+
+    def touch(self, track_id, now=None):
+        """Marks a track as seen and evicts stale ones."""
+        now = time.monotonic() if now is None else now
+        self._last_seen[track_id] = now
+        self._last_seen.move_to_end(track_id)
+        self._expire(now)
+
+    def count(self, track_id, now=None):
+        """Counts a track once. Returns True if it had not been counted yet."""
+        self.touch(track_id, now)
+        if track_id in self._counted:
+            return False
+        self._counted.add(track_id)
+        self.rollup.add(1)
+        return True
+
+    def _expire(self, now):
+        cutoff = now - self.ttl
+        while self._last_seen:
+            track_id, seen = next(iter(self._last_seen.items()))
+            if seen >= cutoff and len(self._last_seen) <= self.max_ids:
+                break
+            self._last_seen.popitem(last=False)
+            self._counted.discard(track_id)
+            self.expired += 1
+
+    def reset(self):
+        """Forgets tracked IDs; the rollup history is kept."""
+        self._last_seen.clear()
+        self._counted.clear()
+
+    def stats(self):
+        return {
+            "tracked_ids": len(self._last_seen),
+            "counted_ids": len(self._counted),
+            "expired_ids": self.expired,
+            "ttl": self.ttl,
+            "rollup_buckets": len(self.rollup.buckets),
+        }
@@ -0,0 +1,60 @@
+import asyncio
+import os
+import threading
+
+LIVE_JPEG_QUALITY = int(os.getenv("LIVE_JPEG_QUALITY", "80"))
+
+
+class FrameBroadcaster:
+    """
+    Holds the newest encoded JPEG of a live stream. The producer publishes
+    from its thread; any number of async readers wait for the next sequence
+    number without touching the camera or the model.
+    """
+    def __init__(self):
+        self.seq = 0
+        self.frame = None
+        self.subscribers = 0
+        self.loop = None
+        self._lock = threading.Lock()
+        self._waiters = set()
+
+    def publish(self, jpeg: bytes):
+        with self._lock:
+            self.seq += 1
+            self.frame = jpeg
+        loop = self.loop
+        if loop is not None and not loop.is_closed():
+            loop.call_soon_threadsafe(self._wake)
+
+    def _wake(self):
+        waiters, self._waiters = self._waiters, set()
+        for fut in waiters:
+            if not fut.done():
+                fut.set_result(True)
+
+    def latest(self):
+        with self._lock:
+            return self.seq, self.frame
+
+    async def next_frame(self, after_seq: int, timeout: float = 1.0):
+        """Returns (seq, jpeg) newer than after_seq, or (after_seq, None) on timeout."""
+        self.loop = asyncio.get_running_loop()
+        deadline = self.loop.time() + timeout
+        while True:
+            fut = self.loop.create_future()
+            self._waiters.add(fut)
+            try:
+                # Checked after registering, so a publish in between is not missed
+                seq, frame = self.latest()
+                if seq > after_seq and frame is not None:
+                    return seq, frame
+                remaining = deadline - self.loop.time()
+                if remaining <= 0:
+                    return after_seq, None
+                await asyncio.wait_for(fut, remaining)
+            except asyncio.TimeoutError:
+                return after_seq, None
+            finally:
+                self._waiters.discard(fut)
+            # Woken by a wake-up queued for an older frame: wait again
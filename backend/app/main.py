@@ -1,5 +1,5 @@
-from fastapi import FastAPI, UploadFile, File, BackgroundTasks, HTTPException, WebSocket, WebSocketDisconnect, Form
-from fastapi.responses import StreamingResponse, JSONResponse
+from fastapi import FastAPI, UploadFile, File, BackgroundTasks, HTTPException, WebSocket, WebSocketDisconnect, Form, Request
+from fastapi.responses import StreamingResponse, JSONResponse, FileResponse
 from fastapi.middleware.cors import CORSMiddleware
 from contextlib import asynccontextmanager
 from typing import List
@@ -9,20 +9,48 @@ import cv2
 import uuid
 import json
 import asyncio
-from .tracker import JuteBagTracker
-from .zone_tracker import ModularZoneTracker
+import copy
+import threading
+import time
+from .connections import ConnectionManager
+from .preview import PreviewHub
+from .cameras import CameraRegistry
+from .uploads import ResumableUploadStore, UploadError, save_upload_stream, safe_filename, hash_file
+from .task_events import TaskWatcher, LONG_POLL_TIMEOUT, SSE_HEARTBEAT
+from .scheduler import scheduler
+from .cancellation import CancelToken
+from .checkpoint import VideoCheckpoint, CHECKPOINTS_ENABLED, concat_supported
+from .encoder import hls_supported, end_stream, HLS_PLAYLIST
+from .metrics_store import CountStore, METRICS_FLUSH_SECONDS, DIMENSIONS
+from .model_registry import registry, rss_mb
+from .planner import ExecutionPlanner, JobSlots, JobSlot
+from .result_cache import ResultCache, RESULT_CACHE_ENABLED, file_sha256, make_key, tracker_fingerprint
+from .detection_cache import DetectionCache, DetectionRecorder, detection_key, DETECTION_CACHE_ENABLED
+from .tracking import DEFAULT_TRACKER_CONFIG
+from .retention import (RetentionManager, StorageArea, upload_task_id, output_task_id, dir_task_id, checkpoint_task_id,
+                        RETENTION_ENABLED, RETENTION_INTERVAL_SECONDS, UPLOAD_BUDGET_BYTES, DETECTION_BUDGET_BYTES,
+                        STREAM_BUDGET_BYTES, CHECKPOINT_BUDGET_BYTES)
+from starlette.concurrency import run_in_threadpool
 
 # Global tracker placeholders
 tracker = None
 zone_tracker = None
 
-@asynccontextmanager
-async def lifespan(app: FastAPI):
-    # Load the ML model on startup
+# Startup: the API serves requests while models load in the background
+STARTED_AT = time.perf_counter()
+MODEL_LOAD_TIMEOUT = float(os.getenv("MODEL_LOAD_TIMEOUT", "300")) # Max seconds a job waits for the models
+models_ready = threading.Event()
+startup = {"api_ready_seconds": None, "models_ready_seconds": None, "rss_mb": None}
+
+def load_trackers():
+    """
+    Builds the trackers on a background thread; torch and ultralytics are
+    first imported here, so startup does not wait for them.
+    """
     global tracker, zone_tracker
-    
+
     use_mock = os.getenv("USE_MOCK_TRACKER", "false").lower() == "true"
-    
+
     if use_mock:
         print("Starting in MOCK / SIMULATION MODE...")
         from .mock_tracker import MockJuteBagTracker
@@ -30,58 +58,89 @@ async def lifespan(app: FastAPI):
     else:
         print("Initializing JuteBagTracker...")
         try:
-            tracker = JuteBagTracker()
+            from .tracker import JuteBagTracker
+            from .zone_tracker import ModularZoneTracker
+            # Both load sacks_custom.pt through the model registry: one copy in memory
             zone_tracker = ModularZoneTracker()
+            tracker = JuteBagTracker()
         except Exception as e:
             print(f"Failed to initialize Real Tracker: {e}")
             print("Falling back to MOCK MODE due to initialization failure.")
             from .mock_tracker import MockJuteBagTracker
             tracker = MockJuteBagTracker()
             zone_tracker = MockJuteBagTracker() # Reuse for simplicity
-            
+
+    plan_execution()
+    startup["models_ready_seconds"] = round(time.perf_counter() - STARTED_AT, 2)
+    startup["rss_mb"] = rss_mb()
+    print(f"Models ready {startup['models_ready_seconds']}s after start, RSS {startup['rss_mb']} MB")
+    models_ready.set()
+    resume_interrupted_tasks()
+
+def plan_execution(force=False):
+    """Sizes inference workers / threads for this machine (benchmarks once, then cached)."""
+    model = getattr(tracker, "model", None)
+    if model is None:
+        return None
+    try:
+        plan = planner.run(model, registry.replica, f"{tracker.model_path}|{tracker.backend}", scheduler, force)
+    except Exception as e:
+        print(f"Execution planning failed: {e}")
+        return None
+    if plan is not None:
+        job_slots.resize(plan.job_slots)
+    return plan
+
+def wait_for_models():
+    """Blocks a background job until the trackers exist (only matters right after startup)."""
+    if not models_ready.wait(MODEL_LOAD_TIMEOUT):
+        print("Timed out waiting for models to load")
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Load the ML model in the background so health checks answer immediately
+    global tracker
+    threading.Thread(target=load_trackers, name="model-loader", daemon=True).start()
+    flusher = asyncio.create_task(flush_metrics_periodically())
+    cleaner = asyncio.create_task(enforce_retention_periodically())
+    startup["api_ready_seconds"] = round(time.perf_counter() - STARTED_AT, 2)
+    print(f"API ready {startup['api_ready_seconds']}s after start, RSS {rss_mb()} MB (models loading)")
     yield
     # Clean up on shutdown if needed
     print("Shutting down JuteBagTracker...")
+    flusher.cancel()
+    cleaner.cancel()
+    cameras.stop_all()
+    count_store.flush()
     tracker = None
 
-from fastapi.staticfiles import StaticFiles
+async def flush_metrics_periodically():
+    while True:
+        await asyncio.sleep(METRICS_FLUSH_SECONDS)
+        try:
+            await run_in_threadpool(count_store.flush)
+        except Exception as e:
+            print(f"Error saving count metrics: {e}")
 
-# WebSocket Manager with User Scoping
-class ConnectionManager:
-    def __init__(self):
-        self.active_connections: dict = {} # userId -> [WebSockets]
-
-    async def connect(self, userId: str, websocket: WebSocket):
-        await websocket.accept()
-        if userId not in self.active_connections:
-            self.active_connections[userId] = []
-        self.active_connections[userId].append(websocket)
-
-    def disconnect(self, userId: str, websocket: WebSocket):
-        if userId in self.active_connections:
-            self.active_connections[userId].remove(websocket)
-            if not self.active_connections[userId]:
-                del self.active_connections[userId]
-
-    async def broadcast(self, message: dict, userId: str = None):
-        if userId:
-            # Send to specific user
-            if userId in self.active_connections:
-                for connection in self.active_connections[userId]:
-                    try:
-                        await connection.send_json(message)
-                    except:
-                        pass
-        else:
-            # Global broadcast (system alerts etc)
-            for user_conns in self.active_connections.values():
-                for connection in user_conns:
-                    try:
-                        await connection.send_json(message)
-                    except:
-                        pass
+async def enforce_retention_periodically():
+    while True:
+        await asyncio.sleep(RETENTION_INTERVAL_SECONDS)
+        try:
+            # Abandoned resumable uploads have no task yet, so the storage budgets never see them
+            await run_in_threadpool(resumable_uploads.cleanup_expired)
+        except Exception as e:
+            print(f"Error removing expired uploads: {e}")
+        if retention is None:
+            continue
+        try:
+            await run_in_threadpool(retention.run_once)
+        except Exception as e:
+            print(f"Error enforcing storage retention: {e}")
+
+from fastapi.staticfiles import StaticFiles
 
 manager = ConnectionManager()
+preview_hub = PreviewHub()
 
 app = FastAPI(lifespan=lifespan, title="CCTV VisionCount AI")
 
@@ -93,16 +152,68 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+@app.get("/health")
+def health():
+    """Liveness / readiness: answers while models are still loading."""
+    return {
+        "status": "ok" if models_ready.is_set() else "loading",
+        "models_ready": models_ready.is_set(),
+        "uptime_seconds": round(time.perf_counter() - STARTED_AT, 1),
+        "rss_mb": rss_mb(),
+        "startup": startup,
+        "models": registry.stats(),
+    }
+
 @app.websocket("/ws/{user_id}")
-async def websocket_endpoint(websocket: WebSocket, user_id: str):
-    await manager.connect(user_id, websocket)
+async def websocket_endpoint(websocket: WebSocket, user_id: str, proto: int = 1, enc: str = "json", since: int = None):
+    """
+    proto=1 (default): legacy JSON dict per update.
+    proto=2: sequenced delta batches (enc=json|msgpack); reconnect with ?since=<seq>
+    or send {"op": "resync", "seq": <seq>} to catch up.
+    """
+    client = await manager.connect(user_id, websocket, protocol=proto, encoding=enc, since_seq=since)
     try:
-        # Send initial state (Optional: reset session count for this user?)
         while True:
-            await websocket.receive_text()
+            text = await websocket.receive_text()
+            if client.protocol < 2:
+                continue
+            try:
+                op = json.loads(text)
+            except ValueError:
+                continue
+            if isinstance(op, dict) and op.get("op") == "resync":
+                manager.resync(client, op.get("seq"))
     except WebSocketDisconnect:
+        pass
+    finally:
+        # Also covers sockets that error out without a clean disconnect
         manager.disconnect(user_id, websocket)
 
+@app.websocket("/ws/preview/{task_id}")
+async def preview_endpoint(websocket: WebSocket, task_id: str):
+    """Binary JPEG previews for one task (8-byte header: frame_idx, count)."""
+    sub = await preview_hub.subscribe(task_id, websocket)
+    try:
+        while True:
+            await websocket.receive_text()
+    except WebSocketDisconnect:
+        pass
+    finally:
+        preview_hub.unsubscribe(sub)
+
+@app.get("/cache/stats")
+def cache_stats():
+    return result_cache.stats() if result_cache else {"enabled": False}
+
+@app.get("/cache/detections/stats")
+def detection_cache_stats():
+    return detection_cache.stats() if detection_cache else {"enabled": False}
+
+@app.get("/ws/stats")
+def websocket_stats():
+    """Per-connection queue depth, drops and failures."""
+    return {"connections": manager.stats(), "preview": preview_hub.stats()}
+
 # --- GLOBAL STATE ---
 tasks = {}
 # Directories
@@ -111,29 +222,12 @@ DETECTION_DIR = os.path.join(BASE_DIR, "detections")
 UPLOAD_DIR = os.path.join(BASE_DIR, "uploads") # New upload directory
 DATA_DIR = os.path.join(BASE_DIR, "data") # Directory for persistent data
 
-# Physical Camera Control Flag
-_camera_active = False
-
-class CameraManager:
-    _instance = None
-    _cap = None
-
-    @classmethod
-    def get_cap(cls):
-        if cls._cap is None:
-            print("Opening Camera Hardware Singleton...")
-            cls._cap = cv2.VideoCapture(0)
-        return cls._cap
-
-    @classmethod
-    def stop(cls):
-        if cls._cap is not None:
-            print("Force Releasing Camera Hardware Singleton...")
-            cls._cap.release()
-            cls._cap = None
-        return True
-
 TASK_FILE = os.path.join(DATA_DIR, "tasks.json")
+CHECKPOINT_DIR = os.path.join(DATA_DIR, "checkpoints")
+STREAM_DIR = os.path.join(BASE_DIR, "streams") # Progressive HLS output per task
+_tasks_lock = threading.RLock()
+task_watcher = TaskWatcher()
+task_tokens = {} # task_id -> CancelToken while the job is queued or running
 
 def load_tasks():
     global tasks
@@ -141,70 +235,245 @@ def load_tasks():
         try:
             with open(TASK_FILE, "r") as f:
                 tasks = json.load(f)
+            for task_id, task in tasks.items():
+                task_watcher.seed(task_id, task.get("version", 0))
         except Exception as e:
             print(f"Error loading tasks: {e}")
             tasks = {} # Reset tasks if loading fails
 
 def save_tasks():
     try:
-        with open(TASK_FILE, "w") as f:
-            json.dump(tasks, f, indent=4)
+        with _tasks_lock:
+            with open(TASK_FILE, "w") as f:
+                json.dump(tasks, f, indent=4)
     except Exception as e:
         print(f"Error saving tasks: {e}")
 
+def set_task(task_id: str, record: dict):
+    """Replaces a task record, bumps its version and wakes SSE / long-poll waiters."""
+    with _tasks_lock:
+        record["version"] = task_watcher.bump(task_id)
+        tasks[task_id] = record
+    save_tasks()
+
+def update_task(task_id: str, **fields):
+    """Merges fields into an existing task record (same versioning as set_task)."""
+    with _tasks_lock:
+        if task_id not in tasks:
+            return
+        tasks[task_id].update(fields)
+        tasks[task_id]["version"] = task_watcher.bump(task_id)
+    save_tasks()
+
 # Ensure directories exist
 os.makedirs(DETECTION_DIR, exist_ok=True)
 os.makedirs(UPLOAD_DIR, exist_ok=True)
 os.makedirs(DATA_DIR, exist_ok=True) # Ensure data directory exists
+os.makedirs(STREAM_DIR, exist_ok=True)
+
+resumable_uploads = ResumableUploadStore(os.path.join(UPLOAD_DIR, ".partial"))
+resumable_uploads.cleanup_expired()
+
+CACHE_DIR = os.path.join(BASE_DIR, "cache")
+result_cache = ResultCache(os.path.join(CACHE_DIR, "results")) if RESULT_CACHE_ENABLED else None
+detection_cache = DetectionCache(os.path.join(CACHE_DIR, "detections")) if DETECTION_CACHE_ENABLED else None
 
 load_tasks() # Initialize on startup
+
+# Count time series (per camera / zone / user) behind /metrics/counts
+count_store = CountStore(os.path.join(DATA_DIR, "metrics.npz"))
+planner = ExecutionPlanner(os.path.join(DATA_DIR, "exec_plan.json"))
+job_slots = JobSlots(planner.plan.job_slots) # Concurrent video jobs, resized by the plan
+
+def task_state(task_id: str):
+    """For the retention manager: "active" (queued / running), "known" or None (no record)."""
+    with _tasks_lock:
+        task = tasks.get(task_id)
+        if task is None:
+            return None
+        if task_id in task_tokens or task.get("status") in INTERRUPTED_STATUSES:
+            return "active"
+    return "known"
+
+def on_retention_change(task_id: str, area: str, action: str):
+    """Keeps task records pointing at where their files are now."""
+    if area == "uploads":
+        update_task(task_id, input_expired=True)
+    elif area in ("detections", "cold") and action == "cold":
+        update_task(task_id, video_url=f"/tasks/{task_id}/output", storage="cold")
+    elif area in ("detections", "cold"):
+        update_task(task_id, video_url=None, storage=None, output_expired=True)
+    elif area == "streams":
+        update_task(task_id, stream_url=None)
+
+# Disk budgets per directory, LRU / age eviction and the optional cold tier
+retention = RetentionManager([
+    StorageArea("uploads", UPLOAD_DIR, UPLOAD_BUDGET_BYTES, upload_task_id),
+    StorageArea("detections", DETECTION_DIR, DETECTION_BUDGET_BYTES, output_task_id, cold=True),
+    StorageArea("streams", STREAM_DIR, STREAM_BUDGET_BYTES, dir_task_id),
+    StorageArea("checkpoints", CHECKPOINT_DIR, CHECKPOINT_BUDGET_BYTES, checkpoint_task_id),
+], task_state, on_retention_change) if RETENTION_ENABLED else None
+
 TEMP_DIR = "backend/temp_uploads" # Use the correct path relative to root if running from root
 
 
 # Mount static files for video download (Now points to detections folder)
 app.mount("/download", StaticFiles(directory=DETECTION_DIR), name="download")
 
+@app.middleware("http")
+async def track_downloads(request: Request, call_next):
+    # Served outputs count as recently used for retention
+    if retention and request.url.path.startswith("/download/"):
+        task_id = output_task_id(os.path.basename(request.url.path))
+        if task_id:
+            retention.touch(task_id)
+    return await call_next(request)
+
+def result_cache_key(task_id: str, file_path: str, mode: str, active_tracker):
+    """
+    Cache key from file hash + mode + weights hash + detection parameters.
+    None when caching is off or the tracker has no real model (mock mode).
+    """
+    if result_cache is None or getattr(active_tracker, "model", None) is None:
+        return None
+    model_path = getattr(active_tracker, "model_path", None)
+    if not model_path or not os.path.exists(model_path):
+        return None
+    file_hash = tasks.get(task_id, {}).get("sha256") or hash_file(file_path)
+    return make_key(file_hash, mode, file_sha256(model_path), tracker_fingerprint(active_tracker))
+
+def detection_cache_key(task_id: str, file_path: str, active_tracker):
+    """Key of a video's tracked boxes (file hash + weights + detector / tracker settings), None if not cacheable."""
+    if detection_cache is None or not hasattr(active_tracker, "replay") or getattr(active_tracker, "model", None) is None:
+        return None
+    model_path = getattr(active_tracker, "model_path", None)
+    if not model_path or not os.path.exists(model_path):
+        return None
+    file_hash = tasks.get(task_id, {}).get("sha256") or hash_file(file_path)
+    return detection_key(file_hash, file_sha256(model_path), active_tracker.backend, active_tracker.infer_params,
+                         DEFAULT_TRACKER_CONFIG)
+
+def remove_output(path: str):
+    try:
+        if path and os.path.exists(path):
+            os.remove(path)
+    except OSError as e:
+        print(f"Could not remove {path}: {e}")
+
+def remove_stream(task_id: str):
+    shutil.rmtree(os.path.join(STREAM_DIR, task_id), ignore_errors=True)
+
+def finish_cancelled(task_id: str, output_path: str, user_id: str):
+    """Drops the partial output and marks the task cancelled."""
+    remove_output(output_path)
+    remove_stream(task_id)
+    update_task(task_id, status="cancelled")
+    manager.broadcast_threadsafe({"status": "cancelled"}, userId=user_id, task_id=task_id)
+    print(f"Task {task_id} cancelled")
+
 def process_video_task(task_id: str, video_path: str, mode: str = "static", user_id: str = "anonymous"):
     """
     Background task to process video and update status.
     """
     global tracker, zone_tracker
+    wait_for_models()
     if not tracker or ((mode == "zone" or mode == "conveyor") and not zone_tracker):
         print("Tracker(s) not initialized!")
-        tasks[task_id] = {"status": "failed", "error": "Tracker not initialized", "user_id": user_id}
-        save_tasks()
+        task_tokens.pop(task_id, None)
+        set_task(task_id, {"status": "failed", "error": "Tracker not initialized", "user_id": user_id})
         return
 
     print(f"Starting task {task_id} for {video_path} in mode {mode}")
+    cancel_token = task_tokens.setdefault(task_id, CancelToken())
+    slot = JobSlot(job_slots, cancel_token)
     
     # Callback for real-time updates with persistence
     def safe_broadcast(data: dict):
         # Update persistent task store if progress/count is available
-        if task_id in tasks:
-            if "progress" in data:
-                tasks[task_id]["progress"] = data["progress"]
-            if "count" in data:
-                tasks[task_id]["results_count"] = data["count"]
-            save_tasks()
+        changes = {}
+        if "progress" in data:
+            changes["progress"] = data["progress"]
+        if "count" in data:
+            changes["results_count"] = data["count"]
+        if changes:
+            update_task(task_id, **changes)
         
-        try:
-            asyncio.run(manager.broadcast(data, userId=user_id))
-        except:
-            pass
+        manager.broadcast_threadsafe(data, userId=user_id, task_id=task_id)
+
+    def publish_frame(frame, frame_idx, count):
+        preview_hub.publish(task_id, frame, frame_idx, count)
         
     try:
         # Save output to detections folder with a clean name
         output_filename = f"detected_{task_id}.mp4"
         output_video_path = os.path.join(DETECTION_DIR, output_filename)
         
+        is_zone = mode == "zone" or mode == "conveyor"
+        cache_key = result_cache_key(task_id, video_path, mode, zone_tracker if is_zone else tracker)
+        cached = result_cache.get(cache_key) if cache_key else None
+        if cached:
+            # Same file + same config already processed: reuse the stored result
+            result_cache.materialize(cache_key, cached, output_video_path)
+            reported_count = cached["results"]["count"]
+            if not is_zone:
+                tracker.total_count += reported_count # Same session semantics as a real run
+            safe_broadcast({"count": reported_count, "progress": 100, "status": "completed"})
+            count_store.record(reported_count, zone=mode, user=user_id)
+            # The first run of this file recorded its detections under the same key, so /recount works here too
+            detections_key = detection_cache_key(task_id, video_path, zone_tracker) if is_zone else None
+            set_task(task_id, {
+                "status": "completed",
+                "count": reported_count,
+                "results_count": reported_count,
+                "video_url": f"/download/{output_filename}",
+                "cache": "hit",
+                "detections_key": detections_key if detections_key and detection_cache.has(detections_key) else None
+            })
+            print(f"Task {task_id} served from result cache")
+            return
+
         # Run tracking and save video with callback
         # v5: Modular Choice between Tracking types
-        if mode == "zone" or mode == "conveyor":
+        # Cancelled while still queued; a paused job (e.g. paused before a restart) waits here without a slot
+        if cancel_token.should_stop():
+            finish_cancelled(task_id, output_video_path, user_id)
+            return
+        # Jobs beyond the plan's slots wait here instead of oversubscribing the cores
+        if not slot.acquire():
+            finish_cancelled(task_id, output_video_path, user_id)
+            return
+        # A paused job lends its slot to the next one and queues for it again on resume
+        cancel_token.on_pause = slot.pause
+        cancel_token.on_resume = slot.resume
+        # Periodic checkpoints let an interrupted job resume after a restart. They split the
+        # output into segments, so only when ffmpeg can join them without re-encoding
+        checkpoint = VideoCheckpoint(task_id, CHECKPOINT_DIR) if CHECKPOINTS_ENABLED and concat_supported() else None
+        # Processed part is watchable (HLS) before the job finishes
+        stream_dir = os.path.join(STREAM_DIR, task_id) if hls_supported() else None
+        if stream_dir:
+            update_task(task_id, stream_url=f"/tasks/{task_id}/stream/{HLS_PLAYLIST}")
+        detections_key = None
+        if is_zone:
+            # Tracked boxes are kept so the counting can be re-tuned later without the model (/recount)
+            detections_key = detection_cache_key(task_id, video_path, zone_tracker)
+            recorder = DetectionRecorder() if detections_key else None
             zone_tracker.reset_state() # v10.6 Fix: Prevent count leakage across videos
-            results = zone_tracker.process_video(video_path, output_video_path, on_update=safe_broadcast)
+            results = zone_tracker.process_video(video_path, output_video_path, on_update=safe_broadcast, on_frame=publish_frame,
+                                                 cancel_token=cancel_token, checkpoint=checkpoint, stream_dir=stream_dir,
+                                                 detections=recorder)
+            if recorder is not None and results.get("status") == "completed":
+                if not detection_cache.put(detections_key, recorder):
+                    detections_key = None # Resumed job: the recording is partial
         else:
             tracker.reset_state() # v10.6 Fix: Standardize reset for all modes
-            results = tracker.process_video(video_path, output_video_path, mode=mode, on_update=safe_broadcast)
+            results = tracker.process_video(video_path, output_video_path, mode=mode, on_update=safe_broadcast, on_frame=publish_frame,
+                                            cancel_token=cancel_token, checkpoint=checkpoint, stream_dir=stream_dir)
+        end_stream(stream_dir)
+        if checkpoint is not None:
+            checkpoint.discard()
+        if results.get("status") == "cancelled":
+            finish_cancelled(task_id, output_video_path, user_id)
+            return
         
         # Results now contains the count directly from the tracker
         final_count = results.get("count", 0)
@@ -216,88 +485,144 @@ def process_video_task(task_id: str, video_path: str, mode: str = "static", user
         # Force a final broadcast of the global total to ensure UI is in sync
         # v13.0 Precision Fix: Broadcast ONLY the current task's count.
         # This prevents the Summation Bug (6 bag bug)
-        safe_broadcast({"count": reported_count})
+        safe_broadcast({"count": reported_count, "progress": 100, "status": "completed"})
+        
+        if cache_key and results.get("status") == "completed":
+            result_cache.put(cache_key, output_video_path, {"count": reported_count})
+        count_store.record(reported_count, zone=mode, user=user_id)
         
-        tasks[task_id] = {
+        set_task(task_id, {
             "status": "completed",
             "count": reported_count,
             "results_count": reported_count,
-            "video_url": f"/download/{output_filename}"
-        }
-        save_tasks()
+            "video_url": f"/download/{output_filename}",
+            "cache": "miss" if cache_key else "disabled",
+            "encode": results.get("encode"),
+            "stream_url": f"/tasks/{task_id}/stream/{HLS_PLAYLIST}" if stream_dir else None,
+            "detections_key": detections_key
+        })
         
-        # Optional: Clean up input file after processing
-        # if os.path.exists(video_path):
-        #     os.remove(video_path)
+        # The input stays for re-runs; the retention manager removes it once uploads exceed their budget
         
     except Exception as e:
         print(f"Task {task_id} failed: {e}")
-        tasks[task_id] = {"status": "failed", "error": str(e)}
-        save_tasks()
-        
-    except Exception as e:
-        print(f"Task {task_id} failed: {e}")
-        tasks[task_id] = {"status": "failed", "error": str(e)}
+        VideoCheckpoint(task_id, CHECKPOINT_DIR).discard()
+        remove_stream(task_id)
+        set_task(task_id, {"status": "failed", "error": str(e)})
+        manager.broadcast_threadsafe({"status": "failed"}, userId=user_id, task_id=task_id)
+    finally:
+        slot.release()
+        task_tokens.pop(task_id, None)
+
+INTERRUPTED_STATUSES = ("processing", "paused", "cancelling")
+
+def resume_interrupted_tasks():
+    """
+    Re-queues jobs that were running when the server stopped. Video jobs
+    continue from their last checkpoint (paused ones stay paused); images
+    simply run again.
+    """
+    interrupted = [(task_id, dict(task)) for task_id, task in list(tasks.items())
+                   if task.get("status") in INTERRUPTED_STATUSES]
+    jobs = []
+    for task_id, task in interrupted:
+        path = task.get("path")
+        if task["status"] == "cancelling":
+            VideoCheckpoint(task_id, CHECKPOINT_DIR).discard()
+            update_task(task_id, status="cancelled")
+        elif not path or not os.path.exists(path):
+            VideoCheckpoint(task_id, CHECKPOINT_DIR).discard()
+            update_task(task_id, status="failed", error="Interrupted by a restart and the upload is no longer available")
+        else:
+            token = task_tokens[task_id] = CancelToken()
+            if task["status"] == "paused" and not path.lower().endswith(IMAGE_EXTENSIONS):
+                token.pause() # Stays paused until /resume (images are quick and run again)
+                update_task(task_id, resumed=True)
+            else:
+                update_task(task_id, status="processing", resumed=True)
+            jobs.append((task_id, task))
+    if not jobs:
+        return
+
+    def run(jobs):
+        for task_id, task in jobs:
+            print(f"Resuming interrupted task {task_id}")
+            if task["path"].lower().endswith(IMAGE_EXTENSIONS):
+                process_image_task(task_id, task["path"], task.get("user_id", "anonymous"))
+            else:
+                process_video_task(task_id, task["path"], task.get("mode", "static"), task.get("user_id", "anonymous"))
+
+    # Same one-after-another order BackgroundTasks would give them; paused jobs wait on their own
+    # threads, so they don't hold up the others
+    paused = [job for job in jobs if task_tokens[job[0]].paused]
+    threading.Thread(target=run, args=([job for job in jobs if job not in paused],), name="resume-tasks",
+                     daemon=True).start()
+    for job in paused:
+        threading.Thread(target=run, args=([job],), name=f"resume-{job[0]}", daemon=True).start()
 
 def process_image_task(task_id: str, image_path: str, user_id: str = "anonymous"):
     """
     Background task to process an image.
     """
     global tracker
+    wait_for_models()
     if not tracker:
-        tasks[task_id] = {"status": "failed", "error": "Tracker not initialized", "user_id": user_id}
-        save_tasks()
+        task_tokens.pop(task_id, None)
+        set_task(task_id, {"status": "failed", "error": "Tracker not initialized", "user_id": user_id})
         return
 
     print(f"Starting image task {task_id} for {image_path}")
+    cancel_token = task_tokens.setdefault(task_id, CancelToken())
     
     # Callback for real-time updates
     def safe_broadcast(data: dict):
-        asyncio.run(manager.broadcast(data, userId=user_id))
+        manager.broadcast_threadsafe(data, userId=user_id, task_id=task_id)
+
+    def publish_frame(frame, frame_idx, count):
+        preview_hub.publish(task_id, frame, frame_idx, count)
     
     try:
         output_filename = f"detected_{task_id}.jpg"
         output_path = os.path.join(DETECTION_DIR, output_filename)
         
-        # Run processing with callback
-        results = tracker.process_image(image_path, output_path, on_update=safe_broadcast)
+        cache_key = result_cache_key(task_id, image_path, "image", tracker)
+        cached = result_cache.get(cache_key) if cache_key else None
+        if cached:
+            result_cache.materialize(cache_key, cached, output_path)
+            results = dict(cached["results"])
+            tracker.total_count += results.get("count", 0) # Same session semantics as a real run
+            results["cache"] = "hit"
+        else:
+            # Run processing with callback
+            results = tracker.process_image(image_path, output_path, on_update=safe_broadcast, on_frame=publish_frame,
+                                            cancel_token=cancel_token)
+            if results.get("status") == "cancelled":
+                finish_cancelled(task_id, output_path, user_id)
+                return
+            if cache_key and results.get("status") == "completed":
+                result_cache.put(cache_key, output_path, {"count": results["count"], "status": "completed"})
+            results["cache"] = "miss" if cache_key else "disabled"
         
         # Add to task results
         results["video_url"] = f"/download/{output_filename}" # Frontend expects video_url for display
         results["is_image"] = True # Flag for frontend
         results["user_id"] = user_id
-        tasks[task_id] = results
-        save_tasks()
-        asyncio.run(manager.broadcast({"count": tracker.total_count}, userId=user_id))
+        count_store.record(results.get("count", 0), zone="image", user=user_id)
+        set_task(task_id, results)
+        manager.broadcast_threadsafe({"count": tracker.total_count, "status": "completed"}, userId=user_id, task_id=task_id)
         
     except Exception as e:
         print(f"Task {task_id} failed: {e}")
-        tasks[task_id] = {"status": "failed", "error": str(e)}
-        save_tasks()
+        set_task(task_id, {"status": "failed", "error": str(e)})
+    finally:
+        task_tokens.pop(task_id, None)
+
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.webp')
+
+def validate_mode(filename: str, mode: str):
+    """Returns an error response if the file type doesn't fit the mode, else None."""
+    is_image = filename.lower().endswith(IMAGE_EXTENSIONS)
 
-@app.post("/upload")
-async def upload_file(
-    background_tasks: BackgroundTasks, 
-    file: UploadFile = File(...), 
-    mode: str = Form("static"),
-    user_id: str = Form("anonymous")
-):
-    """
-    Uploads a file (Video or Image) and starts processing.
-    """
-    # Generate unique ID
-    task_id = str(uuid.uuid4())
-    filename = file.filename.lower()
-    
-    # Save file
-    file_location = os.path.join(UPLOAD_DIR, f"{task_id}_{file.filename}")
-    with open(file_location, "wb+") as file_object:
-        file_object.write(await file.read())
-    
-    # Determine type
-    is_image = filename.endswith(('.jpg', '.jpeg', '.png', '.webp'))
-    
-    # Validation based on Mode
     if mode == "static" and not is_image:
         return JSONResponse(status_code=400, content={"message": "Static Mode strictly supports IMAGES only (JPG, PNG). Please upload an image."})
     
@@ -306,14 +631,21 @@ async def upload_file(
 
     if (mode == "zone" or mode == "conveyor") and is_image:
         return JSONResponse(status_code=400, content={"message": "Zone Mode supports VIDEOS only. Please upload a video."})
+    return None
+
+def start_processing(background_tasks: BackgroundTasks, task_id: str, file_location: str, filename: str,
+                     mode: str, user_id: str, sha256: str = None, size: int = None):
+    """Registers the task and schedules the matching background job."""
+    is_image = filename.lower().endswith(IMAGE_EXTENSIONS)
 
     # v13.0 Critical Reset: Standardize clean slate for ALL trackers
     if tracker: tracker.reset_state()
     if zone_tracker: zone_tracker.reset_state()
     
     # Initial task status
-    tasks[task_id] = {"status": "processing", "progress": 0, "file": file.filename, "mode": mode, "user_id": user_id}
-    save_tasks()
+    task_tokens[task_id] = CancelToken()
+    set_task(task_id, {"status": "processing", "progress": 0, "file": filename, "mode": mode, "user_id": user_id,
+                      "sha256": sha256, "size": size, "path": file_location})
     
     # Start background processing
     if is_image:
@@ -323,6 +655,93 @@ async def upload_file(
     
     return {"task_id": task_id, "message": "Upload accepted and processing started."}
 
+@app.post("/upload")
+async def upload_file(
+    background_tasks: BackgroundTasks, 
+    file: UploadFile = File(...), 
+    mode: str = Form("static"),
+    user_id: str = Form("anonymous")
+):
+    """
+    Uploads a file (Video or Image) and starts processing.
+    The body is streamed to disk in fixed-size chunks and hashed on the way.
+    """
+    filename = safe_filename(file.filename)
+
+    # Validation based on Mode (before writing anything to disk)
+    error = validate_mode(filename, mode)
+    if error:
+        return error
+
+    # Generate unique ID
+    task_id = str(uuid.uuid4())
+    
+    # Save file
+    file_location = os.path.join(UPLOAD_DIR, f"{task_id}_{filename}")
+    try:
+        sha256, size = await save_upload_stream(file, file_location)
+    except UploadError as e:
+        raise HTTPException(status_code=e.status_code, detail=str(e))
+    
+    return start_processing(background_tasks, task_id, file_location, filename, mode, user_id, sha256, size)
+
+# --- RESUMABLE UPLOADS (init -> PUT chunk N -> complete) ---
+
+@app.post("/uploads")
+async def init_upload(
+    filename: str = Form(...),
+    size: int = Form(...),
+    mode: str = Form("static"),
+    user_id: str = Form("anonymous")
+):
+    """Starts a resumable upload. Clients then PUT chunks of `chunk_size` bytes."""
+    error = validate_mode(filename, mode)
+    if error:
+        return error
+    try:
+        return resumable_uploads.init(filename, size, mode=mode, user_id=user_id)
+    except UploadError as e:
+        raise HTTPException(status_code=e.status_code, detail=str(e))
+
+@app.get("/uploads/{upload_id}")
+def get_upload_status(upload_id: str):
+    """Lists missing chunks so an interrupted client knows where to resume."""
+    try:
+        return resumable_uploads.status(upload_id)
+    except UploadError as e:
+        raise HTTPException(status_code=e.status_code, detail=str(e))
+
+@app.put("/uploads/{upload_id}/chunks/{index}")
+async def put_upload_chunk(upload_id: str, index: int, request: Request):
+    """Raw chunk body; optional X-Chunk-SHA256 header is verified before the chunk is accepted."""
+    try:
+        return await resumable_uploads.write_chunk(
+            upload_id, index, request.stream(), request.headers.get("x-chunk-sha256")
+        )
+    except UploadError as e:
+        raise HTTPException(status_code=e.status_code, detail=str(e))
+
+@app.post("/uploads/{upload_id}/complete")
+async def complete_upload(background_tasks: BackgroundTasks, upload_id: str, sha256: str = Form(None)):
+    """Assembles the upload and starts processing it like /upload would."""
+    try:
+        file_location, file_hash, size, meta = await run_in_threadpool(
+            resumable_uploads.complete, upload_id, UPLOAD_DIR, sha256
+        )
+    except UploadError as e:
+        raise HTTPException(status_code=e.status_code, detail=str(e))
+    return start_processing(background_tasks, upload_id, file_location, meta["filename"],
+                            meta.get("mode", "static"), meta.get("user_id", "anonymous"), file_hash, size)
+
+@app.delete("/uploads/{upload_id}")
+def abort_upload(upload_id: str):
+    try:
+        resumable_uploads.status(upload_id)
+    except UploadError as e:
+        raise HTTPException(status_code=e.status_code, detail=str(e))
+    resumable_uploads.abort(upload_id)
+    return {"upload_id": upload_id, "status": "aborted"}
+
 @app.post("/reset")
 async def reset_session():
     """Resets the session count and history."""
@@ -335,66 +754,367 @@ async def reset_session():
         except Exception as e:
             print(f"Zone reset failed: {e}")
             
+    cameras.reset_counts()
+            
     # Broadcast reset to all clients
     await manager.broadcast({"count": 0, "event": "reset"})
     return {"message": "Session reset successfully", "count": 0}
 
+@app.get("/metrics/counts")
+def metrics_counts(request: Request, step: int = None, by: str = None, camera: str = None,
+                   zone: str = None, user: str = None):
+    """
+    Bagged counts over time. `from`/`to` are unix seconds (default: last 24h),
+    `step` the bucket size in seconds (default: ~100 points over the range).
+    Filter with camera=/zone=/user=, or split by=camera|zone|user.
+    """
+    now = int(time.time())
+    try:
+        start = int(request.query_params.get("from", now - 86400))
+        end = int(request.query_params.get("to", now))
+    except ValueError:
+        raise HTTPException(status_code=400, detail="from/to must be unix timestamps")
+    if step is None:
+        step = max(60, (end - start) // 100)
+
+    series = [(dim, key) for dim, key in (("camera", camera), ("zone", zone), ("user", user)) if key is not None]
+    if by is not None:
+        if by not in DIMENSIONS:
+            raise HTTPException(status_code=400, detail=f"by must be one of {', '.join(DIMENSIONS)}")
+        series += [(by, key) for key in count_store.keys(by)]
+    try:
+        timestamps, values, resolution = count_store.query(start, end, step, series or None)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return {
+        "from": timestamps[0] if timestamps else start,
+        "to": end,
+        "step": timestamps[1] - timestamps[0] if len(timestamps) > 1 else step,
+        "resolution": resolution,
+        "timestamps": timestamps,
+        "series": values,
+    }
+
+@app.get("/scheduler/stats")
+def scheduler_stats():
+    """Queue depth, batch sizes and latency vs target per priority class."""
+    return scheduler.stats()
+
+@app.get("/plan")
+def execution_plan():
+    """Chosen workers x threads, the measured throughput of each candidate, and job slots."""
+    return dict(planner.stats(), jobs=job_slots.stats())
+
+@app.post("/plan/benchmark")
+def rerun_execution_plan():
+    """Re-benchmarks the machine in the background (best run while idle)."""
+    if not models_ready.is_set() or getattr(tracker, "model", None) is None:
+        raise HTTPException(status_code=503, detail="Models not loaded")
+    if planner.running:
+        raise HTTPException(status_code=409, detail="Benchmark already running")
+    threading.Thread(target=plan_execution, kwargs={"force": True}, name="exec-planner", daemon=True).start()
+    return {"status": "benchmarking"}
+
+@app.get("/metrics/stats")
+def metrics_stats():
+    return count_store.stats()
+
+TERMINAL_STATUSES = ("completed", "failed", "cancelled")
+
 @app.get("/tasks/{task_id}")
-def get_task_status(task_id: str):
+async def get_task_status(task_id: str, since_version: int = None, timeout: float = LONG_POLL_TIMEOUT):
+    """
+    Returns the task record. With ?since_version=N this becomes a long-poll:
+    the request is held until the task's version exceeds N (or timeout).
+    """
+    if task_id not in tasks:
+        raise HTTPException(status_code=404, detail="Task not found")
+    if since_version is not None:
+        await task_watcher.wait_for_change(task_id, since_version, min(max(timeout, 0), LONG_POLL_TIMEOUT))
     task = tasks.get(task_id)
     if not task:
         raise HTTPException(status_code=404, detail="Task not found")
     return task
 
-def generate_frames():
+STREAM_MEDIA_TYPES = {".m3u8": "application/vnd.apple.mpegurl", ".ts": "video/mp2t"}
+
+@app.get("/tasks/{task_id}/stream/{name}")
+def task_stream(task_id: str, name: str):
     """
-    Generator for camera stream using Singleton Manager. 
+    HLS playlist and segments of a video task, growing while it processes.
+    Served from disk with Range support; the playlist is never cached.
+    """
+    name = os.path.basename(name)
+    media_type = STREAM_MEDIA_TYPES.get(os.path.splitext(name)[1])
+    path = os.path.join(STREAM_DIR, task_id, name)
+    if task_id not in tasks or media_type is None or not os.path.isfile(path):
+        raise HTTPException(status_code=404, detail="Stream not found")
+    if retention:
+        retention.touch(task_id)
+    headers = {"Cache-Control": "no-cache"} if name == HLS_PLAYLIST else None
+    return FileResponse(path, media_type=media_type, headers=headers)
+
+@app.get("/tasks/{task_id}/output")
+def task_output(task_id: str):
+    """Annotated output of a task, brought back from the cold tier first if it was moved there."""
+    task = tasks.get(task_id)
+    if task is None:
+        raise HTTPException(status_code=404, detail="Task not found")
+    name = f"detected_{task_id}.{'jpg' if task.get('is_image') else 'mp4'}"
+    path = os.path.join(DETECTION_DIR, name)
+    if not os.path.exists(path) and retention:
+        path = retention.restore(name, DETECTION_DIR)
+        if path:
+            update_task(task_id, video_url=f"/download/{name}", storage=None)
+    if not path or not os.path.exists(path):
+        raise HTTPException(status_code=404, detail="Output no longer available")
+    if retention:
+        retention.touch(task_id)
+    return FileResponse(path)
+
+@app.post("/tasks/{task_id}/recount")
+def recount_task(task_id: str, params: dict):
+    """
+    Re-counts a finished zone / conveyor task with other counting parameters
+    (e.g. {"exit_threshold": 40, "dedup_radius": 50}) by replaying its cached
+    detections. The task record and the live tracker are left unchanged.
+    """
+    task = tasks.get(task_id)
+    if task is None:
+        raise HTTPException(status_code=404, detail="Task not found")
+    if not zone_tracker or not hasattr(zone_tracker, "replay"):
+        raise HTTPException(status_code=503, detail="Zone tracker not available")
+    unknown = set(params) - set(zone_tracker.TUNABLE_PARAMS)
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown parameters {sorted(unknown)}; "
+                                                    f"tunable: {list(zone_tracker.TUNABLE_PARAMS)}")
+    if any(not isinstance(v, (int, float)) or isinstance(v, bool) for v in params.values()):
+        raise HTTPException(status_code=400, detail="Parameters must be numbers")
+    detections = detection_cache.get(task["detections_key"]) if detection_cache and task.get("detections_key") else None
+    if detections is None:
+        raise HTTPException(status_code=404, detail="No cached detections for this task")
+
+    counter = copy.copy(zone_tracker) # Shares the model, gets its own counting state in reset_state()
+    for name, value in params.items():
+        setattr(counter, name, value)
+    started = time.perf_counter()
+    results = counter.replay(detections)
+    return {
+        "task_id": task_id,
+        "count": results["count"],
+        "original_count": task.get("count"),
+        "params": {name: getattr(counter, name) for name in zone_tracker.TUNABLE_PARAMS},
+        "frames": results["frames"],
+        "seconds": round(time.perf_counter() - started, 3),
+    }
+
+@app.get("/storage/stats")
+def storage_stats():
+    """Bytes per storage area against its budget, and what retention has removed or moved."""
+    return retention.stats() if retention else {"enabled": False}
+
+@app.delete("/tasks/{task_id}")
+def delete_task(task_id: str):
+    """
+    Cancels a queued, running or paused task (its job stops within one frame
+    and the partial output is removed). A finished task is deleted together
+    with its output file.
+    """
+    if task_id not in tasks:
+        raise HTTPException(status_code=404, detail="Task not found")
+    token = task_tokens.get(task_id)
+    if token is not None:
+        # The job still owns the record until it finishes; repeated DELETEs just report that
+        if not token.cancelled:
+            update_task(task_id, status="cancelling") # Before cancel(), so the job's final "cancelled" wins
+            token.cancel()
+        return {"task_id": task_id, "status": "cancelling"}
+
+    with _tasks_lock:
+        task = tasks.pop(task_id, None)
+    if task and task.get("video_url"):
+        remove_output(os.path.join(DETECTION_DIR, os.path.basename(task["video_url"])))
+    if retention:
+        for name in (f"detected_{task_id}.mp4", f"detected_{task_id}.jpg"):
+            remove_output(retention.cold_path(name))
+    remove_stream(task_id)
+    save_tasks()
+    task_watcher.bump(task_id) # Wake SSE / long-poll waiters so they see it is gone
+    task_watcher.forget(task_id)
+    return {"task_id": task_id, "status": "deleted"}
+
+@app.post("/tasks/{task_id}/pause")
+def pause_task(task_id: str):
+    """Parks a running video job at its next frame; it holds no CPU until resumed."""
+    token = task_tokens.get(task_id)
+    if token is None or token.cancelled:
+        raise HTTPException(status_code=409, detail="Task is not running")
+    if (tasks.get(task_id, {}).get("path") or "").lower().endswith(IMAGE_EXTENSIONS):
+        raise HTTPException(status_code=409, detail="Image tasks cannot be paused")
+    token.pause()
+    update_task(task_id, status="paused")
+    return {"task_id": task_id, "status": "paused"}
+
+@app.post("/tasks/{task_id}/resume")
+def resume_task(task_id: str):
+    token = task_tokens.get(task_id)
+    if token is None or token.cancelled:
+        raise HTTPException(status_code=409, detail="Task is not running")
+    token.resume()
+    update_task(task_id, status="processing")
+    return {"task_id": task_id, "status": "processing"}
+
+@app.get("/tasks/{task_id}/events")
+async def task_events(task_id: str, request: Request):
+    """
+    Server-sent events: one `task` event per version change, ending once the
+    task reaches a terminal status. Honours Last-Event-ID on reconnect.
+    """
+    if task_id not in tasks:
+        raise HTTPException(status_code=404, detail="Task not found")
+    try:
+        last_seen = int(request.headers.get("last-event-id", -1))
+    except ValueError:
+        last_seen = -1
+
+    async def event_stream():
+        nonlocal last_seen
+        yield "retry: 3000\n\n"
+        while True:
+            version = await task_watcher.wait_for_change(task_id, last_seen, SSE_HEARTBEAT)
+            if await request.is_disconnected():
+                break
+            task = tasks.get(task_id)
+            if task is None:
+                yield "event: gone\ndata: {}\n\n"
+                break
+            if version <= last_seen:
+                yield ": keep-alive\n\n"
+                continue
+            last_seen = version
+            with _tasks_lock:
+                payload = json.dumps(task, separators=(',', ':'))
+            yield f"id: {version}\nevent: task\ndata: {payload}\n\n"
+            if task.get("status") in TERMINAL_STATUSES:
+                break
+
+    return StreamingResponse(event_stream(), media_type="text/event-stream",
+                             headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+def get_live_tracker():
+    return tracker
+
+# Every live source (CAMERA_SOURCES) shares one batched inference loop
+def record_live_count(camera_id: str, n: int):
+    count_store.record(n, camera=camera_id, zone="live")
+
+cameras = CameraRegistry(get_live_tracker, on_count=record_live_count)
+cameras.load()
+
+def get_camera(camera_id: str = None):
+    camera = cameras.get(camera_id)
+    if camera is None:
+        raise HTTPException(status_code=404, detail="Camera not found")
+    return camera
+
+async def generate_frames(camera):
+    """
+    Multipart MJPEG for one viewer. Reads the latest frame published for the
+    camera by the shared inference loop; never touches the device or the model.
     """
-    global tracker, _camera_active
     if not tracker:
         return
 
-    cap = CameraManager.get_cap()
-    
+    broadcaster = camera.broadcaster
+    broadcaster.subscribers += 1
+    seq = 0
     try:
-        while _camera_active:
-            success, frame = cap.read()
-            if not success:
-                # If camera fails during stream, try to reset singleton
-                CameraManager.stop()
-                break
-            
-            # Run Live AI Processing
-            frame = tracker.process_live_frame(frame)
-            
-            ret, buffer = cv2.imencode('.jpg', frame)
-            frame_bytes = buffer.tobytes()
+        while camera.active:
+            seq, frame_bytes = await broadcaster.next_frame(seq, timeout=1.0)
+            if frame_bytes is None:
+                continue # Slow camera or nothing published yet; loop re-checks active
             yield (b'--frame\r\n'
                 b'Content-Type: image/jpeg\r\n\r\n' + frame_bytes + b'\r\n')
-            
-            # Small sleep to yield control
-            import time
-            time.sleep(0.01)
     finally:
+        broadcaster.subscribers -= 1
         # We don't release here anymore, we wait for explicit /camera/off
-        print("Stream Generator segment ended.")
+        print(f"Stream Generator segment ended ({camera.camera_id}).")
+
+def stream_response(camera):
+    return StreamingResponse(generate_frames(camera), media_type="multipart/x-mixed-replace; boundary=frame")
 
 @app.get("/stream")
 def video_feed():
-    return StreamingResponse(generate_frames(), media_type="multipart/x-mixed-replace; boundary=frame")
+    camera = cameras.get()
+    if camera is None:
+        return StreamingResponse(iter(()), media_type="multipart/x-mixed-replace; boundary=frame")
+    return stream_response(camera)
+
+@app.get("/stream/stats")
+def stream_stats():
+    return cameras.stats()
+
+@app.get("/stream/{camera_id}")
+def camera_feed(camera_id: str):
+    return stream_response(get_camera(camera_id))
+
+@app.get("/cameras")
+def list_cameras():
+    return [camera.stats() for camera in list(cameras.cameras.values())]
+
+@app.post("/cameras")
+async def add_camera(camera_id: str = Form(...), source: str = Form(...), start: bool = Form(False)):
+    try:
+        camera = cameras.add(camera_id, source)
+    except ValueError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    if start and not await run_in_threadpool(cameras.start_camera, camera_id):
+        raise HTTPException(status_code=502, detail=camera.error)
+    return camera.stats()
+
+@app.delete("/cameras/{camera_id}")
+async def remove_camera(camera_id: str):
+    get_camera(camera_id)
+    await run_in_threadpool(cameras.remove, camera_id)
+    return {"camera_id": camera_id, "status": "removed"}
+
+@app.get("/cameras/{camera_id}/counts")
+def camera_counts(camera_id: str, since: int = None):
+    """Per-hour (or per-shift, see ROLLUP_BUCKET_SECONDS) counts for a camera; `since` is a unix timestamp."""
+    camera = get_camera(camera_id)
+    rollup = camera.live_counts.rollup
+    return {
+        "camera_id": camera_id,
+        "count": camera.total_count,
+        "bucket_seconds": rollup.bucket_seconds,
+        "buckets": rollup.series(since),
+    }
+
+@app.post("/cameras/{camera_id}/on")
+async def start_camera(camera_id: str):
+    camera = get_camera(camera_id)
+    if not await run_in_threadpool(cameras.start_camera, camera_id):
+        raise HTTPException(status_code=502, detail=camera.error)
+    return {"camera_id": camera_id, "status": "camera_powering_up"}
+
+@app.post("/cameras/{camera_id}/off")
+async def stop_camera(camera_id: str):
+    get_camera(camera_id)
+    await run_in_threadpool(cameras.stop_camera, camera_id) # HARD STOP HARDWARE
+    return {"camera_id": camera_id, "status": "camera_shutting_down"}
 
 @app.post("/camera/on")
 async def camera_on():
-    global _camera_active
-    _camera_active = True
+    camera = get_camera()
+    if tracker:
+        await run_in_threadpool(cameras.start_camera, camera.camera_id)
     print("UI Requested Camera ON")
     return {"status": "camera_powering_up"}
 
 @app.post("/camera/off")
 async def camera_off():
-    global _camera_active
-    _camera_active = False
-    CameraManager.stop() # HARD STOP HARDWARE
+    camera = get_camera()
+    await run_in_threadpool(cameras.stop_camera, camera.camera_id) # HARD STOP HARDWARE
     print("UI Requested Camera OFF - HARDWARE KILLED")
     return {"status": "camera_shutting_down"}
 
@@ -0,0 +1,205 @@
+import os
+import threading
+import time
+from array import array
+from bisect import bisect_left, bisect_right
+
+import numpy as np
+
+# Count time-series store
+METRICS_FLUSH_SECONDS = int(os.getenv("METRICS_FLUSH_SECONDS", "60"))
+METRICS_MAX_POINTS = int(os.getenv("METRICS_MAX_POINTS", "1000")) # Upper bound on points per query
+
+# Pre-aggregated resolutions (bucket seconds -> buckets kept per series)
+RESOLUTIONS = (
+    (60, int(os.getenv("METRICS_MINUTE_BUCKETS", str(14 * 24 * 60)))), # 14 days of minutes
+    (3600, int(os.getenv("METRICS_HOUR_BUCKETS", str(400 * 24)))), # ~13 months of hours
+    (86400, int(os.getenv("METRICS_DAY_BUCKETS", str(10 * 366)))), # 10 years of days
+)
+DIMENSIONS = ("camera", "zone", "user")
+TOTAL_SERIES = ("total", "all")
+
+
+class Column:
+    """
+    One series at one resolution: parallel arrays of bucket starts and counts.
+    Events arrive (almost) in time order, so recording is an append or an
+    in-place add on the last bucket; old buckets are trimmed from the front.
+    """
+    def __init__(self, bucket_seconds, max_buckets, starts=None, counts=None):
+        self.bucket_seconds = bucket_seconds
+        self.max_buckets = max_buckets
+        self.starts = array('q', starts if starts is not None else [])
+        self.counts = array('q', counts if counts is not None else [])
+
+    def add(self, ts, n):
+        start = int(ts) // self.bucket_seconds * self.bucket_seconds
+        if self.starts and self.starts[-1] == start:
+            self.counts[-1] += n
+        elif not self.starts or self.starts[-1] < start:
+            self.starts.append(start)
+            self.counts.append(n)
+            if len(self.starts) > self.max_buckets:
+                drop = len(self.starts) - self.max_buckets
+                del self.starts[:drop]
+                del self.counts[:drop]
+        else:
+            # Late event (e.g. a task finishing out of order)
+            i = bisect_left(self.starts, start)
+            if i < len(self.starts) and self.starts[i] == start:
+                self.counts[i] += n
+            elif i > 0 or len(self.starts) < self.max_buckets:
+                self.starts.insert(i, start)
+                self.counts.insert(i, n)
+
+    @property
+    def oldest(self):
+        return self.starts[0] if self.starts else None
+
+    def range(self, start, end):
+        """Buckets with start <= t < end, as numpy views (no copy of the arrays)."""
+        lo = bisect_left(self.starts, start)
+        hi = bisect_right(self.starts, end - 1)
+        starts = np.frombuffer(self.starts, dtype=np.int64)[lo:hi] if hi > lo else np.empty(0, dtype=np.int64)
+        counts = np.frombuffer(self.counts, dtype=np.int64)[lo:hi] if hi > lo else np.empty(0, dtype=np.int64)
+        return starts, counts
+
+
+class CountStore:
+    """
+    Embedded time-series store for bag counts. Every event is added to the
+    "total/all" series and to its camera / zone / user series, at minute,
+    hour and day resolution. Queries read the coarsest resolution that
+    still fits the requested step, so a month at hourly steps touches at
+    most ~750 buckets regardless of how many bags were counted.
+    Persisted as a single .npz file.
+    """
+    def __init__(self, path=None, resolutions=RESOLUTIONS):
+        self.path = path
+        self.resolutions = resolutions
+        self.series = {} # (dimension, key) -> [Column per resolution]
+        self.dirty = False
+        self.last_flush = time.time()
+        self._lock = threading.Lock()
+        if path and os.path.exists(path):
+            self.load()
+
+    def _columns(self, dimension, key):
+        columns = self.series.get((dimension, key))
+        if columns is None:
+            columns = [Column(seconds, keep) for seconds, keep in self.resolutions]
+            self.series[(dimension, key)] = columns
+        return columns
+
+    def record(self, n=1, ts=None, camera=None, zone=None, user=None):
+        """Adds n counted bags at ts (unix seconds, default now)."""
+        if n <= 0:
+            return
+        ts = time.time() if ts is None else ts
+        targets = [TOTAL_SERIES]
+        for dimension, key in (("camera", camera), ("zone", zone), ("user", user)):
+            if key is not None:
+                targets.append((dimension, str(key)))
+        with self._lock:
+            for dimension, key in targets:
+                for column in self._columns(dimension, key):
+                    column.add(ts, n)
+            self.dirty = True
+
+    def keys(self, dimension):
+        with self._lock:
+            return sorted(key for dim, key in self.series if dim == dimension)
+
+    def _pick(self, columns, start, step):
+        """
+        Coarsest resolution whose bucket divides the step (fewest buckets to
+        read). If that one was already trimmed past `start`, a coarser one that
+        still covers it is used instead, at its own granularity.
+        """
+        fitting = [c for c in columns if step % c.bucket_seconds == 0] or columns[:1]
+        best = fitting[-1]
+        if best.oldest is not None and best.oldest > start:
+            for column in columns:
+                if column.bucket_seconds > best.bucket_seconds and column.oldest is not None and column.oldest <= start:
+                    return column
+        return best
+
+    def query(self, start, end, step, series=None):
+        """
+        Dense counts in [start, end) at `step` seconds, aligned to multiples
+        of step (UTC). `series` is a list of (dimension, key); default total.
+        Returns (timestamps, {"dimension:key": counts}, resolution_used).
+        """
+        step = max(self.resolutions[0][0], int(step))
+        step -= step % self.resolutions[0][0]
+        start = int(start) // step * step
+        end = int(end)
+        if end <= start:
+            end = start + step
+        n_points = -(-(end - start) // step)
+        if n_points > METRICS_MAX_POINTS:
+            raise ValueError(f"Range too large for step {step}s (max {METRICS_MAX_POINTS} points)")
+
+        timestamps = np.arange(start, start + n_points * step, step, dtype=np.int64)
+        out = {}
+        resolution = None
+        with self._lock:
+            for dimension, key in series or [TOTAL_SERIES]:
+                values = np.zeros(n_points, dtype=np.int64)
+                columns = self.series.get((dimension, key))
+                if columns is not None:
+                    column = self._pick(columns, start, step)
+                    resolution = column.bucket_seconds
+                    starts, counts = column.range(start, end)
+                    if len(starts):
+                        np.add.at(values, (starts - start) // step, counts)
+                    del starts, counts # Release the views so the arrays can grow again
+                out[f"{dimension}:{key}"] = values.tolist()
+        return timestamps.tolist(), out, resolution
+
+    # --- Persistence ---
+
+    def flush(self, force=False):
+        if not self.path or not (self.dirty or force):
+            return False
+        with self._lock:
+            arrays = {}
+            for (dimension, key), columns in self.series.items():
+                for column in columns:
+                    name = f"{dimension}|{key}|{column.bucket_seconds}"
+                    arrays[name + "|t"] = np.array(column.starts, dtype=np.int64)
+                    arrays[name + "|c"] = np.array(column.counts, dtype=np.int64)
+            self.dirty = False
+        tmp = self.path + ".tmp.npz"
+        np.savez_compressed(tmp, **arrays)
+        os.replace(tmp, self.path)
+        self.last_flush = time.time()
+        return True
+
+    def load(self):
+        try:
+            keep = dict(self.resolutions)
+            with np.load(self.path) as data:
+                for name in data.files:
+                    if not name.endswith("|t"):
+                        continue
+                    dimension, rest = name[:-2].split("|", 1)
+                    key, seconds = rest.rsplit("|", 1)
+                    seconds = int(seconds)
+                    if seconds not in keep:
+                        continue
+                    columns = self._columns(dimension, key)
+                    idx = [s for s, _ in self.resolutions].index(seconds)
+                    columns[idx] = Column(seconds, keep[seconds], data[name].tolist(), data[name[:-2] + "|c"].tolist())
+        except Exception as e:
+            print(f"Error loading count metrics: {e}")
+
+    def stats(self):
+        with self._lock:
+            buckets = sum(len(c.starts) for columns in self.series.values() for c in columns)
+            return {
+                "series": len(self.series),
+                "buckets": buckets,
+                "bytes": buckets * 16,
+                "last_flush": self.last_flush,
+            }
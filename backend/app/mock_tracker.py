@@ -8,7 +8,7 @@ class MockJuteBagTracker:
         self.total_count = 0
         self.counted_ids = set()
 
-    def process_video(self, video_path, output_path, line_y=500, on_update=None):
+    def process_video(self, video_path, output_path, line_y=500, on_update=None, on_frame=None, cancel_token=None, checkpoint=None, stream_dir=None, detections=None):
         """
         Simulates processing a video, detecting bags, and updating count.
         """
@@ -27,6 +27,11 @@ class MockJuteBagTracker:
         simulated_bags = 0
         
         while cap.isOpened():
+            if cancel_token is not None and cancel_token.should_stop():
+                cap.release()
+                out.release()
+                return {"count": simulated_bags, "status": "cancelled", "frame_idx": frame_idx}
+
             ret, frame = cap.read()
             if not ret:
                 break
@@ -52,6 +57,8 @@ class MockJuteBagTracker:
             cv2.putText(frame, f"Count: {self.total_count}", (10, 50), cv2.FONT_HERSHEY_SIMPLEX, 1, (0, 255, 255), 2)
             
             out.write(frame)
+            if on_frame:
+                on_frame(frame, frame_idx, self.total_count)
             frame_idx += 1
             
         cap.release()
@@ -0,0 +1,106 @@
+import os
+import threading
+import time
+
+try:
+    from backend.app.backends import load_model, INFERENCE_BACKEND, EXPORT_IMGSZ
+except ImportError:
+    from .backends import load_model, INFERENCE_BACKEND, EXPORT_IMGSZ
+
+# Shared model instances
+MODEL_WARMUP = os.getenv("MODEL_WARMUP", "true").lower() == "true" # One dummy inference after loading
+
+
+def rss_mb():
+    """Resident memory of this process in MB (current on Linux, peak elsewhere)."""
+    try:
+        with open("/proc/self/statm") as f:
+            pages = int(f.read().split()[1])
+        return round(pages * os.sysconf("SC_PAGE_SIZE") / 2**20, 1)
+    except (OSError, ValueError):
+        import resource
+        import sys
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return round(peak / (2**20 if sys.platform == "darwin" else 2**10), 1)
+
+
+class LoadedModel:
+    def __init__(self, path, model, backend, load_seconds, warmup_seconds):
+        self.path = path
+        self.model = model
+        self.backend = backend
+        self.load_seconds = load_seconds
+        self.warmup_seconds = warmup_seconds
+        self.users = 0
+
+
+class ModelRegistry:
+    """
+    Loads each weight file once per process and hands the same YOLO object
+    to every tracker that asks for it. Sharing is safe because forward
+    passes go through the single inference scheduler thread; the trackers
+    keep their own counting and ByteTrack state.
+    """
+    def __init__(self, warmup=MODEL_WARMUP):
+        self.warmup = warmup
+        self.models = {} # (abs path, requested backend) -> LoadedModel
+        self._lock = threading.Lock()
+        self._loading = {} # key -> Lock, so concurrent callers load a model only once
+
+    def get(self, model_path, backend=INFERENCE_BACKEND):
+        """Returns (model, backend actually used), loading and warming it up on first use."""
+        key = (os.path.abspath(model_path), backend)
+        with self._lock:
+            lock = self._loading.setdefault(key, threading.Lock())
+        with lock:
+            loaded = self.models.get(key)
+            if loaded is None:
+                loaded = self._load(model_path, backend)
+                self.models[key] = loaded
+            loaded.users += 1
+        return loaded.model, loaded.backend
+
+    def _load(self, model_path, backend):
+        started = time.perf_counter()
+        model, used = load_model(model_path, backend)
+        loaded_at = time.perf_counter()
+        if self.warmup:
+            self._warm_up(model)
+        finished = time.perf_counter()
+        print(f"Model {os.path.basename(model_path)} ({used}) loaded in {loaded_at - started:.2f}s, "
+              f"warm-up {finished - loaded_at:.2f}s, RSS {rss_mb()} MB")
+        return LoadedModel(model_path, model, used, loaded_at - started, finished - loaded_at)
+
+    def replica(self, model):
+        """
+        Independent copy of a loaded model, for parallel scheduler workers
+        (one ultralytics model runs one predict() at a time).
+        """
+        from ultralytics import YOLO
+        copy = YOLO(model.model_name, task=model.task)
+        if self.warmup:
+            self._warm_up(copy)
+        return copy
+
+    def _warm_up(self, model):
+        """First predict() builds the predictor and allocates buffers; pay for it before traffic."""
+        import numpy as np
+        try:
+            model.predict(np.zeros((EXPORT_IMGSZ, EXPORT_IMGSZ, 3), dtype=np.uint8), verbose=False)
+        except Exception as e:
+            print(f"Model warm-up failed: {e}")
+
+    def stats(self):
+        return [
+            {
+                "path": loaded.path,
+                "backend": loaded.backend,
+                "users": loaded.users,
+                "load_seconds": round(loaded.load_seconds, 2),
+                "warmup_seconds": round(loaded.warmup_seconds, 2),
+            }
+            for loaded in self.models.values()
+        ]
+
+
+registry = ModelRegistry()
@@ -0,0 +1,278 @@
+import json
+import os
+import threading
+import time
+
+import numpy as np
+
+# CPU execution planning
+# auto: benchmark once per machine / model (result cached) | off: library defaults | "<workers>x<threads>"
+EXEC_PLAN = os.getenv("EXEC_PLAN", "auto").lower()
+PLAN_BENCH_SECONDS = float(os.getenv("PLAN_BENCH_SECONDS", "2")) # Per candidate
+PLAN_MAX_WORKERS = int(os.getenv("PLAN_MAX_WORKERS", "8"))
+PLAN_PIN_THREADS = os.getenv("PLAN_PIN_THREADS", "true").lower() == "true"
+PLAN_BENCH_BATCH = 4
+PLAN_VERSION = 1
+
+
+def available_cpus():
+    """CPU ids this process may run on (respects taskset / container cpusets)."""
+    if hasattr(os, "sched_getaffinity"):
+        return sorted(os.sched_getaffinity(0))
+    return list(range(os.cpu_count() or 1))
+
+
+def candidate_shapes(n_cpus, max_workers=PLAN_MAX_WORKERS):
+    """(workers, threads per worker) splits that use every core: 1 x N, 2 x N/2, 4 x N/4 ..."""
+    shapes = []
+    workers = 1
+    while workers <= min(n_cpus, max_workers):
+        shapes.append((workers, n_cpus // workers))
+        workers *= 2
+    return shapes
+
+
+class ExecutionPlan:
+    def __init__(self, workers, threads, source, cpus=None, pin=PLAN_PIN_THREADS, measurements=None, signature=None):
+        self.workers = workers
+        self.threads = threads
+        self.source = source # default | fixed | benchmark | cached
+        self.cpus = list(cpus if cpus is not None else available_cpus())
+        self.pin = pin
+        self.measurements = measurements or []
+        self.signature = signature
+
+    @classmethod
+    def parse(cls, spec):
+        """"2x8" -> 2 workers with 8 threads each."""
+        workers, threads = (int(v) for v in spec.lower().split("x"))
+        return cls(workers, threads, "fixed")
+
+    def affinity(self):
+        """Disjoint core set per worker, so their thread pools do not fight over cores."""
+        if not self.pin or self.workers < 2 or self.workers * self.threads > len(self.cpus):
+            return None
+        return [set(self.cpus[i * self.threads:(i + 1) * self.threads]) for i in range(self.workers)]
+
+    @property
+    def job_slots(self):
+        # One job per worker plus one decoding / encoding while the others infer
+        return self.workers + 1
+
+    def as_dict(self):
+        best = max((m["fps"] for m in self.measurements), default=None)
+        return {
+            "workers": self.workers,
+            "threads_per_worker": self.threads,
+            "job_slots": self.job_slots,
+            "cpus": len(self.cpus),
+            "pinned": self.affinity() is not None,
+            "source": self.source,
+            "throughput_fps": best,
+            "measurements": self.measurements,
+            "signature": self.signature,
+        }
+
+
+def apply_plan(plan, scheduler, replicate):
+    """Sizes torch / OpenCV thread pools and the scheduler's workers to the plan."""
+    import cv2
+    import torch
+    torch.set_num_threads(plan.threads)
+    cv2.setNumThreads(plan.threads)
+    scheduler.configure(plan.workers, replicate if plan.workers > 1 else None, plan.affinity())
+
+
+def measure(model, replicate, workers, threads, cpus, seconds=PLAN_BENCH_SECONDS, pin=PLAN_PIN_THREADS, imgsz=640):
+    """Frames per second with `workers` threads each running predict() on its own model copy."""
+    import torch
+    torch.set_num_threads(threads)
+    models = [model] + [replicate(model) for _ in range(workers - 1)]
+    rng = np.random.default_rng(0)
+    frames = [rng.integers(0, 255, (imgsz, imgsz, 3), dtype=np.uint8) for _ in range(PLAN_BENCH_BATCH)]
+    plan = ExecutionPlan(workers, threads, "benchmark", cpus, pin)
+    affinity = plan.affinity()
+    done = [0] * workers
+    barrier = threading.Barrier(workers + 1)
+
+    def worker(i):
+        if affinity and hasattr(os, "sched_setaffinity"):
+            os.sched_setaffinity(0, affinity[i])
+        models[i].predict(frames[:1], verbose=False) # Warm up
+        barrier.wait()
+        deadline = time.perf_counter() + seconds
+        while time.perf_counter() < deadline:
+            models[i].predict(frames, verbose=False)
+            done[i] += len(frames)
+
+    runners = [threading.Thread(target=worker, args=(i,), daemon=True) for i in range(workers)]
+    for t in runners:
+        t.start()
+    barrier.wait()
+    started = time.perf_counter()
+    for t in runners:
+        t.join()
+    elapsed = time.perf_counter() - started
+    return round(sum(done) / elapsed, 2)
+
+
+class ExecutionPlanner:
+    """
+    Picks how the CPU is split between parallel inference workers and the
+    intra-op threads of each. Candidates that use every core (1 x N, 2 x N/2,
+    ...) are benchmarked on the loaded model and the fastest wins; the
+    result is cached per machine / model so restarts skip the benchmark.
+    """
+    def __init__(self, path=None, spec=EXEC_PLAN, seconds=PLAN_BENCH_SECONDS, max_workers=PLAN_MAX_WORKERS):
+        self.path = path
+        self.spec = spec
+        self.seconds = seconds
+        self.max_workers = max_workers
+        cpus = available_cpus()
+        self.plan = ExecutionPlan(1, len(cpus), "default", cpus)
+        self.running = False
+        self._lock = threading.Lock()
+
+    def signature(self, model_key):
+        return f"v{PLAN_VERSION}|cpus={len(available_cpus())}|{model_key}"
+
+    def _cached(self, signature):
+        if not self.path or not os.path.exists(self.path):
+            return None
+        try:
+            with open(self.path) as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if data.get("signature") != signature:
+            return None
+        return ExecutionPlan(data["workers"], data["threads_per_worker"], "cached",
+                             measurements=data.get("measurements"), signature=signature)
+
+    def _save(self, plan):
+        if not self.path:
+            return
+        tmp = self.path + ".tmp"
+        with open(tmp, "w") as f:
+            json.dump(plan.as_dict(), f, indent=2)
+        os.replace(tmp, self.path)
+
+    def choose(self, model, replicate, model_key, force=False):
+        """Plan for this machine: fixed spec, cached result, or a fresh benchmark."""
+        if self.spec != "auto":
+            try:
+                return ExecutionPlan.parse(self.spec)
+            except ValueError:
+                print(f"Invalid EXEC_PLAN '{self.spec}', benchmarking instead")
+        signature = self.signature(model_key)
+        cached = None if force else self._cached(signature)
+        if cached is not None:
+            return cached
+        return self.benchmark(model, replicate, signature)
+
+    def benchmark(self, model, replicate, signature=None):
+        cpus = available_cpus()
+        measurements = []
+        for workers, threads in candidate_shapes(len(cpus), self.max_workers):
+            try:
+                fps = measure(model, replicate, workers, threads, cpus, self.seconds)
+            except Exception as e:
+                print(f"Plan candidate {workers}x{threads} failed: {e}")
+                continue
+            measurements.append({"workers": workers, "threads": threads, "fps": fps})
+            print(f"Plan candidate {workers} worker(s) x {threads} thread(s): {fps} fps")
+        if not measurements:
+            return self.plan
+        best = max(measurements, key=lambda m: m["fps"])
+        plan = ExecutionPlan(best["workers"], best["threads"], "benchmark", cpus,
+                             measurements=measurements, signature=signature)
+        self._save(plan)
+        return plan
+
+    def run(self, model, replicate, model_key, scheduler, force=False):
+        """Chooses and applies a plan; returns it (None if a run is already in progress)."""
+        if self.spec == "off":
+            return self.plan # Leave torch / OpenCV defaults alone
+        with self._lock:
+            if self.running:
+                return None
+            self.running = True
+        try:
+            plan = self.choose(model, replicate, model_key, force)
+            apply_plan(plan, scheduler, replicate)
+            self.plan = plan
+            print(f"Execution plan ({plan.source}): {plan.workers} worker(s) x {plan.threads} thread(s)")
+            return plan
+        finally:
+            self.running = False
+
+    def stats(self):
+        return dict(self.plan.as_dict(), running=self.running, spec=self.spec)
+
+
+class JobSlots:
+    """Resizable cap on concurrently running video jobs; waiting jobs hold no CPU."""
+    def __init__(self, size):
+        self.size = max(1, size)
+        self.running = 0
+        self.waiting = 0
+        self.paused = 0 # Jobs that gave their slot back while paused
+        self._cond = threading.Condition()
+
+    def acquire(self, cancel_token=None):
+        """Waits for a free slot; False if the job was cancelled while waiting."""
+        with self._cond:
+            self.waiting += 1
+            try:
+                while self.running >= self.size:
+                    if cancel_token is not None and cancel_token.cancelled:
+                        return False
+                    self._cond.wait(0.5)
+                self.running += 1
+                return True
+            finally:
+                self.waiting -= 1
+
+    def release(self):
+        with self._cond:
+            self.running -= 1
+            self._cond.notify_all()
+
+    def resize(self, size):
+        with self._cond:
+            self.size = max(1, size)
+            self._cond.notify_all()
+
+    def stats(self):
+        return {"size": self.size, "running": self.running, "waiting": self.waiting, "paused": self.paused}
+
+
+class JobSlot:
+    """
+    One job's hold on a JobSlots slot. pause() gives the slot back and
+    resume() waits for one again, so paused jobs don't block the queue.
+    """
+    def __init__(self, slots, cancel_token=None):
+        self.slots = slots
+        self.cancel_token = cancel_token
+        self.held = False
+
+    def acquire(self):
+        """Waits for a slot; False if the job was cancelled first."""
+        self.held = self.slots.acquire(self.cancel_token)
+        return self.held
+
+    def release(self):
+        if self.held:
+            self.held = False
+            self.slots.release()
+
+    def pause(self):
+        self.release()
+        with self.slots._cond:
+            self.slots.paused += 1
+
+    def resume(self):
+        with self.slots._cond:
+            self.slots.paused -= 1
+        return self.acquire()
@@ -0,0 +1,185 @@
+import asyncio
+import os
+import struct
+import time
+
+import cv2
+from fastapi import WebSocket
+
+# Preview channel configuration (binary JPEG over WebSocket)
+PREVIEW_MAX_WIDTH = int(os.getenv("PREVIEW_MAX_WIDTH", "640"))
+PREVIEW_JPEG_QUALITY = int(os.getenv("PREVIEW_JPEG_QUALITY", "60"))
+PREVIEW_MAX_FPS = float(os.getenv("PREVIEW_MAX_FPS", "15"))
+PREVIEW_MIN_FPS = float(os.getenv("PREVIEW_MIN_FPS", "1"))
+
+# Binary frame layout: uint32 frame_idx, uint32 count, then the JPEG bytes
+PREVIEW_HEADER = struct.Struct("!II")
+
+SEND_TIME_SMOOTHING = 0.3 # EWMA weight of the newest send-duration sample
+
+
+def encode_preview(frame, max_width=PREVIEW_MAX_WIDTH, quality=PREVIEW_JPEG_QUALITY):
+    """Downscales (never upscales) and JPEG-encodes a frame for the preview channel."""
+    height, width = frame.shape[:2]
+    if max_width and width > max_width:
+        scale = max_width / width
+        frame = cv2.resize(frame, (max_width, int(height * scale)), interpolation=cv2.INTER_AREA)
+    ok, buffer = cv2.imencode('.jpg', frame, [int(cv2.IMWRITE_JPEG_QUALITY), quality])
+    if not ok:
+        return None
+    return buffer.tobytes()
+
+
+class PreviewSubscriber:
+    """
+    A single preview viewer. Holds at most one pending frame (newest wins)
+    and measures how long each send takes to estimate its consumption rate.
+    """
+    def __init__(self, task_id: str, websocket: WebSocket):
+        self.task_id = task_id
+        self.websocket = websocket
+        self.pending = None
+        self.sending = False
+        self.send_time = 0.0 # Smoothed seconds per frame actually delivered
+        self.sent = 0
+        self.skipped = 0
+        self.closed = False
+        self._wakeup = asyncio.Event()
+        self._writer = None
+
+    @property
+    def ready(self):
+        """True when the last offered frame has been delivered."""
+        return self.pending is None and not self.sending and not self.closed
+
+    def start(self):
+        self._writer = asyncio.create_task(self._write_loop())
+
+    def offer(self, payload: bytes):
+        if self.closed:
+            return
+        if self.pending is not None:
+            self.skipped += 1
+        self.pending = payload
+        self._wakeup.set()
+
+    async def _write_loop(self):
+        try:
+            while not self.closed:
+                await self._wakeup.wait()
+                self._wakeup.clear()
+                payload, self.pending = self.pending, None
+                if payload is None:
+                    continue
+                started = time.perf_counter()
+                self.sending = True # Not ready until the frame is out
+                try:
+                    await self.websocket.send_bytes(payload)
+                except Exception as e:
+                    print(f"Preview send failed for task {self.task_id}: {e}")
+                    self.closed = True
+                    break
+                finally:
+                    self.sending = False
+                elapsed = time.perf_counter() - started
+                self.send_time = elapsed if self.sent == 0 else (
+                    SEND_TIME_SMOOTHING * elapsed + (1 - SEND_TIME_SMOOTHING) * self.send_time
+                )
+                self.sent += 1
+        except asyncio.CancelledError:
+            pass
+
+    def close(self):
+        self.closed = True
+        self._wakeup.set()
+        if self._writer:
+            self._writer.cancel()
+
+    def stats(self):
+        return {
+            "task_id": self.task_id,
+            "sent": self.sent,
+            "skipped": self.skipped,
+            "send_ms": round(self.send_time * 1000, 2),
+        }
+
+
+class PreviewHub:
+    """
+    Per-task preview fan-out. Worker threads call publish() for every
+    annotated frame; encoding only happens when someone is subscribed to
+    that task and at least one subscriber has drained its previous frame,
+    at a rate bounded by the fastest subscriber's measured consumption.
+    """
+    def __init__(self, max_width=PREVIEW_MAX_WIDTH, quality=PREVIEW_JPEG_QUALITY,
+                 max_fps=PREVIEW_MAX_FPS, min_fps=PREVIEW_MIN_FPS):
+        self.max_width = max_width
+        self.quality = quality
+        self.max_fps = max_fps
+        self.min_fps = min_fps
+        self.subscribers: dict = {} # task_id -> [PreviewSubscriber]
+        self.last_encode: dict = {} # task_id -> perf_counter of last encode
+        self.encoded = 0
+        self.loop = None
+
+    async def subscribe(self, task_id: str, websocket: WebSocket):
+        await websocket.accept()
+        self.loop = asyncio.get_running_loop()
+        sub = PreviewSubscriber(task_id, websocket)
+        sub.start()
+        self.subscribers.setdefault(task_id, []).append(sub)
+        return sub
+
+    def unsubscribe(self, sub: PreviewSubscriber):
+        sub.close()
+        subs = self.subscribers.get(sub.task_id)
+        if subs and sub in subs:
+            subs.remove(sub)
+            if not subs:
+                del self.subscribers[sub.task_id]
+                self.last_encode.pop(sub.task_id, None)
+
+    def has_subscribers(self, task_id: str):
+        return bool(self.subscribers.get(task_id))
+
+    def frame_interval(self, task_id: str):
+        """Seconds between encodes, adapted to the fastest live subscriber."""
+        subs = [s for s in self.subscribers.get(task_id, []) if not s.closed]
+        if not subs:
+            return None
+        fastest = min(s.send_time for s in subs)
+        interval = max(1.0 / self.max_fps, fastest)
+        return min(interval, 1.0 / self.min_fps)
+
+    def publish(self, task_id: str, frame, frame_idx: int = 0, count: int = 0):
+        """Called from the processing thread. Returns True if a frame was encoded."""
+        interval = self.frame_interval(task_id)
+        if interval is None or self.loop is None:
+            return False # No viewers: skip encoding entirely
+
+        subs = self.subscribers.get(task_id, [])
+        if not any(s.ready for s in subs):
+            return False # Everyone is still busy with the previous frame
+
+        now = time.perf_counter()
+        if now - self.last_encode.get(task_id, 0.0) < interval:
+            return False
+
+        jpeg = encode_preview(frame, self.max_width, self.quality)
+        if jpeg is None:
+            return False
+        self.last_encode[task_id] = now
+        self.encoded += 1
+
+        payload = PREVIEW_HEADER.pack(frame_idx & 0xFFFFFFFF, max(0, int(count))) + jpeg
+        for sub in list(subs):
+            self.loop.call_soon_threadsafe(sub.offer, payload)
+        return True
+
+    def stats(self):
+        return {
+            "encoded": self.encoded,
+            "max_width": self.max_width,
+            "quality": self.quality,
+            "subscribers": [s.stats() for subs in self.subscribers.values() for s in subs],
+        }
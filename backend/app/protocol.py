@@ -0,0 +1,99 @@
+import json
+from collections import OrderedDict, deque
+
+try:
+    import msgpack
+except ImportError: # Optional: compact JSON is used when msgpack is not installed
+    msgpack = None
+
+# Versioned WebSocket protocol (v1 = legacy one-dict-per-update JSON)
+#
+#   snapshot: {"v": 2, "t": "s", "seq": N, "s": {task_id: {field: value}}}
+#   delta:    {"v": 2, "t": "d", "seq": N, "d": {task_id: {changed fields}}, "e": [events]}
+#
+# Session-wide updates (no task) are keyed under SESSION_KEY.
+PROTOCOL_VERSION = 2
+SESSION_KEY = "_"
+STATE_FIELDS = ("count", "progress", "status", "results_count")
+HISTORY_SIZE = 256 # Delta batches kept per user for cheap resync
+MAX_TRACKED_TASKS = 200 # Snapshot entries kept per user
+
+
+def supported_encodings():
+    return ["msgpack", "json"] if msgpack else ["json"]
+
+
+def encode(message: dict, encoding: str = "json"):
+    """Returns bytes for msgpack, compact str for JSON."""
+    if encoding == "msgpack" and msgpack:
+        return msgpack.packb(message, use_bin_type=True)
+    return json.dumps(message, separators=(",", ":"))
+
+
+def split_update(message: dict):
+    """Splits a legacy update dict into (state fields, event or None)."""
+    fields = {k: message[k] for k in STATE_FIELDS if k in message}
+    event = message.get("event")
+    if event is not None:
+        event = {k: v for k, v in message.items() if k not in STATE_FIELDS}
+    return fields, event
+
+
+class DeltaChannel:
+    """
+    Per-user protocol state: accumulates changed fields between ticks,
+    stamps each flushed batch with a sequence number, and keeps a short
+    history so reconnecting clients can catch up without a full snapshot.
+    """
+    def __init__(self, history_size=HISTORY_SIZE, max_tasks=MAX_TRACKED_TASKS):
+        self.seq = 0
+        self.state = OrderedDict() # task_id -> merged fields (the snapshot)
+        self.pending = {} # task_id -> fields changed since last flush
+        self.pending_events = []
+        self.history = deque(maxlen=history_size) # (seq, batch)
+        self.max_tasks = max_tasks
+
+    def apply(self, task_id, fields: dict, event: dict = None):
+        key = task_id or SESSION_KEY
+        current = self.state.setdefault(key, {})
+        changed = {k: v for k, v in fields.items() if current.get(k) != v}
+        if changed:
+            current.update(changed)
+            self.state.move_to_end(key)
+            self.pending.setdefault(key, {}).update(changed)
+            while len(self.state) > self.max_tasks:
+                self.state.popitem(last=False)
+        if event is not None:
+            if task_id:
+                event = dict(event, task_id=task_id)
+            self.pending_events.append(event)
+
+    def flush(self):
+        """Returns the next delta batch, or None when nothing changed this tick."""
+        if not self.pending and not self.pending_events:
+            return None
+        self.seq += 1
+        batch = {"v": PROTOCOL_VERSION, "t": "d", "seq": self.seq, "d": self.pending}
+        if self.pending_events:
+            batch["e"] = self.pending_events
+        self.pending = {}
+        self.pending_events = []
+        self.history.append((self.seq, batch))
+        return batch
+
+    def snapshot(self):
+        return {
+            "v": PROTOCOL_VERSION,
+            "t": "s",
+            "seq": self.seq,
+            "s": {k: dict(v) for k, v in self.state.items()},
+        }
+
+    def resync(self, since_seq):
+        """Batches after since_seq if still buffered, otherwise a fresh snapshot."""
+        if since_seq is not None and since_seq <= self.seq:
+            if since_seq == self.seq:
+                return []
+            if self.history and self.history[0][0] <= since_seq + 1:
+                return [batch for seq, batch in self.history if seq > since_seq]
+        return [self.snapshot()]
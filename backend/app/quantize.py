@@ -0,0 +1,206 @@
+import argparse
+import json
+import os
+import time
+
+import cv2
+import numpy as np
+
+try:
+    from backend.app.backends import ensure_export, load_frames, benchmark, EXPORT_IMGSZ, CALIBRATION_IMAGES, CALIBRATION_METHOD
+    from backend.app.tracker import tile_regions
+except ImportError:
+    from .backends import ensure_export, load_frames, benchmark, EXPORT_IMGSZ, CALIBRATION_IMAGES, CALIBRATION_METHOD
+    from .tracker import tile_regions
+
+# Post-training INT8 quantization of the sack detector (ONNX Runtime, static QDQ)
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DATASET_DIR = os.path.join(BACKEND_DIR, "training_data", "Sacks.v2i.yolov8")
+IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png", ".bmp")
+
+
+def int8_path(model_path):
+    return os.path.splitext(model_path)[0] + "_int8.onnx"
+
+
+def list_images(directory, limit=None):
+    images_dir = os.path.join(directory, "images")
+    if os.path.isdir(images_dir):
+        directory = images_dir
+    paths = sorted(os.path.join(directory, name) for name in os.listdir(directory)
+                   if name.lower().endswith(IMAGE_EXTENSIONS))
+    return paths[:limit] if limit else paths
+
+
+def preprocess(image, imgsz=EXPORT_IMGSZ):
+    """Same input the ultralytics predictor feeds the network: letterboxed RGB, 0-1, NCHW."""
+    from ultralytics.data.augment import LetterBox
+    image = LetterBox((imgsz, imgsz), auto=False)(image=image)
+    image = image[..., ::-1].transpose(2, 0, 1)
+    return np.ascontiguousarray(image, dtype=np.float32)[None] / 255.0
+
+
+class CalibrationReader:
+    """Feeds training images to ONNX Runtime's calibrator, one at a time."""
+    def __init__(self, paths, input_name, imgsz=EXPORT_IMGSZ):
+        self.paths = list(paths)
+        self.input_name = input_name
+        self.imgsz = imgsz
+        self._next = 0
+
+    def get_next(self):
+        while self._next < len(self.paths):
+            image = cv2.imread(self.paths[self._next])
+            self._next += 1
+            if image is not None:
+                return {self.input_name: preprocess(image, self.imgsz)}
+        return None
+
+    def rewind(self):
+        self._next = 0
+
+
+def head_decode_nodes(model):
+    """
+    Box decoding at the end of the Detect head (DFL softmax, anchors, concat):
+    kept in float because INT8 there costs most of the accuracy and little time.
+    The head's convolutions are still quantized.
+    """
+    dfl = next((n.name for n in model.graph.node if "/dfl/" in n.name), None)
+    if dfl is None:
+        return []
+    head = dfl.split("/dfl/")[0] + "/"
+    return [n.name for n in model.graph.node if n.name.startswith(head) and n.op_type != "Conv"]
+
+
+def quantize_onnx(fp32_path, output_path, calibration_dir=None, count=CALIBRATION_IMAGES,
+                  method=CALIBRATION_METHOD, imgsz=EXPORT_IMGSZ):
+    """Static INT8 (QDQ, per-channel weights) calibrated on training images."""
+    import onnx
+    from onnxruntime.quantization import quantize_static, CalibrationMethod, QuantFormat, QuantType
+
+    calibration_dir = calibration_dir or os.path.join(DATASET_DIR, "train")
+    paths = list_images(calibration_dir, count)
+    if not paths:
+        raise FileNotFoundError(f"No calibration images in {calibration_dir}")
+
+    model = onnx.load(fp32_path)
+    reader = CalibrationReader(paths, model.graph.input[0].name, imgsz)
+    methods = {"minmax": CalibrationMethod.MinMax, "entropy": CalibrationMethod.Entropy,
+               "percentile": CalibrationMethod.Percentile}
+    print(f"Calibrating INT8 on {len(paths)} images ({method})...")
+    started = time.perf_counter()
+    quantize_static(
+        fp32_path,
+        output_path,
+        reader,
+        quant_format=QuantFormat.QDQ,
+        per_channel=True,
+        weight_type=QuantType.QInt8,
+        activation_type=QuantType.QUInt8,
+        calibrate_method=methods[method],
+        nodes_to_exclude=head_decode_nodes(model),
+    )
+    print(f"Saved {output_path} in {time.perf_counter() - started:.1f}s")
+    return output_path
+
+
+def ensure_int8(model_path, calibration_dir=None, imgsz=EXPORT_IMGSZ):
+    """INT8 model for model_path, quantized once and reused while newer than the weights."""
+    target = int8_path(model_path)
+    if os.path.exists(target) and os.path.getmtime(target) >= os.path.getmtime(model_path):
+        return target
+    return quantize_onnx(ensure_export(model_path, "onnx", imgsz), target, calibration_dir, imgsz=imgsz)
+
+
+# --- Report ---
+
+def evaluate(model, data, split):
+    """mAP of model on one dataset split (None if the split has no labels)."""
+    try:
+        metrics = model.val(data=data, split=split, batch=1, device="cpu", plots=False, verbose=False)
+    except Exception as e:
+        print(f"Validation on {split} failed: {e}")
+        return None
+    return {"map50": round(float(metrics.box.map50), 4), "map50_95": round(float(metrics.box.map), 4)}
+
+
+def tiling_latency(model, frames, augment):
+    """ms per frame for the tile batch detect_with_tiling sends (full frame + 8 tiles)."""
+    timings = []
+    for frame in frames:
+        height, width = frame.shape[:2]
+        tiles = [frame[y1:y2, x1:x2] for x1, y1, x2, y2 in tile_regions(width, height)]
+        started = time.perf_counter()
+        model.predict(tiles, conf=0.15, iou=0.6, classes=[0], augment=augment, verbose=False)
+        timings.append((time.perf_counter() - started) * 1000)
+    return round(float(np.mean(timings)), 1)
+
+
+def report(model_path, data=None, frames=20, source=None):
+    """FP32 (PyTorch, ONNX) vs INT8 (ONNX): mAP on valid/test and CPU latency."""
+    from ultralytics import YOLO
+    data = data or os.path.join(DATASET_DIR, "data.yaml")
+    variants = {
+        "pytorch_fp32": model_path,
+        "onnx_fp32": ensure_export(model_path, "onnx"),
+        "onnx_int8": ensure_int8(model_path),
+    }
+    sample = load_frames(source, frames) if source else [cv2.imread(p) for p in list_images(os.path.join(DATASET_DIR, "valid"), frames)]
+    sample = sample or load_frames(None, frames)
+    rows = {}
+    for name, path in variants.items():
+        model = YOLO(path, task="detect")
+        pytorch = name.startswith("pytorch")
+        rows[name] = {
+            "path": path,
+            "size_mb": round(os.path.getsize(path) / 1e6, 1),
+            "valid": evaluate(model, data, "val"),
+            "test": evaluate(model, data, "test"),
+            "frame_ms": benchmark(model, sample, 1)["mean_ms"],
+            # The live tiling path runs TTA, which only PyTorch supports
+            "tiling_ms": tiling_latency(model, sample, augment=pytorch),
+        }
+    base = rows["pytorch_fp32"]["tiling_ms"]
+    for row in rows.values():
+        row["tiling_speedup"] = round(base / row["tiling_ms"], 2) if row["tiling_ms"] else None
+    return rows
+
+
+def print_report(rows):
+    print(f"{'model':<14} {'MB':>6} {'valid mAP50':>12} {'valid 50-95':>12} {'test mAP50':>11} {'test 50-95':>11} "
+          f"{'frame ms':>9} {'tiling ms':>10} {'speedup':>8}")
+    for name, row in rows.items():
+        valid = row["valid"] or {}
+        test = row["test"] or {}
+        print(f"{name:<14} {row['size_mb']:>6} {valid.get('map50', '-'):>12} {valid.get('map50_95', '-'):>12} "
+              f"{test.get('map50', '-'):>11} {test.get('map50_95', '-'):>11} {row['frame_ms']:>9} "
+              f"{row['tiling_ms']:>10} {row['tiling_speedup']:>8}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Quantize the sack detector to INT8 and report accuracy / latency")
+    parser.add_argument("--model", default=os.path.join(BACKEND_DIR, "models", "sacks_custom.pt"))
+    parser.add_argument("--data", default=os.path.join(DATASET_DIR, "data.yaml"))
+    parser.add_argument("--calibration", default=os.path.join(DATASET_DIR, "train"))
+    parser.add_argument("--images", type=int, default=CALIBRATION_IMAGES, help="Calibration images")
+    parser.add_argument("--method", default=CALIBRATION_METHOD, choices=("minmax", "entropy", "percentile"))
+    parser.add_argument("--frames", type=int, default=20, help="Frames for the latency measurements")
+    parser.add_argument("--source", help="Video for the latency measurements (default: validation images)")
+    parser.add_argument("--output", help="Also write the report as JSON")
+    parser.add_argument("--no-report", action="store_true", help="Only produce the INT8 model")
+    args = parser.parse_args(argv)
+
+    fp32 = ensure_export(args.model, "onnx")
+    quantize_onnx(fp32, int8_path(args.model), args.calibration, args.images, args.method)
+    if args.no_report:
+        return
+    rows = report(args.model, args.data, args.frames, args.source)
+    print_report(rows)
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(rows, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,159 @@
+import hashlib
+import inspect
+import json
+import os
+import shutil
+import threading
+import time
+
+from .backends import export_settings
+
+# Content-addressed cache of finished results (count + annotated output)
+RESULT_CACHE_MAX_BYTES = int(os.getenv("RESULT_CACHE_MAX_BYTES", str(2 * 1024 ** 3)))
+RESULT_CACHE_ENABLED = os.getenv("RESULT_CACHE_ENABLED", "true").lower() == "true"
+
+_file_hashes = {} # (path, size, mtime) -> sha256, so weights are hashed once per process
+_file_hashes_lock = threading.Lock()
+
+
+def file_sha256(path: str, chunk_size: int = 1024 * 1024):
+    """sha256 of a file, memoized on (path, size, mtime)."""
+    st = os.stat(path)
+    memo_key = (os.path.abspath(path), st.st_size, st.st_mtime)
+    with _file_hashes_lock:
+        if memo_key in _file_hashes:
+            return _file_hashes[memo_key]
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    with _file_hashes_lock:
+        _file_hashes[memo_key] = digest.hexdigest()
+    return _file_hashes[memo_key]
+
+
+def tracker_fingerprint(tracker):
+    """
+    Detection parameters of a tracker. Most thresholds live inline in the
+    tracker code, so the hash of its source file stands in for them; the
+    tunable attributes and the inference backend (an INT8 export can count
+    differently from the FP32 weights) are added explicitly.
+    """
+    cls = type(tracker)
+    fingerprint = {"tracker": cls.__name__, "export": export_settings(getattr(tracker, "backend", None))}
+    try:
+        fingerprint["source"] = file_sha256(inspect.getsourcefile(cls))
+    except (TypeError, OSError):
+        fingerprint["source"] = None
+    for name in ("target_class_id", *getattr(tracker, "TUNABLE_PARAMS", ())):
+        if hasattr(tracker, name):
+            fingerprint[name] = getattr(tracker, name)
+    return fingerprint
+
+
+def make_key(file_hash: str, mode: str, weights_hash: str, params: dict):
+    payload = json.dumps(
+        {"file": file_hash, "mode": mode, "weights": weights_hash, "params": params},
+        sort_keys=True, separators=(",", ":"), default=str
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class ResultCache:
+    """
+    Stores the annotated output and final count of a job under a key derived
+    from the input hash and processing config. Entries are evicted least
+    recently used first once the directory exceeds max_bytes.
+    """
+    def __init__(self, root: str, max_bytes: int = RESULT_CACHE_MAX_BYTES):
+        self.root = root
+        self.max_bytes = max_bytes
+        self.index_path = os.path.join(root, "index.json")
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        os.makedirs(root, exist_ok=True)
+        self.index = self._load_index()
+
+    def _load_index(self):
+        try:
+            with open(self.index_path, "r") as f:
+                index = json.load(f)
+        except (FileNotFoundError, ValueError):
+            return {}
+        # Drop entries whose files went missing
+        return {k: v for k, v in index.items() if os.path.exists(self._path(k, v["ext"]))}
+
+    def _save_index(self):
+        tmp = self.index_path + ".tmp"
+        with open(tmp, "w") as f:
+            json.dump(self.index, f)
+        os.replace(tmp, self.index_path)
+
+    def _path(self, key: str, ext: str):
+        return os.path.join(self.root, f"{key}{ext}")
+
+    def get(self, key: str):
+        """Returns the entry (count, results, ext) and marks it recently used, or None."""
+        with self.lock:
+            entry = self.index.get(key)
+            if entry is None or not os.path.exists(self._path(key, entry["ext"])):
+                self.index.pop(key, None)
+                self.misses += 1
+                return None
+            entry["last_access"] = time.time()
+            self.hits += 1
+            self._save_index()
+            return dict(entry)
+
+    def materialize(self, key: str, entry: dict, dest_path: str):
+        """Places the cached output at dest_path (hard link when possible, else copy)."""
+        src = self._path(key, entry["ext"])
+        try:
+            os.link(src, dest_path)
+        except OSError:
+            shutil.copyfile(src, dest_path)
+
+    def put(self, key: str, output_path: str, results: dict):
+        if not os.path.exists(output_path):
+            return
+        ext = os.path.splitext(output_path)[1]
+        size = os.path.getsize(output_path)
+        if size > self.max_bytes:
+            return # Would evict everything else and still not fit
+        dest = self._path(key, ext)
+        tmp = dest + ".tmp"
+        shutil.copyfile(output_path, tmp)
+        os.replace(tmp, dest)
+        with self.lock:
+            self.index[key] = {
+                "ext": ext,
+                "size": size,
+                "results": results,
+                "created": time.time(),
+                "last_access": time.time(),
+            }
+            self._evict()
+            self._save_index()
+
+    def _evict(self):
+        total = sum(e["size"] for e in self.index.values())
+        for key, entry in sorted(self.index.items(), key=lambda kv: kv[1]["last_access"]):
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(self._path(key, entry["ext"]))
+            except OSError:
+                pass
+            total -= entry["size"]
+            del self.index[key]
+
+    def stats(self):
+        with self.lock:
+            return {
+                "entries": len(self.index),
+                "bytes": sum(e["size"] for e in self.index.values()),
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+            }
@@ -0,0 +1,285 @@
+import gzip
+import os
+import re
+import shutil
+import threading
+import time
+
+# Disk retention for uploads, outputs and per-task scratch data
+RETENTION_ENABLED = os.getenv("RETENTION_ENABLED", "true").lower() == "true"
+RETENTION_INTERVAL_SECONDS = float(os.getenv("RETENTION_INTERVAL_SECONDS", "60"))
+RETENTION_BATCH = int(os.getenv("RETENTION_BATCH", "50")) # Max files removed / moved per pass
+RETENTION_GRACE_SECONDS = float(os.getenv("RETENTION_GRACE_SECONDS", "3600")) # Files with no task record yet (upload in flight)
+RETENTION_MAX_AGE_DAYS = float(os.getenv("RETENTION_MAX_AGE_DAYS", "0")) # 0: no age limit, budgets only
+UPLOAD_BUDGET_BYTES = int(os.getenv("UPLOAD_BUDGET_BYTES", str(20 * 1024 ** 3)))
+DETECTION_BUDGET_BYTES = int(os.getenv("DETECTION_BUDGET_BYTES", str(20 * 1024 ** 3)))
+STREAM_BUDGET_BYTES = int(os.getenv("STREAM_BUDGET_BYTES", str(5 * 1024 ** 3)))
+CHECKPOINT_BUDGET_BYTES = int(os.getenv("CHECKPOINT_BUDGET_BYTES", str(5 * 1024 ** 3)))
+# Cold tier: older outputs move here (gzip when it pays) instead of being deleted; empty = off
+COLD_TIER_DIR = os.getenv("COLD_TIER_DIR", "")
+COLD_AFTER_DAYS = float(os.getenv("COLD_AFTER_DAYS", "7"))
+COLD_BUDGET_BYTES = int(os.getenv("COLD_BUDGET_BYTES", str(100 * 1024 ** 3)))
+COLD_MIN_SAVING = 0.1 # Compress only if a sample shrinks by 10% (H.264 / JPEG rarely do)
+COLD_SAMPLE_BYTES = 1024 * 1024
+
+DAY = 86400
+
+
+def upload_task_id(name):
+    """uploads/<task_id>_<filename>"""
+    if name.startswith(".") or "_" not in name:
+        return None
+    return name.split("_", 1)[0]
+
+
+def output_task_id(name):
+    """detections/detected_<task_id>.<ext> (also .gz in the cold tier, .<ext>.partNNNN.mp4 while segmented)"""
+    if name.endswith(".gz"):
+        name = name[:-3]
+    if not name.startswith("detected_"):
+        return None
+    name = re.sub(r"\.part\d+\.mp4$", "", name)
+    return os.path.splitext(name[len("detected_"):])[0]
+
+
+def dir_task_id(name):
+    """streams/<task_id>/"""
+    return None if name.startswith(".") else name
+
+
+def checkpoint_task_id(name):
+    """checkpoints/<task_id>.ckpt (and the .ckpt.tmp being written)"""
+    for suffix in (".ckpt", ".ckpt.tmp"):
+        if name.endswith(suffix) and not name.startswith("."):
+            return name[:-len(suffix)]
+    return None
+
+
+class StorageArea:
+    """One managed directory: its byte budget and how a file name maps to its task."""
+    def __init__(self, name, path, budget, task_id_of, cold=False):
+        self.name = name
+        self.path = path
+        self.budget = budget
+        self.task_id_of = task_id_of
+        self.cold = cold # Evicted entries move to the cold tier instead of being deleted
+        self.bytes = 0
+        self.files = 0
+
+
+class Entry:
+    def __init__(self, area, name, path, size, mtime, task_id):
+        self.area = area
+        self.name = name
+        self.path = path
+        self.size = size
+        self.mtime = mtime
+        self.task_id = task_id
+        self.last_used = mtime
+
+
+def entry_size(entry):
+    """Bytes of a file, or of everything below a directory."""
+    if not entry.is_dir(follow_symlinks=False):
+        return entry.stat(follow_symlinks=False).st_size
+    total = 0
+    for root, _, files in os.walk(entry.path):
+        for name in files:
+            try:
+                total += os.path.getsize(os.path.join(root, name))
+            except OSError:
+                pass
+    return total
+
+
+def compresses(path, min_saving=COLD_MIN_SAVING, sample=COLD_SAMPLE_BYTES):
+    """Whether gzip is worth it for this file, judged on its first megabyte."""
+    with open(path, "rb") as f:
+        head = f.read(sample)
+    if not head:
+        return False
+    return len(gzip.compress(head, compresslevel=6)) <= len(head) * (1 - min_saving)
+
+
+class RetentionManager:
+    """
+    Keeps each storage area under its byte budget. Every pass scans the
+    areas (one os.scandir each), then deletes in this order: files of tasks
+    that no longer exist, files past RETENTION_MAX_AGE_DAYS, and least
+    recently used files while an area is over budget. Outputs of an area
+    with a cold tier are moved there instead once they are COLD_AFTER_DAYS
+    old or the area is over budget. Files of queued / running tasks are never
+    touched, and a pass does at most `batch` actions, so it stays short and
+    the next pass carries on.
+
+    task_state(task_id) returns "active", "known" or None (no record);
+    on_change(task_id, area_name, action) lets the owner update the record.
+    """
+    def __init__(self, areas, task_state, on_change=None, cold_dir=COLD_TIER_DIR, cold_after_days=COLD_AFTER_DAYS,
+                 cold_budget=COLD_BUDGET_BYTES, max_age_days=RETENTION_MAX_AGE_DAYS, batch=RETENTION_BATCH,
+                 grace_seconds=RETENTION_GRACE_SECONDS):
+        self.areas = list(areas)
+        self.task_state = task_state
+        self.on_change = on_change
+        self.cold = StorageArea("cold", cold_dir, cold_budget, output_task_id) if cold_dir else None
+        if self.cold is not None:
+            os.makedirs(cold_dir, exist_ok=True)
+            self.areas.append(self.cold)
+        self.cold_after = cold_after_days * DAY
+        self.max_age = max_age_days * DAY
+        self.batch = batch
+        self.grace = grace_seconds
+        self.last_used = {} # task_id -> last time its output was served (mtime is the fallback)
+        self.counters = {"deleted": 0, "deleted_bytes": 0, "moved": 0, "moved_bytes": 0, "restored": 0}
+        self.last_run = None
+        self.last_seconds = None
+        self._lock = threading.Lock() # One pass at a time; restore() waits for it
+
+    def touch(self, task_id):
+        """Marks a task's files as just used (LRU order)."""
+        self.last_used[task_id] = time.time()
+
+    def _scan(self, area):
+        entries = []
+        if not area.path or not os.path.isdir(area.path):
+            return entries
+        with os.scandir(area.path) as it:
+            for item in it:
+                task_id = area.task_id_of(item.name)
+                if task_id is None:
+                    continue # Not a task file (e.g. uploads/.partial)
+                try:
+                    st = item.stat(follow_symlinks=False)
+                    entry = Entry(area, item.name, item.path, entry_size(item), st.st_mtime, task_id)
+                except OSError:
+                    continue # Removed while scanning
+                entry.last_used = max(entry.mtime, self.last_used.get(task_id, 0))
+                entries.append(entry)
+        area.bytes = sum(e.size for e in entries)
+        area.files = len(entries)
+        return entries
+
+    def plan(self, area, entries, now):
+        """(entry, action, reason) for this area, most urgent first; action is "delete" or "cold"."""
+        actions = []
+        states = {}
+        remaining = area.bytes
+        for entry in sorted(entries, key=lambda e: e.last_used):
+            if entry.task_id not in states:
+                states[entry.task_id] = self.task_state(entry.task_id)
+            state = states[entry.task_id]
+            age = now - entry.last_used
+            if state == "active" or (state is None and now - entry.mtime < self.grace):
+                continue
+            to_cold = area.cold and self.cold is not None
+            if state is None:
+                action = ("delete", "orphan")
+            elif self.max_age and age > self.max_age:
+                action = ("delete", "expired")
+            elif to_cold and self.cold_after and age > self.cold_after:
+                action = ("cold", "age")
+            elif remaining > area.budget:
+                action = ("cold" if to_cold else "delete", "budget")
+            else:
+                continue
+            actions.append((entry, action[0], action[1]))
+            remaining -= entry.size
+        # Cleanup that is due regardless of the budget goes first
+        return sorted(actions, key=lambda a: a[2] == "budget")
+
+    def run_once(self):
+        """One incremental pass; returns the actions taken."""
+        with self._lock:
+            started = time.perf_counter()
+            now = time.time()
+            done = []
+            for area in self.areas:
+                entries = self._scan(area)
+                for entry, action, reason in self.plan(area, entries, now):
+                    if len(done) >= self.batch:
+                        break
+                    try:
+                        if action == "cold":
+                            self._move_cold(entry)
+                        else:
+                            self._delete(entry)
+                    except OSError as e:
+                        print(f"Retention: could not {action} {entry.path}: {e}")
+                        continue
+                    area.bytes -= entry.size
+                    area.files -= 1
+                    done.append({"area": area.name, "name": entry.name, "action": action, "reason": reason,
+                                 "bytes": entry.size})
+                    if self.on_change is not None:
+                        self.on_change(entry.task_id, area.name, action)
+            self.last_run = now
+            self.last_seconds = round(time.perf_counter() - started, 3)
+        if done:
+            freed = sum(d["bytes"] for d in done) / 2**20
+            print(f"Retention: {len(done)} file(s) removed or moved to cold storage, {freed:.1f} MB freed")
+        return done
+
+    def _delete(self, entry):
+        if os.path.isdir(entry.path):
+            shutil.rmtree(entry.path)
+        else:
+            os.remove(entry.path)
+        self.counters["deleted"] += 1
+        self.counters["deleted_bytes"] += entry.size
+
+    def _move_cold(self, entry):
+        gz = compresses(entry.path)
+        dest = os.path.join(self.cold.path, entry.name + (".gz" if gz else ""))
+        tmp = dest + ".tmp"
+        if gz:
+            with open(entry.path, "rb") as src, gzip.open(tmp, "wb", compresslevel=6) as dst:
+                shutil.copyfileobj(src, dst, 1024 * 1024)
+        else:
+            shutil.copyfile(entry.path, tmp)
+        os.replace(tmp, dest)
+        os.remove(entry.path)
+        self.counters["moved"] += 1
+        self.counters["moved_bytes"] += entry.size
+
+    def cold_path(self, name):
+        """Path of a file in the cold tier (plain or gzipped), or None."""
+        if self.cold is None:
+            return None
+        for candidate in (name + ".gz", name):
+            path = os.path.join(self.cold.path, candidate)
+            if os.path.exists(path):
+                return path
+        return None
+
+    def restore(self, name, dest_dir):
+        """Brings a cold file back to dest_dir/name; returns its path, or None if it is not in the cold tier."""
+        with self._lock:
+            src = self.cold_path(name)
+            if src is None:
+                return None
+            dest = os.path.join(dest_dir, name)
+            tmp = dest + ".tmp"
+            if src.endswith(".gz"):
+                with gzip.open(src, "rb") as f, open(tmp, "wb") as out:
+                    shutil.copyfileobj(f, out, 1024 * 1024)
+            else:
+                shutil.copyfile(src, tmp)
+            os.replace(tmp, dest)
+            os.remove(src)
+            self.counters["restored"] += 1
+        task_id = output_task_id(name)
+        if task_id:
+            self.touch(task_id) # Otherwise the next pass would move it straight back
+        return dest
+
+    def stats(self):
+        return {
+            "areas": {a.name: {"path": a.path, "bytes": a.bytes, "files": a.files, "budget": a.budget}
+                      for a in self.areas},
+            "cold_tier": self.cold is not None,
+            "max_age_days": self.max_age / DAY or None,
+            "batch": self.batch,
+            "last_run": self.last_run,
+            "last_seconds": self.last_seconds,
+            **self.counters,
+        }
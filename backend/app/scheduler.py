@@ -0,0 +1,319 @@
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future
+
+from .cancellation import TaskCancelled
+
+# Priority classes (lower value = served first)
+LIVE = 0
+INTERACTIVE = 1
+BATCH = 2
+PRIORITY_NAMES = {LIVE: "live", INTERACTIVE: "interactive", BATCH: "batch"}
+
+# Inference scheduler configuration
+SCHEDULER_ENABLED = os.getenv("SCHEDULER_ENABLED", "true").lower() == "true"
+# End-to-end latency targets (queue wait + inference) per class, for stats / misses
+LATENCY_TARGETS_MS = {
+    LIVE: float(os.getenv("SCHED_LIVE_TARGET_MS", "66")),
+    INTERACTIVE: float(os.getenv("SCHED_INTERACTIVE_TARGET_MS", "500")),
+    BATCH: float(os.getenv("SCHED_BATCH_TARGET_MS", "5000")),
+}
+# How long the head request may wait for compatible work to batch with
+BATCH_WINDOWS_MS = {
+    LIVE: float(os.getenv("SCHED_LIVE_WINDOW_MS", "0")),
+    INTERACTIVE: float(os.getenv("SCHED_INTERACTIVE_WINDOW_MS", "5")),
+    BATCH: float(os.getenv("SCHED_BATCH_WINDOW_MS", "10")),
+}
+LIVE_ACTIVE_SECONDS = 1.0 # Live counts as active this long after its last request
+# Frames per forward pass (upper bound; while live is active, lower classes
+# shrink their chunks so one chunk fits in the live latency target)
+MAX_BATCH_FRAMES = {
+    LIVE: int(os.getenv("SCHED_LIVE_MAX_BATCH", "8")),
+    INTERACTIVE: int(os.getenv("SCHED_INTERACTIVE_MAX_BATCH", "8")),
+    BATCH: int(os.getenv("SCHED_BATCH_MAX_BATCH", "4")),
+}
+
+
+def _freeze(value):
+    if isinstance(value, (list, tuple)):
+        return tuple(_freeze(v) for v in value)
+    if isinstance(value, dict):
+        return tuple(sorted((k, _freeze(v)) for k, v in value.items()))
+    return value
+
+
+class InferenceRequest:
+    def __init__(self, model, frames, priority, params, cancel_token=None):
+        self.model = model
+        self.cancel_token = cancel_token
+        self.frames = frames
+        self.priority = priority
+        self.params = params
+        # Requests batch together only for the same model and predict() arguments
+        self.key = (id(model), _freeze(params))
+        self.future = Future()
+        self.enqueued = time.perf_counter()
+        self.next_frame = 0
+        self.chunks = {} # first frame index -> results of that chunk
+        self.done_frames = 0
+
+
+class ClassStats:
+    def __init__(self):
+        self.requests = 0
+        self.frames = 0
+        self.batches = 0
+        self.misses = 0
+        self.avg_wait = 0.0 # EWMA, seconds
+        self.avg_latency = 0.0
+
+    def observe(self, wait, latency, target):
+        self.requests += 1
+        self.avg_wait = wait if self.requests == 1 else 0.8 * self.avg_wait + 0.2 * wait
+        self.avg_latency = latency if self.requests == 1 else 0.8 * self.avg_latency + 0.2 * latency
+        if latency * 1000 > target:
+            self.misses += 1
+
+
+class InferenceScheduler:
+    """
+    Single owner of model forward passes. Callers (live cameras, image and
+    video jobs) submit frames with a priority class; one worker thread always
+    serves the highest class first, so a large upload only ever delays the
+    live view by one (small) batch chunk. Compatible requests of the same
+    class - same model, same predict() arguments - are merged into one
+    forward pass, waiting at most the class's batch window for company.
+    """
+    def __init__(self, max_batch=MAX_BATCH_FRAMES, windows_ms=BATCH_WINDOWS_MS, targets_ms=LATENCY_TARGETS_MS):
+        self.max_batch = dict(max_batch)
+        self.windows = {p: ms / 1000.0 for p, ms in windows_ms.items()}
+        self.targets_ms = dict(targets_ms)
+        self.queues = {p: deque() for p in PRIORITY_NAMES}
+        self.class_stats = {p: ClassStats() for p in PRIORITY_NAMES}
+        self.frame_cost = {p: 0.0 for p in PRIORITY_NAMES} # EWMA seconds per frame
+        self.last_live = 0.0
+        self.busy_time = 0.0
+        self.started = time.perf_counter()
+
+        # Parallel forward passes (set by the execution planner): worker i > 0
+        # runs on its own replica of each model, optionally pinned to cores
+        self.workers = 1
+        self.replicate = None
+        self.affinity = None
+        self._replicas = {} # (id(model), worker) -> replica
+
+        self._cond = threading.Condition()
+        self._threads = {} # worker index -> Thread
+
+    def submit(self, model, frames, priority=BATCH, cancel_token=None, **params):
+        """
+        Queues frames (one image or a list) for model.predict(); returns a Future
+        of the Results list. Once cancel_token is cancelled, the request's
+        remaining chunks are dropped and the future fails with TaskCancelled.
+        """
+        if not isinstance(frames, list):
+            frames = [frames]
+        request = InferenceRequest(model, frames, priority, params, cancel_token)
+        if not frames:
+            request.future.set_result([])
+            return request.future
+        with self._cond:
+            if priority == LIVE:
+                self.last_live = request.enqueued
+            self.queues[priority].append(request)
+            self._ensure_worker()
+            self._cond.notify()
+        return request.future
+
+    def run(self, model, frames, priority=BATCH, cancel_token=None, **params):
+        """Blocking submit(); runs inline when called from the worker itself."""
+        if threading.current_thread() in self._threads.values():
+            return model.predict(frames, **params)
+        return self.submit(model, frames, priority, cancel_token, **params).result()
+
+    def _ensure_worker(self):
+        for index in range(self.workers):
+            thread = self._threads.get(index)
+            if thread is None or not thread.is_alive():
+                name = "inference-scheduler" if index == 0 else f"inference-scheduler-{index}"
+                thread = threading.Thread(target=self._run, args=(index,), name=name, daemon=True)
+                self._threads[index] = thread
+                thread.start()
+
+    def configure(self, workers=1, replicate=None, affinity=None):
+        """
+        Sets the number of parallel workers. replicate(model) builds the extra
+        model copies (a shared ultralytics model serialises predict() calls);
+        affinity is an optional list of CPU sets, one per worker.
+        """
+        with self._cond:
+            self.workers = max(1, int(workers))
+            self.replicate = replicate
+            self.affinity = affinity
+            self._replicas = {k: v for k, v in self._replicas.items() if k[1] < self.workers}
+            if self._threads:
+                self._ensure_worker()
+            self._cond.notify_all() # Surplus workers exit
+
+    def _model_for(self, model, index):
+        if index == 0 or self.replicate is None:
+            return model
+        key = (id(model), index)
+        replica = self._replicas.get(key)
+        if replica is None:
+            replica = self.replicate(model)
+            self._replicas[key] = replica
+        return replica
+
+    def _pin(self, index):
+        if self.affinity and index < len(self.affinity) and hasattr(os, "sched_setaffinity"):
+            try:
+                os.sched_setaffinity(0, self.affinity[index]) # Calling thread only (Linux)
+            except OSError as e:
+                print(f"Could not pin inference worker {index}: {e}")
+
+    # --- Worker ---
+
+    def _next_priority(self):
+        for priority in sorted(self.queues):
+            if self.queues[priority]:
+                return priority
+        return None
+
+    def _take(self, priority, key, room):
+        """Moves up to `room` frames of compatible queued work into a batch."""
+        taken = []
+        queue = self.queues[priority]
+        for request in list(queue):
+            if request.cancel_token is not None and request.cancel_token.cancelled:
+                queue.remove(request)
+                if not request.future.done():
+                    request.future.set_exception(TaskCancelled())
+                continue
+            if room <= 0:
+                break
+            if request.key != key:
+                continue
+            n = min(room, len(request.frames) - request.next_frame)
+            taken.append((request, request.next_frame, request.next_frame + n))
+            request.next_frame += n
+            room -= n
+            if request.next_frame >= len(request.frames):
+                queue.remove(request)
+        return taken, room
+
+    def _room(self, priority):
+        """Frames this class may put in one forward pass right now."""
+        room = self.max_batch[priority]
+        live_active = time.perf_counter() - self.last_live < LIVE_ACTIVE_SECONDS
+        if priority != LIVE and live_active and self.frame_cost[priority] > 0:
+            budget = self.targets_ms[LIVE] / 1000.0
+            room = max(1, min(room, int(budget / self.frame_cost[priority])))
+        return room
+
+    def _collect(self, index=0):
+        with self._cond:
+            while True:
+                if index >= self.workers:
+                    return None, None # Scaled down
+                priority = self._next_priority()
+                if priority is not None:
+                    break
+                self._cond.wait()
+            head = self.queues[priority][0]
+            batch, room = self._take(priority, head.key, self._room(priority))
+            if not batch:
+                return priority, batch # Head was cancelled
+            # Opportunistic batching: briefly wait for more of the same work
+            deadline = head.enqueued + self.windows[priority]
+            while room > 0 and time.perf_counter() < deadline:
+                self._cond.wait(deadline - time.perf_counter())
+                if self._next_priority() is not None and self._next_priority() < priority:
+                    break # Higher class arrived: run what we have
+                more, room = self._take(priority, head.key, room)
+                batch.extend(more)
+            return priority, batch
+
+    def _run(self, index=0):
+        self._pin(index)
+        while True:
+            priority, batch = self._collect(index)
+            if batch is None:
+                with self._cond:
+                    if self._threads.get(index) is threading.current_thread():
+                        del self._threads[index]
+                return
+            if not batch:
+                continue
+            head = batch[0][0]
+            frames = [f for request, lo, hi in batch for f in request.frames[lo:hi]]
+            started = time.perf_counter()
+            try:
+                results = self._model_for(head.model, index).predict(frames, **head.params)
+            except Exception as e:
+                with self._cond:
+                    for request, _, _ in batch:
+                        if request in self.queues[priority]:
+                            self.queues[priority].remove(request) # Drop its remaining chunks
+                for request, _, _ in batch:
+                    if not request.future.done():
+                        request.future.set_exception(e)
+                continue
+            finished = time.perf_counter()
+            done = []
+            with self._cond: # Several workers may finish at once
+                self.busy_time += finished - started
+                cost = (finished - started) / len(frames)
+                self.frame_cost[priority] = cost if not self.frame_cost[priority] else 0.8 * self.frame_cost[priority] + 0.2 * cost
+                stats = self.class_stats[priority]
+                stats.batches += 1
+                stats.frames += len(frames)
+                offset = 0
+                for request, lo, hi in batch:
+                    request.chunks[lo] = results[offset:offset + hi - lo]
+                    offset += hi - lo
+                    request.done_frames += hi - lo
+                    if request.done_frames == len(request.frames) and not request.future.done():
+                        stats.observe(started - request.enqueued, finished - request.enqueued, self.targets_ms[priority])
+                        done.append(request)
+            for request in done:
+                # Chunks of one request may finish out of order on different workers
+                request.future.set_result([r for lo in sorted(request.chunks) for r in request.chunks[lo]])
+
+    def stats(self):
+        uptime = time.perf_counter() - self.started
+        with self._cond:
+            depth = {PRIORITY_NAMES[p]: len(q) for p, q in self.queues.items()}
+        return {
+            "workers": self.workers,
+            "utilization": round(self.busy_time / uptime / self.workers, 3) if uptime else 0.0,
+            "classes": {
+                PRIORITY_NAMES[p]: {
+                    "queued": depth[PRIORITY_NAMES[p]],
+                    "requests": s.requests,
+                    "frames": s.frames,
+                    "batches": s.batches,
+                    "avg_batch_size": round(s.frames / s.batches, 2) if s.batches else 0.0,
+                    "avg_wait_ms": round(s.avg_wait * 1000, 1),
+                    "avg_latency_ms": round(s.avg_latency * 1000, 1),
+                    "frame_cost_ms": round(self.frame_cost[p] * 1000, 1),
+                    "target_ms": self.targets_ms[p],
+                    "target_misses": s.misses,
+                }
+                for p, s in self.class_stats.items()
+            },
+        }
+
+
+scheduler = InferenceScheduler()
+
+
+def infer(model, frames, priority=BATCH, cancel_token=None, **params):
+    """model.predict() through the shared scheduler (or directly when it is disabled)."""
+    if not SCHEDULER_ENABLED:
+        if cancel_token is not None:
+            cancel_token.check()
+        return model.predict(frames, **params)
+    return scheduler.run(model, frames, priority, cancel_token, **params)
@@ -0,0 +1,304 @@
+import argparse
+import itertools
+import json
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import cv2
+import numpy as np
+
+try:
+    from backend.app.planner import available_cpus
+    from backend.app.quantize import DATASET_DIR, BACKEND_DIR, list_images
+    from backend.app.detection_cache import DetectionCache, DetectionRecorder, detection_key
+    from backend.app.result_cache import file_sha256
+    from backend.app.tracking import TrackSession, DEFAULT_TRACKER_CONFIG
+    from backend.app.tracker import tiling_params, TILE_LAYOUTS
+except ImportError:
+    from .planner import available_cpus
+    from .quantize import DATASET_DIR, BACKEND_DIR, list_images
+    from .detection_cache import DetectionCache, DetectionRecorder, detection_key
+    from .result_cache import file_sha256
+    from .tracking import TrackSession, DEFAULT_TRACKER_CONFIG
+    from .tracker import tiling_params, TILE_LAYOUTS
+
+# Parameter sweeps for counting accuracy vs. speed
+MATCH_IOU = 0.5 # A detection matches a labeled sack at this IoU
+
+
+def parse_list(text, cast=float):
+    """"0.15,0.25" -> [0.15, 0.25]; "on,off" -> [True, False] for cast=bool."""
+    if cast is bool:
+        return [v.strip().lower() in ("1", "on", "true", "yes") for v in text.split(",")]
+    return [cast(v) for v in text.split(",")]
+
+
+def grid(space):
+    """Every combination of {name: [values]} as a list of {name: value}."""
+    names = list(space)
+    return [dict(zip(names, values)) for values in itertools.product(*(space[n] for n in names))]
+
+
+def load_labels(image_path, width, height):
+    """Labeled boxes of an image (YOLO txt next to images/ in labels/) as pixel xyxy."""
+    directory, name = os.path.split(image_path)
+    label_path = os.path.join(os.path.dirname(directory), "labels", os.path.splitext(name)[0] + ".txt")
+    boxes = []
+    if os.path.exists(label_path):
+        with open(label_path) as f:
+            for line in f:
+                parts = line.split()
+                if len(parts) < 5:
+                    continue
+                cx, cy, w, h = (float(v) for v in parts[1:5])
+                boxes.append([(cx - w / 2) * width, (cy - h / 2) * height, (cx + w / 2) * width, (cy + h / 2) * height])
+    return np.array(boxes, dtype=np.float32).reshape(-1, 4)
+
+
+def box_iou(a, b):
+    """IoU matrix of xyxy boxes a (N) and b (M)."""
+    lt = np.maximum(a[:, None, :2], b[None, :, :2])
+    rb = np.minimum(a[:, None, 2:], b[None, :, 2:])
+    inter = np.clip(rb - lt, 0, None).prod(axis=2)
+    area_a = (a[:, 2] - a[:, 0]) * (a[:, 3] - a[:, 1])
+    area_b = (b[:, 2] - b[:, 0]) * (b[:, 3] - b[:, 1])
+    return inter / np.maximum(area_a[:, None] + area_b[None, :] - inter, 1e-9)
+
+
+def match(pred, truth, threshold=MATCH_IOU):
+    """True positives: greedy one-to-one matching in prediction order (highest confidence first)."""
+    if len(pred) == 0 or len(truth) == 0:
+        return 0
+    iou = box_iou(pred, truth)
+    used = np.zeros(len(truth), dtype=bool)
+    hits = 0
+    for row in iou:
+        row = np.where(used, 0, row)
+        best = int(row.argmax())
+        if row[best] >= threshold:
+            used[best] = True
+            hits += 1
+    return hits
+
+
+# --- Worker side (one model per process) ---
+
+_worker = {}
+
+
+def init_worker(model_path, threads):
+    import torch
+    try:
+        from backend.app.tracker import JuteBagTracker
+    except ImportError:
+        from .tracker import JuteBagTracker
+    torch.set_num_threads(threads)
+    cv2.setNumThreads(threads)
+    _worker["tracker"] = JuteBagTracker(model_path)
+    _worker["images"] = {}
+
+
+def evaluate_images(config, image_paths, strict=False):
+    """Runs detect_with_tiling with config over the images; count error, precision / recall and speed."""
+    tracker = _worker["tracker"]
+    images = _worker["images"]
+    errors, true_pos, n_pred, n_truth = [], 0, 0, 0
+    seconds = 0.0
+    for path in image_paths:
+        if path not in images:
+            image = cv2.imread(path)
+            images[path] = (image, load_labels(path, image.shape[1], image.shape[0]) if image is not None else None)
+        image, truth = images[path]
+        if image is None:
+            continue
+        started = time.perf_counter()
+        boxes, _ = tracker.detect_with_tiling(image, strict=strict, params=config)
+        seconds += time.perf_counter() - started
+        pred = boxes.cpu().numpy().reshape(-1, 4).astype(np.float32)
+        errors.append(abs(len(pred) - len(truth)))
+        true_pos += match(pred, truth)
+        n_pred += len(pred)
+        n_truth += len(truth)
+    return {
+        "kind": "tiling",
+        "config": config,
+        "samples": len(errors),
+        "count_mae": round(float(np.mean(errors)), 3) if errors else None,
+        "precision": round(true_pos / n_pred, 3) if n_pred else None,
+        "recall": round(true_pos / n_truth, 3) if n_truth else None,
+        "fps": round(len(errors) / seconds, 2) if seconds else None,
+    }
+
+
+def record_video(video_path, model_path, cache_dir):
+    """Tracked boxes of a video with the zone tracker's detector settings, cached under the app's key."""
+    try:
+        from backend.app.zone_tracker import ModularZoneTracker
+    except ImportError:
+        from .zone_tracker import ModularZoneTracker
+    cache = DetectionCache(cache_dir)
+    tracker = ModularZoneTracker(model_path)
+    key = detection_key(file_sha256(video_path), file_sha256(tracker.model_path), tracker.backend,
+                        tracker.infer_params, DEFAULT_TRACKER_CONFIG)
+    if cache.get(key) is not None:
+        return key, 0.0
+    cap = cv2.VideoCapture(video_path)
+    fps = int(cap.get(cv2.CAP_PROP_FPS)) or 25
+    recorder = DetectionRecorder()
+    recorder.begin(int(cap.get(cv2.CAP_PROP_FRAME_WIDTH)), int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT)), fps)
+    session = TrackSession(frame_rate=fps)
+    started = time.perf_counter()
+    frame_idx = 0
+    while True:
+        success, frame = cap.read()
+        if not success:
+            break
+        result = session.track(tracker.model.predict(frame, verbose=False, **tracker.infer_params)[0])
+        if result.boxes.id is not None:
+            recorder.add(frame_idx, result.boxes.xywh.cpu().numpy(), result.boxes.id.int().cpu().tolist(),
+                         result.boxes.conf.cpu().numpy(), result.boxes.cls.int().cpu().tolist())
+        else:
+            recorder.add(frame_idx)
+        frame_idx += 1
+    cap.release()
+    cache.put(key, recorder)
+    return key, time.perf_counter() - started
+
+
+def evaluate_zone(config, recordings, cache_dir):
+    """Replays each video's cached detections with config; count error against the annotated totals."""
+    try:
+        from backend.app.zone_tracker import ModularZoneTracker
+    except ImportError:
+        from .zone_tracker import ModularZoneTracker
+    cache = DetectionCache(cache_dir)
+    counter = ModularZoneTracker(None)
+    for name, value in config.items():
+        setattr(counter, name, value)
+    errors, frames, seconds = [], 0, 0.0
+    for key, expected in recordings:
+        detections = cache.get(key)
+        started = time.perf_counter()
+        results = counter.replay(detections)
+        seconds += time.perf_counter() - started
+        errors.append(abs(results["count"] - expected))
+        frames += results["frames"]
+    return {
+        "kind": "zone",
+        "config": config,
+        "samples": len(errors),
+        "count_mae": round(float(np.mean(errors)), 3) if errors else None,
+        "precision": None, # Videos are annotated with totals only
+        "recall": None,
+        "fps": round(frames / seconds, 1) if seconds else None, # Counting logic only; detection is recorded once
+    }
+
+
+# --- Report ---
+
+def pareto(rows):
+    """Marks rows no other row beats on both count error (lower) and speed (higher)."""
+    for row in rows:
+        row["pareto"] = row["count_mae"] is not None and not any(
+            other is not row and other["count_mae"] is not None
+            and other["count_mae"] <= row["count_mae"] and (other["fps"] or 0) >= (row["fps"] or 0)
+            and (other["count_mae"] < row["count_mae"] or (other["fps"] or 0) > (row["fps"] or 0))
+            for other in rows
+        )
+    return rows
+
+
+def print_rows(rows):
+    rows = sorted(rows, key=lambda r: (r["count_mae"] is None, r["count_mae"], -(r["fps"] or 0)))
+    print(f"{'':2}{'count MAE':>10} {'precision':>10} {'recall':>7} {'fps':>8}  config")
+    for row in rows:
+        config = " ".join(f"{k}={v}" for k, v in row["config"].items())
+        print(f"{'*' if row['pareto'] else '':2}{row['count_mae']!s:>10} {row['precision']!s:>10} "
+              f"{row['recall']!s:>7} {row['fps']!s:>8}  {config}")
+    print("* Pareto frontier (no other configuration is both more accurate and faster)")
+
+
+def run_pool(fn, jobs, model_path, workers):
+    """Runs fn(*job) for each job over a process pool, one model per worker process."""
+    threads = max(1, len(available_cpus()) // workers)
+    # Spawn: fresh interpreters (no forked torch threads); inference runs inline in each worker
+    os.environ["SCHEDULER_ENABLED"] = "false"
+    context = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(workers, mp_context=context, initializer=init_worker,
+                             initargs=(model_path, threads)) as pool:
+        futures = [pool.submit(fn, *job) for job in jobs]
+        return [future.result() for future in futures]
+
+
+def main(argv=None):
+    defaults = tiling_params()
+    parser = argparse.ArgumentParser(description="Sweep tiling / zone-counting parameters: count accuracy vs. speed")
+    parser.add_argument("--model", default=os.path.join(BACKEND_DIR, "models", "sacks_custom.pt"))
+    parser.add_argument("--dataset", default=DATASET_DIR, help="YOLO dataset with labeled splits")
+    parser.add_argument("--splits", default="valid,test")
+    parser.add_argument("--limit", type=int, help="Images per split")
+    parser.add_argument("--strict", action="store_true", help="Sweep the strict (conveyor / truck) tiling mode")
+    parser.add_argument("--conf", default=f"{defaults['conf']},0.25,0.35")
+    parser.add_argument("--iou", default=str(defaults["iou"]), help="Per-tile NMS IoU")
+    parser.add_argument("--nms", default=f"{defaults['nms']},0.3,0.45", help="Cross-tile NMS IoU")
+    parser.add_argument("--dedup", default=f"{defaults['dedup']},30", help="Centroid dedup radius (px)")
+    parser.add_argument("--layout", default=",".join(TILE_LAYOUTS), help=f"Tile layouts ({', '.join(TILE_LAYOUTS)})")
+    parser.add_argument("--tta", default="on,off")
+    parser.add_argument("--videos", help='JSON {"video path": expected count, ...} for the zone-counting sweep')
+    parser.add_argument("--zone-dedup", default="40,60,80", help="Zone per-frame dedup radius (px)")
+    parser.add_argument("--exit-threshold", default="30,50")
+    parser.add_argument("--roi-overlap", default="0.1,0.15,0.25")
+    parser.add_argument("--min-travel", default="5")
+    parser.add_argument("--reconfirm-window", default="100")
+    parser.add_argument("--workers", type=int, default=len(available_cpus()))
+    parser.add_argument("--cache", default=os.path.join(BACKEND_DIR, "cache", "detections"))
+    parser.add_argument("--output", help="Also write all rows as JSON")
+    args = parser.parse_args(argv)
+
+    rows = []
+    images = [p for split in args.splits.split(",") if split
+              for p in list_images(os.path.join(args.dataset, split), args.limit)]
+    if images:
+        configs = grid({
+            "conf": parse_list(args.conf), "iou": parse_list(args.iou), "nms": parse_list(args.nms),
+            "dedup": parse_list(args.dedup), "layout": args.layout.split(","), "augment": parse_list(args.tta, bool),
+        })
+        print(f"Tiling sweep: {len(configs)} configurations x {len(images)} labeled images, "
+              f"{min(args.workers, len(configs))} worker process(es)")
+        rows += run_pool(evaluate_images, [(c, images, args.strict) for c in configs], args.model,
+                         min(args.workers, len(configs)))
+
+    zone_rows = []
+    if args.videos:
+        with open(args.videos) as f:
+            annotated = json.load(f)
+        base = os.path.dirname(os.path.abspath(args.videos))
+        videos = [(os.path.join(base, path), count) for path, count in annotated.items()]
+        # Detection runs once per video (in parallel); every zone configuration replays it
+        recorded = run_pool(record_video, [(path, args.model, args.cache) for path, _ in videos], args.model,
+                            min(args.workers, len(videos)))
+        recordings = [(key, count) for (key, _), (_, count) in zip(recorded, videos)]
+        configs = grid({
+            "dedup_radius": parse_list(args.zone_dedup), "exit_threshold": parse_list(args.exit_threshold, int),
+            "roi_overlap": parse_list(args.roi_overlap), "min_travel": parse_list(args.min_travel),
+            "reconfirm_window": parse_list(args.reconfirm_window, int),
+        })
+        print(f"Zone sweep: {len(configs)} configurations x {len(videos)} annotated video(s)")
+        zone_rows = [evaluate_zone(c, recordings, args.cache) for c in configs]
+
+    if not rows and not zone_rows:
+        print("Nothing to sweep: no labeled images found and no --videos given")
+        return
+    for title, group in (("Tiling (detect_with_tiling)", rows), ("Zone counting (replayed detections)", zone_rows)):
+        if group:
+            print(f"\n{title}")
+            print_rows(pareto(group))
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(rows + zone_rows, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
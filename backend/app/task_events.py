@@ -0,0 +1,76 @@
+import asyncio
+import threading
+
+LONG_POLL_TIMEOUT = 30.0 # Max seconds a long-poll request is held open
+SSE_HEARTBEAT = 15.0 # Seconds between keep-alive comments on idle SSE streams
+
+
+class TaskWatcher:
+    """
+    Version counter per task. Writers (request handlers or worker threads)
+    call bump() after every change; readers await wait_for_change() instead
+    of polling, and are woken on the event loop as soon as the version moves.
+    """
+    def __init__(self):
+        self.versions: dict = {} # task_id -> int
+        self.waiters: dict = {} # task_id -> set of asyncio.Future
+        self.loop = None
+        self.lock = threading.Lock()
+
+    def version(self, task_id: str):
+        with self.lock:
+            return self.versions.get(task_id, 0)
+
+    def seed(self, task_id: str, version: int):
+        """Restores a persisted version (so counters stay monotonic across restarts)."""
+        with self.lock:
+            self.versions[task_id] = max(self.versions.get(task_id, 0), int(version or 0))
+
+    def bump(self, task_id: str):
+        with self.lock:
+            version = self.versions.get(task_id, 0) + 1
+            self.versions[task_id] = version
+        loop = self.loop
+        if loop is not None and not loop.is_closed():
+            try:
+                running = asyncio.get_running_loop()
+            except RuntimeError:
+                running = None
+            if running is loop:
+                self._wake(task_id)
+            else:
+                loop.call_soon_threadsafe(self._wake, task_id)
+        return version
+
+    def _wake(self, task_id: str):
+        for fut in self.waiters.pop(task_id, set()):
+            if not fut.done():
+                fut.set_result(True)
+
+    async def wait_for_change(self, task_id: str, since_version: int, timeout: float = LONG_POLL_TIMEOUT):
+        """Returns the current version once it exceeds since_version, or after timeout."""
+        self.loop = asyncio.get_running_loop()
+        current = self.version(task_id)
+        if current > since_version:
+            return current
+
+        fut = self.loop.create_future()
+        self.waiters.setdefault(task_id, set()).add(fut)
+        try:
+            # A bump may have landed between the check and registering the waiter
+            if self.version(task_id) > since_version:
+                return self.version(task_id)
+            await asyncio.wait_for(fut, timeout)
+        except asyncio.TimeoutError:
+            pass
+        finally:
+            waiting = self.waiters.get(task_id)
+            if waiting is not None:
+                waiting.discard(fut)
+                if not waiting:
+                    self.waiters.pop(task_id, None)
+        return self.version(task_id)
+
+    def forget(self, task_id: str):
+        with self.lock:
+            self.versions.pop(task_id, None)
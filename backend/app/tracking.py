@@ -0,0 +1,137 @@
+import sys
+
+import numpy as np
+
+DEFAULT_TRACKER_CONFIG = "bytetrack.yaml"
+# STrack attributes a checkpoint keeps, besides the Kalman state
+TRACK_FIELDS = ("track_id", "state", "is_activated", "score", "cls", "idx", "tracklet_len", "frame_id", "start_frame")
+
+
+def _plain(value):
+    return value.item() if isinstance(value, np.generic) else value
+
+
+def load_tracker_config(config=DEFAULT_TRACKER_CONFIG):
+    """ByteTrack settings as ultralytics expects them (works across ultralytics releases)."""
+    from ultralytics.utils import IterableSimpleNamespace
+    from ultralytics.utils.checks import check_yaml
+    path = check_yaml(config)
+    try:
+        from ultralytics.utils import YAML
+        cfg = YAML.load(path)
+    except ImportError:
+        from ultralytics.utils import yaml_load
+        cfg = yaml_load(path)
+    return IterableSimpleNamespace(**cfg)
+
+
+class TrackSession:
+    """
+    An independent ByteTrack instance fed from plain detections.
+    model.track(persist=True) keeps one tracker on the model's predictor, so
+    every caller sharing that model would share track state; a session per
+    stream lets detection be batched (or run elsewhere) while each camera or
+    job keeps its own IDs.
+    """
+    def __init__(self, frame_rate=30, config=DEFAULT_TRACKER_CONFIG):
+        from ultralytics.trackers.byte_tracker import BYTETracker
+        cfg = load_tracker_config(config)
+        try:
+            self.tracker = BYTETracker(args=cfg, frame_rate=frame_rate)
+        except TypeError: # Newer releases dropped the frame_rate argument
+            self.tracker = BYTETracker(args=cfg)
+
+    def update(self, result):
+        """
+        Feeds one ultralytics Results (from predict) to the tracker.
+        Returns (xyxy, track_ids, conf, cls) numpy arrays for confirmed tracks.
+        """
+        det = result.boxes.cpu().numpy()
+        tracks = self.tracker.update(det, result.orig_img)
+        if len(tracks) == 0:
+            empty = np.empty((0,), dtype=np.float32)
+            return np.empty((0, 4), dtype=np.float32), np.empty((0,), dtype=int), empty, empty
+        return tracks[:, :4], tracks[:, 4].astype(int), tracks[:, 5], tracks[:, 6]
+
+    def track(self, result):
+        """
+        Same as model.track() for one frame: returns the Results narrowed to
+        confirmed tracks, with track IDs in boxes.id (so .plot() shows them).
+        """
+        import torch
+        det = result.boxes.cpu().numpy()
+        tracks = self.tracker.update(det, result.orig_img)
+        if len(tracks) == 0:
+            return result[:0]
+        tracked = result[tracks[:, -1].astype(int)]
+        tracked.update(boxes=torch.as_tensor(tracks[:, :-1], device=result.boxes.data.device))
+        return tracked
+
+    def advance(self, frames):
+        """Counts frames that were skipped without detection (e.g. motion gate)."""
+        if frames > 0:
+            self.tracker.frame_id += frames
+
+    def reset(self):
+        self.tracker.reset()
+
+    def export_state(self):
+        """
+        The tracker's tracks and counters as plain numbers and lists (no
+        ultralytics objects), so a checkpoint still loads after an upgrade.
+        """
+        t = self.tracker
+        def tracks(stracks):
+            return [dict({name: _plain(getattr(s, name)) for name in TRACK_FIELDS}, tlwh=s._tlwh.tolist(),
+                         mean=s.mean.tolist(), covariance=s.covariance.tolist()) for s in stracks]
+        ids = [s.track_id for s in t.tracked_stracks + t.lost_stracks + t.removed_stracks]
+        return {"frame_id": t.frame_id, "next_id": max(ids, default=0) + 1,
+                "tracked": tracks(t.tracked_stracks), "lost": tracks(t.lost_stracks)}
+
+    def restore_state(self, state):
+        """
+        Rebuilds the tracks of export_state(). Returns False if this library
+        version cannot take them: tracking then restarts, but new IDs still
+        continue after the old ones, so counted IDs are not reused.
+        """
+        from ultralytics.trackers.basetrack import BaseTrack
+        from ultralytics.trackers.byte_tracker import STrack
+        t = self.tracker
+        t.reset()
+        t.frame_id = state["frame_id"]
+        if hasattr(t, "_ids"): # Per-tracker IDs (newer releases)
+            t._ids = iter(range(state["next_id"], sys.maxsize))
+        else:
+            BaseTrack._count = max(BaseTrack._count, state["next_id"] - 1)
+
+        def build(data):
+            left, top, w, h = data["tlwh"]
+            track = STrack(np.array([left + w / 2, top + h / 2, w, h, data["idx"]], dtype=np.float32),
+                           data["score"], data["cls"])
+            for name in TRACK_FIELDS:
+                setattr(track, name, data[name])
+            track.kalman_filter = t.kalman_filter
+            track.mean = np.asarray(data["mean"])
+            track.covariance = np.asarray(data["covariance"])
+            if hasattr(t, "_ids"):
+                track.next_id = t._ids.__next__
+            return track
+        try:
+            tracked = [build(d) for d in state["tracked"]]
+            lost = [build(d) for d in state["lost"]]
+        except Exception as e:
+            print(f"Could not restore track state, tracks restart: {e}")
+            return False
+        t.tracked_stracks, t.lost_stracks = tracked, lost
+        return True
+
+
+def xyxy_to_xywh(boxes):
+    """Corner boxes -> center/size boxes, the layout the counting logic uses."""
+    boxes = np.asarray(boxes, dtype=np.float32).reshape(-1, 4)
+    out = np.empty_like(boxes)
+    out[:, 0] = (boxes[:, 0] + boxes[:, 2]) / 2
+    out[:, 1] = (boxes[:, 1] + boxes[:, 3]) / 2
+    out[:, 2] = boxes[:, 2] - boxes[:, 0]
+    out[:, 3] = boxes[:, 3] - boxes[:, 1]
+    return out
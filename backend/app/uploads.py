@@ -0,0 +1,220 @@
+import hashlib
+import json
+import os
+import shutil
+import time
+import uuid
+
+from fastapi import UploadFile
+from starlette.concurrency import run_in_threadpool
+
+# Fixed-size streaming chunks: memory use stays constant whatever the file size
+UPLOAD_CHUNK_SIZE = int(os.getenv("UPLOAD_CHUNK_SIZE", str(1024 * 1024)))
+# Resumable protocol chunk size (clients PUT chunks of exactly this size, last may be shorter)
+RESUMABLE_CHUNK_SIZE = int(os.getenv("RESUMABLE_CHUNK_SIZE", str(8 * 1024 * 1024)))
+RESUMABLE_TTL = int(os.getenv("RESUMABLE_TTL_SECONDS", str(24 * 3600))) # Abandoned uploads expire
+MAX_UPLOAD_BYTES = int(os.getenv("MAX_UPLOAD_BYTES", str(10 * 1024 ** 3))) # Larger uploads are refused with 413
+
+
+class UploadError(Exception):
+    """Client-side problem with an upload (bad chunk, unknown id, incomplete file)."""
+    def __init__(self, message, status_code=400):
+        super().__init__(message)
+        self.status_code = status_code
+
+
+def safe_filename(filename: str):
+    """Strips any path components a client may send."""
+    return os.path.basename(filename or "upload").replace("\x00", "") or "upload"
+
+
+def check_upload_size(size: int, max_size: int = MAX_UPLOAD_BYTES):
+    if size > max_size:
+        raise UploadError(f"Upload exceeds the maximum size of {max_size} bytes", 413)
+
+
+async def save_upload_stream(upload: UploadFile, dest_path: str, chunk_size: int = UPLOAD_CHUNK_SIZE,
+                             max_size: int = MAX_UPLOAD_BYTES):
+    """
+    Streams an UploadFile to disk chunk by chunk, hashing as it goes.
+    Returns (sha256 hex digest, size in bytes). Stops once the file grows
+    past max_size; the file is removed whenever the upload does not finish.
+    """
+    digest = hashlib.sha256()
+    size = 0
+    saved = False
+    try:
+        with open(dest_path, "wb") as out:
+            while True:
+                chunk = await upload.read(chunk_size)
+                if not chunk:
+                    break
+                size += len(chunk)
+                check_upload_size(size, max_size)
+                digest.update(chunk)
+                await run_in_threadpool(out.write, chunk)
+        saved = True
+    finally:
+        # Too large, client gone, disk full...: no partial file left in the upload directory
+        if not saved and os.path.exists(dest_path):
+            os.remove(dest_path)
+    return digest.hexdigest(), size
+
+
+def hash_file(path: str, chunk_size: int = UPLOAD_CHUNK_SIZE):
+    """sha256 of a file on disk, read in fixed-size chunks."""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class ResumableUploadStore:
+    """
+    Chunked, resumable uploads (init -> PUT chunk N -> complete).
+    Each upload lives in <root>/<upload_id>/ as a preallocated data file plus
+    a small meta.json recording which chunks have landed, so a client can ask
+    what is missing and retry only that after a dropped connection.
+    """
+    def __init__(self, root: str, chunk_size: int = RESUMABLE_CHUNK_SIZE, ttl: int = RESUMABLE_TTL,
+                 max_size: int = MAX_UPLOAD_BYTES):
+        self.root = root
+        self.chunk_size = chunk_size
+        self.ttl = ttl
+        self.max_size = max_size
+        os.makedirs(self.root, exist_ok=True)
+
+    def _dir(self, upload_id: str):
+        # upload ids are uuid4 strings we generated; reject anything else
+        try:
+            uuid.UUID(upload_id)
+        except ValueError:
+            raise UploadError("Upload not found", 404)
+        return os.path.join(self.root, upload_id)
+
+    def _meta_path(self, upload_id: str):
+        return os.path.join(self._dir(upload_id), "meta.json")
+
+    def _data_path(self, upload_id: str):
+        return os.path.join(self._dir(upload_id), "data.part")
+
+    def _load(self, upload_id: str):
+        try:
+            with open(self._meta_path(upload_id), "r") as f:
+                return json.load(f)
+        except FileNotFoundError:
+            raise UploadError("Upload not found", 404)
+
+    def _save(self, meta: dict):
+        path = self._meta_path(meta["upload_id"])
+        tmp = path + ".tmp"
+        with open(tmp, "w") as f:
+            json.dump(meta, f)
+        os.replace(tmp, path)
+
+    def total_chunks(self, meta: dict):
+        return max(1, -(-meta["size"] // meta["chunk_size"]))
+
+    def init(self, filename: str, size: int, **extra):
+        if size < 0:
+            raise UploadError("Invalid size")
+        check_upload_size(size, self.max_size) # Before preallocating the file
+        upload_id = str(uuid.uuid4())
+        os.makedirs(self._dir(upload_id), exist_ok=True)
+        # Preallocate so chunks can land in any order
+        with open(self._data_path(upload_id), "wb") as f:
+            f.truncate(size)
+        meta = {
+            "upload_id": upload_id,
+            "filename": safe_filename(filename),
+            "size": size,
+            "chunk_size": self.chunk_size,
+            "received": [],
+            "created": time.time(),
+            **extra,
+        }
+        self._save(meta)
+        return self.status(upload_id, meta)
+
+    def status(self, upload_id: str, meta: dict = None):
+        meta = meta or self._load(upload_id)
+        total = self.total_chunks(meta)
+        received = set(meta["received"])
+        return {
+            "upload_id": upload_id,
+            "filename": meta["filename"],
+            "size": meta["size"],
+            "chunk_size": meta["chunk_size"],
+            "total_chunks": total,
+            "received_chunks": len(received),
+            "missing": [i for i in range(total) if i not in received],
+        }
+
+    async def write_chunk(self, upload_id: str, index: int, stream, expected_sha256: str = None):
+        """Writes chunk `index` from an async byte stream at its offset in the data file."""
+        meta = self._load(upload_id)
+        total = self.total_chunks(meta)
+        if index < 0 or index >= total:
+            raise UploadError(f"Chunk index out of range (0..{total - 1})")
+
+        offset = index * meta["chunk_size"]
+        expected_len = min(meta["chunk_size"], meta["size"] - offset)
+        digest = hashlib.sha256()
+        written = 0
+        with open(self._data_path(upload_id), "r+b") as out:
+            out.seek(offset)
+            async for piece in stream:
+                if not piece:
+                    continue
+                written += len(piece)
+                if written > expected_len:
+                    raise UploadError(f"Chunk {index} larger than expected {expected_len} bytes")
+                digest.update(piece)
+                await run_in_threadpool(out.write, piece)
+
+        if written != expected_len:
+            raise UploadError(f"Chunk {index} has {written} bytes, expected {expected_len}")
+        if expected_sha256 and digest.hexdigest() != expected_sha256.lower():
+            raise UploadError(f"Chunk {index} checksum mismatch")
+
+        # Re-read meta: other chunks may have landed concurrently
+        meta = self._load(upload_id)
+        if index not in meta["received"]:
+            meta["received"].append(index)
+            self._save(meta)
+        return self.status(upload_id, meta)
+
+    def complete(self, upload_id: str, dest_dir: str, expected_sha256: str = None):
+        """
+        Verifies every chunk arrived, hashes the assembled file (streamed) and
+        moves it into dest_dir. Returns (path, sha256, size, meta).
+        """
+        meta = self._load(upload_id)
+        missing = self.status(upload_id, meta)["missing"]
+        if missing:
+            raise UploadError(f"Upload incomplete: {len(missing)} chunk(s) missing", 409)
+
+        data_path = self._data_path(upload_id)
+        sha256 = hash_file(data_path)
+        if expected_sha256 and sha256 != expected_sha256.lower():
+            raise UploadError("File checksum mismatch", 422)
+
+        dest_path = os.path.join(dest_dir, f"{upload_id}_{meta['filename']}")
+        os.replace(data_path, dest_path)
+        shutil.rmtree(self._dir(upload_id), ignore_errors=True)
+        return dest_path, sha256, meta["size"], meta
+
+    def abort(self, upload_id: str):
+        shutil.rmtree(self._dir(upload_id), ignore_errors=True)
+
+    def cleanup_expired(self):
+        """Drops uploads nobody has touched for longer than the TTL."""
+        now = time.time()
+        for name in os.listdir(self.root):
+            path = os.path.join(self.root, name)
+            try:
+                if now - os.path.getmtime(path) > self.ttl:
+                    shutil.rmtree(path, ignore_errors=True)
+            except OSError:
+                pass
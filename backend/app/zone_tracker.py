@@ -2,7 +2,21 @@ import cv2
 import torch
 import numpy as np
 import os
-from ultralytics import YOLO
+from functools import partial
+try:
+    from backend.app.model_registry import registry
+    from backend.app.scheduler import infer, BATCH
+    from backend.app.tracking import TrackSession
+    from backend.app.cancellation import TaskCancelled
+    from backend.app.checkpoint import seek
+    from backend.app.encoder import EncodeStats, open_video_writer
+except ImportError:
+    from .model_registry import registry
+    from .scheduler import infer, BATCH
+    from .tracking import TrackSession
+    from .cancellation import TaskCancelled
+    from .checkpoint import seek
+    from .encoder import EncodeStats, open_video_writer
 
 
 class ModularZoneTracker:
@@ -13,8 +27,24 @@ class ModularZoneTracker:
         self.target_class_id = target_class_id
 
         # Stability tuning (v11.8 Industrial Standard)
-        self.entry_threshold = 3 # v11.8 Ultra-sensitive
         self.exit_threshold = 50 # v10.3 Increased to 2.0s to prevent flickering
+        self.dedup_radius = 60 # v11.8 60px Per-Frame Dedup (Balanced)
+        self.inherit_radius = 60 # v11.6 search radius for ID-flip inheritance
+        self.roi_overlap = 0.15 # v10.4 Stabilized ROI: 15% for both Entry/Exit triggers
+        self.confirm_frames = 2 # v14.3 High-Recall Balance
+        self.min_travel = 5 # v12.11 sensitivity: 5px (Recall motion buffer)
+        # Re-confirmation radius (High-Recall Balance for 7-sack density), as a share of the frame width:
+        # Large (Conveyor, box wider than 20%): 0.15 (Stable) | Small (Workers): 0.06 (Approx 36px)
+        self.reconfirm_large = 0.15
+        self.reconfirm_small = 0.06
+        self.reconfirm_window = 100 # Frames a confirmed centroid blocks re-counting
+
+        # Detector settings (part of the detection cache key, unlike the counting parameters above)
+        self.infer_params = {
+            "conf": 0.20, # v10.5 Cross-Compat precision (Relaxed)
+            "iou": 0.45, # v10.3 Overlap Buff
+            "classes": [0], # Strictly track Sacks only
+        }
 
         self.object_states = {}
         self.roi_points = None
@@ -36,17 +66,25 @@ class ModularZoneTracker:
         # v9.4 Global State Sync (Sack 1 Entered -> Sack 1 Left)
         self.display_id_states = {} 
 
+        if model_name is None: # Counting only: replay() of cached detections
+            self.model_path = None
+            self.model = None
+            self.backend = None
+            return
+
         # Load model
         current_dir = os.path.dirname(os.path.abspath(__file__))
         models_dir = os.path.join(os.path.dirname(current_dir), "models")
         model_path = os.path.join(models_dir, model_name)
+        self.model_path = model_path
 
         try:
-            self.model = YOLO(model_path)
-            print(f"YOLOv8 loaded successfully: {model_path}")
+            self.model, self.backend = registry.get(model_path) # Shared with the other tracker
+            print(f"YOLOv8 loaded successfully: {model_path} ({self.backend})")
         except Exception as e:
             print(f"Error loading model: {e}")
             self.model = None
+            self.backend = None
 
     def _get_device(self):
         if torch.cuda.is_available():
@@ -93,19 +131,26 @@ class ModularZoneTracker:
         self.display_id_states = {}
         return {"status": "reset", "count": 0}
 
-    def process_video(self, video_path, output_path, on_update=None):
-        self.reset_state() # v13.5 Fresh Start Per Video
-        if self.model is None:
-            return {"count": 0, "status": "model_not_loaded"}
+    # Counting state carried across a checkpoint / resume
+    CHECKPOINT_FIELDS = ("object_states", "ids_total_confirmed", "confirmed_centroids", "tid_to_display_id",
+                         "total_count", "events", "recent_confirmations", "display_id_states")
 
-        cap = cv2.VideoCapture(video_path)
-        if not cap.isOpened():
-            return {"count": 0, "status": "failed_to_open_video"}
+    def checkpoint_state(self):
+        return {name: getattr(self, name) for name in self.CHECKPOINT_FIELDS}
 
-        width = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH))
-        height = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
-        fps = int(cap.get(cv2.CAP_PROP_FPS)) or 25
+    def restore_state(self, state):
+        for name in self.CHECKPOINT_FIELDS:
+            setattr(self, name, state[name])
+
+    # Counting parameters replay() can re-run cached detections with
+    TUNABLE_PARAMS = ("exit_threshold", "dedup_radius", "inherit_radius", "roi_overlap", "confirm_frames",
+                      "min_travel", "reconfirm_large", "reconfirm_small", "reconfirm_window")
+
+    def reconfirm_radius(self, w, width):
+        return width * self.reconfirm_large if (w > width * 0.20) else width * self.reconfirm_small
 
+    def set_roi(self, width, height):
+        """Counting zone for a frame size; returns its top-left corner."""
         # v13.0 Adaptive ROI (Noise Isolation)
         # 12% Margins for industrial balance
         x1, y1 = int(width * 0.12), int(height * 0.12)
@@ -114,340 +159,468 @@ class ModularZoneTracker:
             [[x1, y1], [x2, y1], [x2, y2], [x1, y2]],
             dtype=np.int32
         )
+        return x1, y1
+
+    def count_frame(self, boxes, ids, classes, frame_idx, width, height, ids_confirmed_inside):
+        """
+        Counting logic for one frame of tracked boxes (xywh, track IDs,
+        classes). Updates the zone state and returns (cx, cy, color,
+        display_id) marks for drawing.
+        """
+        marks = []
+        detected_ids = set()
+        current_occupancy = 0 # v8.8 Zero-Latency Visual Counter (Reset every frame)
+        for box, tid, cls in zip(boxes, ids, classes):
+
+            # Optional class filtering
+            if self.target_class_id is not None:
+                if cls != self.target_class_id:
+                    continue
+
+            # 🔥 Ultra-Strict Industrial Filter (v8.3)
+            w, h = box[2], box[3]
+            aspect_ratio = w / h
+            cx, cy = float(box[0]), float(box[1])
+
+            # 1. Shape/AR (0.2 to 5.0) - v9.7 Perspective Buff (Relaxed)
+            if aspect_ratio < 0.2 or aspect_ratio > 5.0:
+                continue
+
+            # 2. Hard Screen Margins (2%) - v8.5 Responsive
+            margin_x = width * 0.02
+            margin_y = height * 0.02
+            if (cx < margin_x) or (cx > width - margin_x) or (cy < margin_y):
+                continue
+
+            # 3. Hard Ground Cut (98%) - v8.5 Conveyor Base (Relaxed)
+            if (cy + h/2 > height * 0.98):
+                continue
+
+            # 4. Macro-Noise (85% size limit) - v10.3 Industrial Expansion (Relaxed)
+            if (w > width * 0.85) or (h > height * 0.85):
+                continue
+
+            # 5. Generic Height limit (70%) - v10.3 Perspective Buff
+            if h > (height * 0.70):
+                continue
+
+            # 6. Minimum Noise Filter (2% Min-Scale) - v13.0 Industrial Standards (Relaxed)
+            if (w < width * 0.02) or (h < height * 0.02):
+                continue
+
+            # --- PROXIMITY CENTROID DEDUP (v8.3) ---
+            is_duplicate = False
+            for existing_tid, state in self.object_states.items():
+                if existing_tid == tid: continue
+                dist = np.sqrt((cx - state.get("last_cx", 0))**2 + (cy - state.get("last_cy", 0))**2)
+                if dist < self.dedup_radius:
+                    is_duplicate = True
+                    break
+
+            if is_duplicate: continue
+
+            detected_ids.add(tid)
+            overlap = self.bbox_overlap_ratio(box, self.roi_points)
+            inside = overlap > self.roi_overlap
+
+            if inside:
+                current_occupancy += 1
+
+            # v11.6 Spatial Inheritance for Unconfirmed IDs (Prevent ID Flip resets)
+            if tid not in self.object_states:
+                best_match_tid = None
+                min_dist = self.inherit_radius
+                for old_tid, old_state in self.object_states.items():
+                    if not old_state.get("confirmed", False):
+                        d = np.sqrt((cx - old_state.get("last_cx", 0))**2 + (cy - old_state.get("last_cy", 0))**2)
+                        if d < min_dist:
+                            min_dist = d
+                            best_match_tid = old_tid
+
+                if best_match_tid:
+                    # Inherit progress
+                    old_data = self.object_states[best_match_tid]
+                    self.object_states[tid] = {
+                        "inside_frames": old_data["inside_frames"],
+                        "outside_frames": 0,
+                        "confirmed": False,
+                        "last_cx": cx,
+                        "last_cy": cy,
+                        "start_cx": old_data["start_cx"],
+                        "start_cy": old_data["start_cy"],
+                        "last_event_frame": old_data["last_event_frame"],
+                        "alert_state": old_data["alert_state"]
+                    }
+                else:
+                    self.object_states[tid] = {
+                        "inside_frames": 0,
+                        "outside_frames": 0,
+                        "confirmed": False,
+                        "last_cx": cx,
+                        "last_cy": cy,
+                        "start_cx": cx, # v10.7 Movement Guard Path Tracking
+                        "start_cy": cy, # v10.7 Movement Guard Path Tracking
+                        "last_event_frame": -100, # v9.1 Temporal Guard
+                        "alert_state": None # v9.2 State Machine Lock
+                    }
+
+            state = self.object_states[tid]
+            state["last_cx"] = cx
+            state["last_cy"] = cy
+            if inside:
+                state["inside_frames"] += 1
+                state["outside_frames"] = 0
+
+                if state["inside_frames"] >= self.confirm_frames and not state["confirmed"]:
+                    # v12.1 Global Spatio-Temporal Precision Logic
+                    total_travel = np.sqrt((cx - state["start_cx"])**2 + (cy - state["start_cy"])**2)
+
+                    if total_travel > self.min_travel:
+                        # 1. Global Centroid Rejection (v13.0 Precision Absolute)
+                        is_reconfirmed = False
+
+                        radius = self.reconfirm_radius(w, width)
+
+                        for old_cx, old_cy, old_frame in self.confirmed_centroids:
+                            dist_to_confirmed = np.sqrt((cx - old_cx)**2 + (cy - old_cy)**2)
+                            if dist_to_confirmed < radius and (frame_idx - old_frame) < self.reconfirm_window:
+                                is_reconfirmed = True
+                                break
+
+                        if not is_reconfirmed:
+                            # 2. Local ID Jump Protection
+                            matched_display_id = None
+                            jump_radius = self.reconfirm_radius(w, width)
+                            self.recent_confirmations = [c for c in self.recent_confirmations if frame_idx - c[2] < self.reconfirm_window]
+                            for rc_x, rc_y, rc_f, rc_id in self.recent_confirmations:
+                                if np.sqrt((cx - rc_x)**2 + (cy - rc_y)**2) < jump_radius:
+                                    matched_display_id = rc_id
+                                    break
+
+                            if matched_display_id:
+                                # ID JUMP: Map to existing ID
+                                self.tid_to_display_id[tid] = matched_display_id
+                                self.ids_total_confirmed.add(tid)
+                                global_state = self.display_id_states.get(matched_display_id, {"alert_state": None, "confirmed": False})
+                                state["alert_state"] = global_state["alert_state"]
+                                state["confirmed"] = global_state["confirmed"]
+                            else:
+                                # NEW BAG: Register
+                                self.ids_total_confirmed.add(tid)
+                                self.total_count += 1
+                                display_id = self.total_count
+                                self.tid_to_display_id[tid] = display_id
+                                self.display_id_states[display_id] = {
+                                    "alert_state": None, 
+                                    "confirmed": False,
+                                    "start_cx": cx,
+                                    "start_cy": cy
+                                }
+                                self.recent_confirmations.append([cx, cy, frame_idx, display_id])
+                                self.confirmed_centroids.append((cx, cy, frame_idx))
+
+                            display_id = self.tid_to_display_id[tid]
+                            global_data = self.display_id_states.get(display_id, {})
+                            if global_data.get("alert_state") != "entered":
+                                state["alert_state"] = "entered"
+                                self.display_id_states[display_id]["alert_state"] = "entered"
+                                self.display_id_states[display_id]["confirmed"] = True
+                                state["last_event_frame"] = frame_idx
+                                self.events.append({
+                                    "msg": f"Sack {display_id} Entered (+1)",
+                                    "color": (0, 255, 0),
+                                    "frame": frame_idx
+                                })
 
-        fourcc = cv2.VideoWriter_fourcc(*'mp4v')
-        out = cv2.VideoWriter(output_path, fourcc, fps, (width, height))
+                color = (0, 255, 0)
 
-        ids_confirmed_inside = set()
-        frame_idx = 0
+            else:
+                state["outside_frames"] += 1
+                state["inside_frames"] = 0
 
-        while True:
-            # v8.8 Zero-Latency Visual Counter (Reset every frame)
-            current_occupancy = 0
-            
-            success, frame = cap.read()
-            if not success:
-                break
-
-            annotated_frame = frame.copy()
-
-            results = self.model.track(
-                frame,
-                persist=True,
-                conf=0.20, # v10.5 Cross-Compat precision (Relaxed)
-                iou=0.45, # v10.3 Overlap Buff
-                tracker="bytetrack.yaml",
-                classes=[0], # Strictly track Sacks only
-                verbose=False
+                if (
+                    state["outside_frames"] >= self.exit_threshold
+                    and state["confirmed"]
+                ):
+                    display_id = self.tid_to_display_id.get(tid, tid)
+                    global_data = self.display_id_states.get(display_id, {})
+
+                    # v9.4 Global Guard: Only trigger "Left" if the Display ID is currently "Entered"
+                    if global_data.get("alert_state") == "entered":
+                        state["confirmed"] = False
+                        state["alert_state"] = "left"
+                        self.display_id_states[display_id]["alert_state"] = "left"
+                        self.display_id_states[display_id]["confirmed"] = False
+                        state["last_event_frame"] = frame_idx
+
+                        # v8.9 Exit Event (-1)
+                        self.events.append({
+                            "msg": f"Sack {display_id} Left (-1)",
+                            "color": (0, 0, 255),
+                            "frame": frame_idx
+                        })
+
+                    ids_confirmed_inside.discard(tid)
+
+                color = (0, 0, 255)
+
+            marks.append((cx, cy, color, self.tid_to_display_id.get(tid, tid)))
+
+        # Handle disappeared IDs
+        for tid in list(self.object_states.keys()):
+            if tid not in detected_ids:
+                self.object_states[tid]["outside_frames"] += 1
+
+                if self.object_states[tid]["outside_frames"] >= self.exit_threshold:
+                    # v9.4 Global Secondary Cleanup
+                    display_id = self.tid_to_display_id.get(tid, tid)
+                    global_data = self.display_id_states.get(display_id, {})
+
+                    if global_data.get("alert_state") == "entered":
+                         self.display_id_states[display_id]["alert_state"] = "left"
+                         self.display_id_states[display_id]["confirmed"] = False
+                         self.events.append({
+                            "msg": f"Sack {display_id} Left (-1)",
+                            "color": (0, 0, 255),
+                            "frame": frame_idx
+                        })
+                    ids_confirmed_inside.discard(tid)
+                    del self.object_states[tid]
+
+        return marks
+
+    def draw_frame(self, annotated_frame, marks, frame_idx, width, x1, y1):
+        """ROI, track marks, running count and event feed of one output frame."""
+        # Draw ROI
+        cv2.polylines(annotated_frame, [self.roi_points], True, (255, 255, 0), 2)
+        cv2.putText(
+            annotated_frame,
+            "COUNTING ZONE (ROI)",
+            (x1, y1 - 10),
+            cv2.FONT_HERSHEY_SIMPLEX,
+            0.6,
+            (255, 255, 0),
+            2
+        )
+
+        for cx, cy, color, display_id in marks:
+            # Draw bounding box center for visualization
+            cv2.circle(annotated_frame, (int(cx), int(cy)), 5, color, -1)
+
+            # v9.0 Show Sequential ID if available
+            cv2.putText(
+                annotated_frame,
+                f"ID:{display_id}",
+                (int(cx), int(cy) - 10),
+                cv2.FONT_HERSHEY_SIMPLEX,
+                0.5,
+                color,
+                1
             )
 
-            detected_ids = set()
+        # v11.0: live_count now shows the running total for clearer user feedback
+        live_count = self.total_count
+
+        cv2.putText(
+            annotated_frame,
+            f"Sacks in ROI: {live_count}",
+            (20, 50),
+            cv2.FONT_HERSHEY_SIMPLEX,
+            0.8,
+            (0, 255, 0),
+            2
+        )
 
-            # Draw ROI
-            cv2.polylines(annotated_frame, [self.roi_points], True, (255, 255, 0), 2)
+        # --- v8.9 DRAW EVENT FEED (Top-Right) ---
+        recent_events = self.events[-5:] # Show last 5 events
+        for i, event in enumerate(reversed(recent_events)):
+            # Fade out older events (frame-based)
+            age = frame_idx - event["frame"]
+            if age > 100: continue # Expire after 100 frames
+            
+            y_pos = 50 + (i * 30)
             cv2.putText(
                 annotated_frame,
-                "COUNTING ZONE (ROI)",
-                (x1, y1 - 10),
+                event["msg"],
+                (width - 300, y_pos),
                 cv2.FONT_HERSHEY_SIMPLEX,
                 0.6,
-                (255, 255, 0),
+                event["color"],
                 2
             )
 
-            if results and results[0].boxes.id is not None:
-
-                boxes = results[0].boxes.xywh.cpu().numpy()
-                ids = results[0].boxes.id.int().cpu().tolist()
-                classes = results[0].boxes.cls.int().cpu().tolist()
-
-                for box, tid, cls in zip(boxes, ids, classes):
-
-                    # Optional class filtering
-                    if self.target_class_id is not None:
-                        if cls != self.target_class_id:
-                            continue
-
-                    # 🔥 Ultra-Strict Industrial Filter (v8.3)
-                    w, h = box[2], box[3]
-                    aspect_ratio = w / h
-                    cx, cy = float(box[0]), float(box[1])
-                    
-                    # 1. Shape/AR (0.2 to 5.0) - v9.7 Perspective Buff (Relaxed)
-                    if aspect_ratio < 0.2 or aspect_ratio > 5.0:
-                        continue
-                    
-                    # 2. Hard Screen Margins (2%) - v8.5 Responsive
-                    margin_x = width * 0.02
-                    margin_y = height * 0.02
-                    if (cx < margin_x) or (cx > width - margin_x) or (cy < margin_y):
-                        continue
-                        
-                    # 3. Hard Ground Cut (98%) - v8.5 Conveyor Base (Relaxed)
-                    if (cy + h/2 > height * 0.98):
-                        continue
-                        
-                    # 4. Macro-Noise (85% size limit) - v10.3 Industrial Expansion (Relaxed)
-                    if (w > width * 0.85) or (h > height * 0.85):
-                        continue
-                        
-                    # 5. Generic Height limit (70%) - v10.3 Perspective Buff
-                    if h > (height * 0.70):
-                        continue
-
-                    # 6. Minimum Noise Filter (2% Min-Scale) - v13.0 Industrial Standards (Relaxed)
-                    if (w < width * 0.02) or (h < height * 0.02):
-                        continue
-
-                    # --- PROXIMITY CENTROID DEDUP (v8.3) ---
-                    is_duplicate = False
-                    for existing_tid, state in self.object_states.items():
-                        if existing_tid == tid: continue
-                        dist = np.sqrt((cx - state.get("last_cx", 0))**2 + (cy - state.get("last_cy", 0))**2)
-                        if dist < 60: # v11.8 60px Per-Frame Dedup (Balanced)
-                            is_duplicate = True
-                            break
-                    
-                    if is_duplicate: continue
-
-                    detected_ids.add(tid)
-                    overlap = self.bbox_overlap_ratio(box, self.roi_points)
-                    # v10.4 Stabilized ROI: 15% for both Entry/Exit triggers
-                    inside = overlap > 0.15
-                    
-                    if inside:
-                        current_occupancy += 1
-
-                    # v11.6 Spatial Inheritance for Unconfirmed IDs (Prevent ID Flip resets)
-                    if tid not in self.object_states:
-                        best_match_tid = None
-                        min_dist = 60 # 60px search radius for inheritance
-                        for old_tid, old_state in self.object_states.items():
-                            if not old_state.get("confirmed", False):
-                                d = np.sqrt((cx - old_state.get("last_cx", 0))**2 + (cy - old_state.get("last_cy", 0))**2)
-                                if d < min_dist:
-                                    min_dist = d
-                                    best_match_tid = old_tid
-                        
-                        if best_match_tid:
-                            # Inherit progress
-                            old_data = self.object_states[best_match_tid]
-                            self.object_states[tid] = {
-                                "inside_frames": old_data["inside_frames"],
-                                "outside_frames": 0,
-                                "confirmed": False,
-                                "last_cx": cx,
-                                "last_cy": cy,
-                                "start_cx": old_data["start_cx"],
-                                "start_cy": old_data["start_cy"],
-                                "last_event_frame": old_data["last_event_frame"],
-                                "alert_state": old_data["alert_state"]
-                            }
-                        else:
-                            self.object_states[tid] = {
-                                "inside_frames": 0,
-                                "outside_frames": 0,
-                                "confirmed": False,
-                                "last_cx": cx,
-                                "last_cy": cy,
-                                "start_cx": cx, # v10.7 Movement Guard Path Tracking
-                                "start_cy": cy, # v10.7 Movement Guard Path Tracking
-                                "last_event_frame": -100, # v9.1 Temporal Guard
-                                "alert_state": None # v9.2 State Machine Lock
-                            }
-
-                    state = self.object_states[tid]
-                    state["last_cx"] = cx
-                    state["last_cy"] = cy
-                    if inside:
-                        state["inside_frames"] += 1
-                        state["outside_frames"] = 0
-                        
-                        if state["inside_frames"] >= 2 and not state["confirmed"]: # v14.3 High-Recall Balance
-                            # v12.1 Global Spatio-Temporal Precision Logic
-                            total_travel = np.sqrt((cx - state["start_cx"])**2 + (cy - state["start_cy"])**2)
-                            
-                            # v12.11 sensitivity: 5px (Recall motion buffer)
-                            if total_travel > 5:
-                                # 1. Global Centroid Rejection (v13.0 Precision Absolute)
-                                is_reconfirmed = False
-                                
-                                # Dynamic Radius (High-Recall Balance for 7-sack density):
-                                # Large (Conveyor): width * 0.15 (Stable)
-                                # Small (Workers): width * 0.06 (Approx 36px)
-                                radius = width * 0.15 if (w > width * 0.20) else width * 0.06
-                                
-                                for old_cx, old_cy, old_frame in self.confirmed_centroids:
-                                    dist_to_confirmed = np.sqrt((cx - old_cx)**2 + (cy - old_cy)**2)
-                                    if dist_to_confirmed < radius and (frame_idx - old_frame) < 100:
-                                        is_reconfirmed = True
-                                        break
-                                
-                                if not is_reconfirmed:
-                                    # 2. Local ID Jump Protection
-                                    matched_display_id = None
-                                    # Dynamic Radius (Matching reconfirmation):
-                                    jump_radius = width * 0.15 if (w > width * 0.20) else width * 0.06
-                                    self.recent_confirmations = [c for c in self.recent_confirmations if frame_idx - c[2] < 100]
-                                    for rc_x, rc_y, rc_f, rc_id in self.recent_confirmations:
-                                        if np.sqrt((cx - rc_x)**2 + (cy - rc_y)**2) < jump_radius:
-                                            matched_display_id = rc_id
-                                            break
-                                    
-                                    if matched_display_id:
-                                        # ID JUMP: Map to existing ID
-                                        self.tid_to_display_id[tid] = matched_display_id
-                                        self.ids_total_confirmed.add(tid)
-                                        global_state = self.display_id_states.get(matched_display_id, {"alert_state": None, "confirmed": False})
-                                        state["alert_state"] = global_state["alert_state"]
-                                        state["confirmed"] = global_state["confirmed"]
-                                    else:
-                                        # NEW BAG: Register
-                                        self.ids_total_confirmed.add(tid)
-                                        self.total_count += 1
-                                        display_id = self.total_count
-                                        self.tid_to_display_id[tid] = display_id
-                                        self.display_id_states[display_id] = {
-                                            "alert_state": None, 
-                                            "confirmed": False,
-                                            "start_cx": cx,
-                                            "start_cy": cy
-                                        }
-                                        self.recent_confirmations.append([cx, cy, frame_idx, display_id])
-                                        self.confirmed_centroids.append((cx, cy, frame_idx))
-                                    
-                                    display_id = self.tid_to_display_id[tid]
-                                    global_data = self.display_id_states.get(display_id, {})
-                                    if global_data.get("alert_state") != "entered":
-                                        state["alert_state"] = "entered"
-                                        self.display_id_states[display_id]["alert_state"] = "entered"
-                                        self.display_id_states[display_id]["confirmed"] = True
-                                        state["last_event_frame"] = frame_idx
-                                        self.events.append({
-                                            "msg": f"Sack {display_id} Entered (+1)",
-                                            "color": (0, 255, 0),
-                                            "frame": frame_idx
-                                        })
-
-                        color = (0, 255, 0)
-
-                    else:
-                        state["outside_frames"] += 1
-                        state["inside_frames"] = 0
-
-                        if (
-                            state["outside_frames"] >= self.exit_threshold
-                            and state["confirmed"]
-                        ):
-                            display_id = self.tid_to_display_id.get(tid, tid)
-                            global_data = self.display_id_states.get(display_id, {})
-                            
-                            # v9.4 Global Guard: Only trigger "Left" if the Display ID is currently "Entered"
-                            if global_data.get("alert_state") == "entered":
-                                state["confirmed"] = False
-                                state["alert_state"] = "left"
-                                self.display_id_states[display_id]["alert_state"] = "left"
-                                self.display_id_states[display_id]["confirmed"] = False
-                                state["last_event_frame"] = frame_idx
-                                
-                                # v8.9 Exit Event (-1)
-                                self.events.append({
-                                    "msg": f"Sack {display_id} Left (-1)",
-                                    "color": (0, 0, 255),
-                                    "frame": frame_idx
-                                })
-                            
-                            ids_confirmed_inside.discard(tid)
+    def process_video(self, video_path, output_path, on_update=None, on_frame=None, cancel_token=None, checkpoint=None,
+                      stream_dir=None, detections=None):
+        """detections: optional DetectionRecorder that keeps the tracked boxes for replay()."""
+        self.reset_state() # v13.5 Fresh Start Per Video
+        if self.model is None:
+            return {"count": 0, "status": "model_not_loaded"}
 
-                        color = (0, 0, 255)
+        cap = cv2.VideoCapture(video_path)
+        if not cap.isOpened():
+            return {"count": 0, "status": "failed_to_open_video"}
 
-                    # Draw bounding box center for visualization
-                    cv2.circle(annotated_frame, (int(cx), int(cy)), 5, color, -1)
-                    
-                    # v9.0 Show Sequential ID if available
-                    display_id = self.tid_to_display_id.get(tid, tid)
-                    cv2.putText(
-                        annotated_frame,
-                        f"ID:{display_id}",
-                        (int(cx), int(cy) - 10),
-                        cv2.FONT_HERSHEY_SIMPLEX,
-                        0.5,
-                        color,
-                        1
-                    )
+        width = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH))
+        height = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
+        fps = int(cap.get(cv2.CAP_PROP_FPS)) or 25
+        total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+        last_progress = -1
+
+        x1, y1 = self.set_roi(width, height)
+        if detections is not None:
+            detections.begin(width, height, fps)
+
+        # Resume from the last checkpoint (server restarted mid-job)
+        state = checkpoint.load() if checkpoint is not None else None
+        # H.264 output on its own thread (was mp4v, which browsers often refuse)
+        encode_stats = EncodeStats()
+        open_writer = partial(open_video_writer, stats=encode_stats, hls_dir=stream_dir)
+        if checkpoint is not None:
+            out = checkpoint.writer(output_path, fps, (width, height), open_writer, state,
+                                    concat_writer=partial(open_video_writer, stats=encode_stats)) # Don't re-stream the join
+        else:
+            out = open_writer(output_path, fps, (width, height))
 
-            # Handle disappeared IDs
-            for tid in list(self.object_states.keys()):
-                if tid not in detected_ids:
-                    self.object_states[tid]["outside_frames"] += 1
-
-                    if self.object_states[tid]["outside_frames"] >= self.exit_threshold:
-                        # v9.4 Global Secondary Cleanup
-                        display_id = self.tid_to_display_id.get(tid, tid)
-                        global_data = self.display_id_states.get(display_id, {})
-                        
-                        if global_data.get("alert_state") == "entered":
-                             self.display_id_states[display_id]["alert_state"] = "left"
-                             self.display_id_states[display_id]["confirmed"] = False
-                             self.events.append({
-                                "msg": f"Sack {display_id} Left (-1)",
-                                "color": (0, 0, 255),
-                                "frame": frame_idx
-                            })
-                        ids_confirmed_inside.discard(tid)
-                        del self.object_states[tid]
-
-            # v11.0: live_count now shows the running total for clearer user feedback
-            live_count = self.total_count
+        ids_confirmed_inside = set()
+        frame_idx = 0
+        last_reported_count = 0
+        session = TrackSession(frame_rate=fps) # Track IDs are per video
+        cancelled = False
 
-            cv2.putText(
-                annotated_frame,
-                f"Sacks in ROI: {live_count}",
-                (20, 50),
-                cv2.FONT_HERSHEY_SIMPLEX,
-                0.8,
-                (0, 255, 0),
-                2
-            )
+        try:
+            if state:
+                self.restore_state(state["zone_state"])
+                ids_confirmed_inside = set(state["ids_confirmed_inside"])
+                frame_idx = state["frame_idx"]
+                last_reported_count = state["last_reported_count"]
+                last_progress = state["last_progress"]
+                session.restore_state(state["track_state"])
+                seek(cap, frame_idx)
+                if detections is not None:
+                    detections.begin(width, height, fps, first_frame=frame_idx) # Earlier frames were not recorded
+                print(f"Resuming {video_path} from frame {frame_idx} (count {self.total_count})")
+            live_count = self.total_count
 
-            # --- v8.9 DRAW EVENT FEED (Top-Right) ---
-            recent_events = self.events[-5:] # Show last 5 events
-            for i, event in enumerate(reversed(recent_events)):
-                # Fade out older events (frame-based)
-                age = frame_idx - event["frame"]
-                if age > 100: continue # Expire after 100 frames
-                
-                y_pos = 50 + (i * 30)
-                cv2.putText(
-                    annotated_frame,
-                    event["msg"],
-                    (width - 300, y_pos),
-                    cv2.FONT_HERSHEY_SIMPLEX,
-                    0.6,
-                    event["color"],
-                    2
-                )
-
-            out.write(annotated_frame)
-
-            # v8.7 High-Frequency Broadcast (Every 2 frames)
-            if on_update and frame_idx % 2 == 0:
-                import base64
-                _, buffer = cv2.imencode('.jpg', annotated_frame)
-                jpg_as_text = base64.b64encode(buffer).decode('utf-8')
-                on_update({
-                    "type": "frame",
-                    "data": jpg_as_text,
-                    "count": live_count
-                })
-
-            frame_idx += 1
+            while True:
+                # Cooperative cancel / pause point (once per frame)
+                if cancel_token is not None and cancel_token.should_stop():
+                    cancelled = True
+                    break
+
+                success, frame = cap.read()
+                if not success:
+                    break
+
+                annotated_frame = frame.copy()
+
+                try:
+                    results = infer(
+                        self.model,
+                        frame,
+                        BATCH,
+                        cancel_token,
+                        verbose=False,
+                        **self.infer_params
+                    )
+                except TaskCancelled:
+                    cancelled = True
+                    break
+                results = [session.track(results[0])]
+
+                if results and results[0].boxes.id is not None:
+                    boxes = results[0].boxes.xywh.cpu().numpy()
+                    ids = results[0].boxes.id.int().cpu().tolist()
+                    classes = results[0].boxes.cls.int().cpu().tolist()
+                    if detections is not None:
+                        detections.add(frame_idx, boxes, ids, results[0].boxes.conf.cpu().numpy(), classes)
+                else:
+                    boxes, ids, classes = [], [], []
+                    if detections is not None:
+                        detections.add(frame_idx)
+                marks = self.count_frame(boxes, ids, classes, frame_idx, width, height, ids_confirmed_inside)
+                self.draw_frame(annotated_frame, marks, frame_idx, width, x1, y1)
+                live_count = self.total_count # v11.0: running total
+
+                out.write(annotated_frame)
+
+                # Count updates travel separately from previews, only when they change
+                if on_update and live_count != last_reported_count:
+                    last_reported_count = live_count
+                    try:
+                        on_update({"count": live_count, "frame_idx": frame_idx})
+                    except Exception as e:
+                        print(f"Count broadcast failed: {e}")
+
+                # Preview Frame: the preview channel handles rate, scaling and quality
+                if on_frame:
+                    try:
+                        on_frame(annotated_frame, frame_idx, live_count)
+                    except Exception as e:
+                        print(f"Frame broadcast failed: {e}")
+
+                # Progress (whole-percent steps, so at most ~100 updates per job)
+                if on_update and total_frames > 0:
+                    progress = min(99, int(100 * (frame_idx + 1) / total_frames))
+                    if progress != last_progress:
+                        last_progress = progress
+                        try:
+                            on_update({"progress": progress, "frame_idx": frame_idx})
+                        except Exception as e:
+                            print(f"Progress broadcast failed: {e}")
+
+                frame_idx += 1
+
+                if checkpoint is not None and checkpoint.due():
+                    out.roll()
+                    checkpoint.save({
+                        "frame_idx": frame_idx,
+                        "zone_state": self.checkpoint_state(),
+                        "ids_confirmed_inside": list(ids_confirmed_inside),
+                        "last_reported_count": last_reported_count,
+                        "last_progress": last_progress,
+                        "track_state": session.export_state(),
+                        "segments": out.closed_segments,
+                    })
+        except BaseException:
+            # Failed job: no encoder thread / ffmpeg process left behind
+            cap.release()
+            out.abort()
+            raise
 
         cap.release()
+
+        if cancelled:
+            if checkpoint is not None:
+                out.discard()
+            else:
+                out.release()
+            return {"count": self.total_count, "total_count": self.total_count, "status": "cancelled", "frame_idx": frame_idx}
         out.release()
+        encode_stats.finish(output_path, fps)
 
         return {
             "count": live_count, 
             "total_count": self.total_count, 
-            "status": "completed"
+            "status": "completed",
+            "encode": encode_stats.as_dict()
         }
+
+    def replay(self, detections, on_update=None):
+        """
+        Re-counts a video from cached detections (detection_cache.Detections)
+        with the current counting parameters: no decoding, inference or
+        drawing, so tuning a threshold takes seconds instead of a full run.
+        """
+        self.reset_state()
+        self.set_roi(detections.width, detections.height)
+        ids_confirmed_inside = set()
+        last_reported_count = 0
+        for frame_idx in range(len(detections)):
+            boxes, ids, classes = detections.frame(frame_idx)
+            self.count_frame(boxes, ids.tolist(), classes.tolist(), frame_idx, detections.width, detections.height,
+                             ids_confirmed_inside)
+            if on_update and self.total_count != last_reported_count:
+                last_reported_count = self.total_count
+                on_update({"count": self.total_count, "frame_idx": frame_idx})
+        return {"count": self.total_count, "total_count": self.total_count, "status": "completed",
+                "frames": len(detections)}
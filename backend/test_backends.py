@@ -0,0 +1,66 @@
+import sys
+import os
+import time
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+if project_root not in sys.path:
+    sys.path.insert(0, project_root)
+
+from backend.app import backends
+
+
+def test_resolve_backend():
+    assert backends.resolve_backend("onnx") == "onnx"
+    assert backends.resolve_backend("tensorrt") == "pytorch"
+    assert backends.resolve_backend(None) == "pytorch"
+    assert backends.resolve_backend("auto") in backends.BACKENDS
+
+
+def test_export_path():
+    assert backends.export_path("/m/sacks_custom.pt", "onnx") == "/m/sacks_custom.onnx"
+    assert backends.export_path("/m/sacks_custom.pt", "openvino") == "/m/sacks_custom_openvino_model"
+    assert backends.export_path("/m/sacks_custom.pt", "pytorch") == "/m/sacks_custom.pt"
+
+
+def test_cached_export_is_reused(tmp_path):
+    weights = tmp_path / "m.pt"
+    weights.write_bytes(b"weights")
+    exported = tmp_path / "m.onnx"
+    exported.write_bytes(b"onnx")
+    # Newer than the weights: returned without exporting again
+    later = time.time() + 10
+    os.utime(exported, (later, later))
+    assert backends.ensure_export(str(weights), "onnx") == str(exported)
+
+
+def test_missing_runtime_falls_back_to_pytorch(monkeypatch):
+    monkeypatch.setattr(backends, "runtime_available", lambda backend: backend == "pytorch")
+    model, used = backends.load_model("yolov8n.yaml", "openvino")
+    assert used == "pytorch"
+    assert model is not None
+
+
+def test_int8_export_path_matches_quantizer():
+    from backend.app.quantize import int8_path
+    assert backends.export_path("/m/sacks_custom.pt", "onnx_int8") == int8_path("/m/sacks_custom.pt")
+
+
+def test_calibration_images_and_head_exclusions(tmp_path):
+    from types import SimpleNamespace
+    from backend.app.quantize import list_images, head_decode_nodes
+    (tmp_path / "images").mkdir()
+    for name in ("b.jpg", "a.png", "notes.txt"):
+        (tmp_path / "images" / name).write_bytes(b"")
+    assert [os.path.basename(p) for p in list_images(str(tmp_path))] == ["a.png", "b.jpg"]
+    assert len(list_images(str(tmp_path), 1)) == 1
+
+    node = lambda name, op: SimpleNamespace(name=name, op_type=op)
+    graph = SimpleNamespace(node=[
+        node("/model.21/cv1/conv/Conv", "Conv"),
+        node("/model.22/cv2.0/cv2.0.2/Conv", "Conv"),
+        node("/model.22/Concat", "Concat"),
+        node("/model.22/dfl/Softmax", "Softmax"),
+        node("/model.22/Sigmoid", "Sigmoid"),
+    ])
+    # Box decoding stays float, every convolution is quantized
+    assert head_decode_nodes(SimpleNamespace(graph=graph)) == [
+        "/model.22/Concat", "/model.22/dfl/Softmax", "/model.22/Sigmoid"]
@@ -0,0 +1,49 @@
+import sys
+import os
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+if project_root not in sys.path:
+    sys.path.insert(0, project_root)
+
+import numpy as np
+
+from backend.app.bench import StubDetector, SyntheticScene, compare, run
+from backend.app.tracker import JuteBagTracker, tile_regions
+
+
+def test_stub_detector_is_deterministic_per_tile():
+    scene = SyntheticScene(640, 480, density=6, speed=10, seed=1)
+    stub = StubDetector(scene)
+    frame = scene.frame(3)
+    stub.regions = tile_regions(640, 480, "dense")
+    tiles = [frame[y1:y2, x1:x2] for x1, y1, x2, y2 in stub.regions]
+    stub.seek(3)
+    first = [r.boxes.data.numpy() for r in stub.predict(tiles)]
+    assert stub.t == 4 # All tiles of a frame consumed
+    stub.seek(3)
+    again = [r.boxes.data.numpy() for r in stub.predict(tiles[:4]) + stub.predict(tiles[4:])] # Scheduler chunks
+    assert stub.t == 4
+    for a, b in zip(first, again):
+        np.testing.assert_array_equal(a, b)
+    assert sum(len(a) for a in first) > len(scene.boxes(3)) # Overlapping tiles see sacks twice
+
+
+def test_tiling_merges_tile_duplicates():
+    scene = SyntheticScene(640, 480, density=6, speed=10, seed=1)
+    stub = StubDetector(scene)
+    stub.regions = tile_regions(640, 480, "dense")
+    tracker = JuteBagTracker(None)
+    tracker.model = stub
+    boxes, ids = tracker.detect_with_tiling(scene.frame(0))
+    assert 0 < len(boxes) <= len(scene.boxes(0))
+    assert ids == list(range(len(boxes)))
+
+
+def test_run_reports_every_stage():
+    report = run(frames=3, width=320, height=240, density=5, repeat=1, groups=("tiling", "zone"))
+    for stage in ("tiling.crop_enhance", "tiling.nms", "tiling.total", "zone.track", "zone.count", "zone.annotate"):
+        assert report["stages"][stage] > 0
+    assert report["params"]["size"] == "320x240"
+
+    baseline = {"stages": dict(report["stages"], **{"zone.count": report["stages"]["zone.count"] / 2})}
+    assert [r[0] for r in compare(report, baseline, tolerance=0.25, min_delta_ms=0)] == ["zone.count"]
+    assert compare(report, report) == []
@@ -0,0 +1,98 @@
+import sys
+import os
+import time
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+if project_root not in sys.path:
+    sys.path.insert(0, project_root)
+
+import cv2
+import pytest
+from fastapi.testclient import TestClient
+
+from backend.app.bench import StubDetector, SyntheticScene
+from backend.app.cameras import CameraRegistry, LoopingFileCapture, open_source
+from backend.app.tracker import JuteBagTracker
+
+WIDTH, HEIGHT, FRAMES, FPS = 320, 240, 30, 30
+
+
+def make_video(path, scene):
+    writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*"mp4v"), FPS, (WIDTH, HEIGHT))
+    for t in range(FRAMES):
+        writer.write(scene.frame(t))
+    writer.release()
+
+
+def wait_for(condition, timeout=15.0):
+    deadline = time.perf_counter() + timeout
+    while not condition():
+        if time.perf_counter() > deadline:
+            return False
+        time.sleep(0.05)
+    return True
+
+
+@pytest.fixture
+def camera_source(tmp_path):
+    """A looping test video and a tracker whose model is the stub detector of the same scene."""
+    scene = SyntheticScene(WIDTH, HEIGHT, density=4, speed=8, seed=5)
+    path = str(tmp_path / "camera.mp4")
+    make_video(path, scene)
+    tracker = JuteBagTracker(None)
+    tracker.model = StubDetector(scene)
+    return f"file:{path}", tracker
+
+
+def test_add_start_count_and_remove(camera_source):
+    source, tracker = camera_source
+    counted = []
+    registry = CameraRegistry(lambda: tracker, on_count=lambda camera_id, n: counted.append((camera_id, n)))
+    camera = registry.add("dock", source)
+    with pytest.raises(ValueError):
+        registry.add("dock", source)
+    capture = open_source(source)
+    assert isinstance(capture, LoopingFileCapture)
+    capture.release()
+    try:
+        assert registry.start_camera("dock")
+        assert wait_for(lambda: camera.total_count > 0 and camera.frames_processed > 0)
+        assert registry.batches > 0
+        assert {camera_id for camera_id, _ in counted} == {"dock"}
+        assert sum(n for _, n in counted) <= camera.total_count # The loop may be mid-frame
+
+        removed = registry.remove("dock")
+        assert removed is camera and not camera.active and camera.cap is None
+        assert registry.get("dock") is None and registry.get() is None
+        assert registry.remove("dock") is None
+    finally:
+        registry.stop_all()
+
+
+def test_cameras_endpoints(camera_source, monkeypatch):
+    from backend.app import main # Imported here: main is also imported (with a mocked cv2) by test_main_dummy
+    source, tracker = camera_source
+    registry = CameraRegistry(lambda: tracker)
+    monkeypatch.setattr(main, "cameras", registry)
+    client = TestClient(main.app)
+    try:
+        response = client.post("/cameras", data={"camera_id": "yard", "source": source, "start": "true"})
+        assert response.status_code == 200
+        assert response.json()["camera_id"] == "yard" and response.json()["active"]
+        assert client.post("/cameras", data={"camera_id": "yard", "source": source}).status_code == 409
+        assert [c["camera_id"] for c in client.get("/cameras").json()] == ["yard"]
+
+        camera = registry.get("yard")
+        assert wait_for(lambda: camera.total_count > 0)
+        counts = client.get("/cameras/yard/counts").json()
+        assert counts["camera_id"] == "yard"
+        assert counts["count"] > 0
+        assert counts["bucket_seconds"] == camera.live_counts.rollup.bucket_seconds
+        assert sum(b["count"] for b in counts["buckets"]) > 0
+        assert client.get("/cameras/yard/counts", params={"since": int(time.time()) + 3600}).json()["buckets"] == []
+        assert client.get("/cameras/gate/counts").status_code == 404
+
+        assert client.delete("/cameras/yard").json() == {"camera_id": "yard", "status": "removed"}
+        assert client.get("/cameras").json() == []
+        assert client.delete("/cameras/yard").status_code == 404
+    finally:
+        registry.stop_all()
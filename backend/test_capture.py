@@ -0,0 +1,124 @@
+import sys
+import os
+import threading
+import time
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+if project_root not in sys.path:
+    sys.path.insert(0, project_root)
+
+from backend.app import cameras
+from backend.app.capture import FrameGrabber
+
+
+class FakeCapture:
+    """A device the test steps by hand: read() blocks until feed() or fail()."""
+    def __init__(self):
+        self.frames = []
+        self.ready = threading.Semaphore(0)
+        self.reads = 0
+        self.released = False
+
+    def isOpened(self):
+        return True
+
+    def set(self, prop, value):
+        return True
+
+    def feed(self, *frames):
+        for frame in frames:
+            self.frames.append((True, frame))
+            self.ready.release()
+
+    def fail(self):
+        self.frames.append((False, None))
+        self.ready.release()
+
+    def read(self):
+        if not self.ready.acquire(timeout=5) or not self.frames:
+            return False, None # Timed out or released
+        self.reads += 1
+        return self.frames.pop(0)
+
+    def release(self):
+        self.released = True
+        self.ready.release() # Unblock a pending read
+
+
+def wait_for(condition, timeout=5.0):
+    deadline = time.perf_counter() + timeout
+    while not condition():
+        if time.perf_counter() > deadline:
+            return False
+        time.sleep(0.005)
+    return True
+
+
+def test_latest_frame_wins_and_drops_are_counted():
+    cap = FakeCapture()
+    woken = []
+    grabber = FrameGrabber(cap, on_frame=lambda: woken.append(1)).start()
+    try:
+        cap.feed("a", "b", "c")
+        assert wait_for(lambda: grabber.captured == 3)
+        assert grabber.read_latest(0) == (3, "c") # a and b were never read
+        assert grabber.dropped == 2
+        assert len(woken) == 3
+
+        assert grabber.read_latest(3, timeout=0.05) == (3, None) # Nothing newer yet
+        cap.feed("d")
+        assert grabber.read_latest(3) == (4, "d") # Wakes on the new frame
+        assert grabber.dropped == 2 # d was read, so it was not dropped
+        stats = grabber.stats()
+        assert (stats["captured"], stats["consumed"], stats["dropped"]) == (4, 2, 2)
+    finally:
+        cap.release()
+        grabber.stop()
+
+
+def test_stop_ends_the_thread_and_releases_readers():
+    cap = FakeCapture()
+    grabber = FrameGrabber(cap).start()
+    result = []
+    reader = threading.Thread(target=lambda: result.append(grabber.read_latest(0, timeout=10)))
+    reader.start()
+    time.sleep(0.05)
+    grabber.stop(timeout=0.2)
+    reader.join(2)
+    assert result == [(0, None)]
+    cap.release() # What Camera.stop does next: unblocks the device read
+    grabber._thread.join(2)
+    assert not grabber._thread.is_alive()
+
+
+def test_failed_read_is_reported_and_camera_reconnects(monkeypatch):
+    devices = []
+
+    def open_source(source):
+        devices.append(FakeCapture())
+        return devices[-1]
+    monkeypatch.setattr(cameras, "open_source", open_source)
+    registry = cameras.CameraRegistry(lambda: None)
+    camera = registry.add("dock", "rtsp://dock")
+    try:
+        assert camera.start()
+        devices[0].feed("a")
+        assert wait_for(lambda: camera.grabber.captured == 1)
+        devices[0].fail()
+        assert wait_for(lambda: camera.grabber.failed)
+        assert camera.grabber.read_latest(1, timeout=5) == (1, None) # Returns at once, not after the timeout
+        assert not camera.active
+
+        assert registry._collect() == [] # The inference loop notices and closes the device
+        assert camera.error == "Camera read failed" and camera.grabber is None
+        assert devices[0].released
+
+        assert camera.start() # Reconnect: a fresh device and grabber
+        assert len(devices) == 2 and camera.active and camera.error is None
+        devices[1].feed("b")
+        assert wait_for(lambda: camera.grabber.captured == 1)
+        [(collected, frame)] = registry._collect()
+        assert collected is camera and frame == "b"
+    finally:
+        for device in devices:
+            device.release()
+        registry.stop_all()
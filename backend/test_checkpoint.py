@@ -0,0 +1,89 @@
+import sys
+import os
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+if project_root not in sys.path:
+    sys.path.insert(0, project_root)
+
+import pickle
+
+import cv2
+import pytest
+
+from backend.app.bench import StubDetector, SyntheticScene
+from backend.app.checkpoint import CHECKPOINT_VERSION, VideoCheckpoint
+from backend.app.zone_tracker import ModularZoneTracker
+
+WIDTH, HEIGHT, FRAMES, FPS = 320, 240, 40, 10
+
+
+class Crashing:
+    """The stub detector until frame `at`, where the job dies (as if the server stopped)."""
+    def __init__(self, stub, at):
+        self.stub = stub
+        self.at = at
+
+    def predict(self, source, **params):
+        if self.stub.t == self.at:
+            raise RuntimeError("server stopped")
+        return self.stub.predict(source, **params)
+
+
+def make_video(path, scene):
+    writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*"mp4v"), FPS, (WIDTH, HEIGHT))
+    for t in range(FRAMES):
+        writer.write(scene.frame(t))
+    writer.release()
+
+
+def frame_count(path):
+    cap = cv2.VideoCapture(path)
+    frames = 0
+    while cap.read()[0]:
+        frames += 1
+    cap.release()
+    return frames
+
+
+def test_interrupted_job_resumes_with_same_count_and_frames(tmp_path):
+    scene = SyntheticScene(WIDTH, HEIGHT, density=4, speed=8, seed=3)
+    source = str(tmp_path / "in.mp4")
+    make_video(source, scene)
+
+    reference = ModularZoneTracker(None)
+    reference.model = StubDetector(scene)
+    expected = reference.process_video(source, str(tmp_path / "reference.mp4"))
+    assert expected["status"] == "completed" and expected["count"] > 0
+
+    output = str(tmp_path / "out.mp4")
+    checkpoint = VideoCheckpoint("job", str(tmp_path / "checkpoints"), interval=0) # Checkpoint every frame
+    first = ModularZoneTracker(None)
+    first.model = Crashing(StubDetector(scene), at=25)
+    with pytest.raises(RuntimeError):
+        first.process_video(source, output, checkpoint=checkpoint)
+    state = checkpoint.load()
+    assert state["frame_idx"] == 25
+    assert all(os.path.exists(s) for s in state["segments"])
+    assert isinstance(state["track_state"], dict) # Plain data, not the tracker object
+
+    # "After the restart": a new tracker and checkpoint object pick up from frame 25
+    resumed = ModularZoneTracker(None)
+    stub = StubDetector(scene)
+    stub.seek(state["frame_idx"])
+    resumed.model = stub
+    checkpoint = VideoCheckpoint("job", str(tmp_path / "checkpoints"), interval=0)
+    result = resumed.process_video(source, output, checkpoint=checkpoint)
+    assert result["status"] == "completed"
+    assert result["total_count"] == expected["total_count"]
+    assert frame_count(output) == FRAMES
+    checkpoint.discard()
+    assert os.listdir(tmp_path / "checkpoints") == []
+
+
+def test_checkpoint_of_another_version_drops_its_segments(tmp_path):
+    checkpoint = VideoCheckpoint("job", str(tmp_path))
+    segment = tmp_path / "detected_job.mp4.part0000.mp4"
+    segment.write_bytes(b"video")
+    with open(checkpoint.path, "wb") as f:
+        pickle.dump({"version": CHECKPOINT_VERSION - 1, "segments": [str(segment)]}, f)
+    assert checkpoint.load() is None
+    assert not segment.exists() and not os.path.exists(checkpoint.path)
@@ -0,0 +1,89 @@
+import sys
+import os
+import asyncio
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+if project_root not in sys.path:
+    sys.path.insert(0, project_root)
+
+from backend.app.connections import ConnectionManager, FRAME_QUEUE_SIZE, MAX_SEND_FAILURES
+
+
+class FakeWebSocket:
+    def __init__(self, delay=0.0, fail=False):
+        self.delay = delay
+        self.fail = fail
+        self.sent = []
+        self.closed = False
+
+    async def accept(self):
+        pass
+
+    async def send_json(self, message):
+        if self.fail:
+            raise RuntimeError("socket gone")
+        await asyncio.sleep(self.delay)
+        self.sent.append(message)
+
+    async def close(self):
+        self.closed = True
+
+
+def test_slow_client_does_not_block_others():
+    async def run():
+        manager = ConnectionManager()
+        slow, fast = FakeWebSocket(delay=0.5), FakeWebSocket()
+        await manager.connect("u1", slow)
+        await manager.connect("u1", fast)
+        await manager.broadcast({"count": 1}, userId="u1")
+        await asyncio.sleep(0.05)
+        assert fast.sent == [{"count": 1}]
+    asyncio.run(run())
+
+
+def test_frames_drop_oldest_but_counts_are_kept():
+    async def run():
+        manager = ConnectionManager()
+        ws = FakeWebSocket(delay=0.01)
+        client = await manager.connect("u1", ws)
+        for i in range(20):
+            client.enqueue({"type": "frame", "data": str(i)})
+            client.enqueue({"count": i})
+        await asyncio.sleep(0.5)
+        counts = [m["count"] for m in ws.sent if "type" not in m]
+        frames = [m for m in ws.sent if m.get("type") == "frame"]
+        assert counts == list(range(20))
+        assert len(frames) <= FRAME_QUEUE_SIZE + 1
+        assert frames[-1]["data"] == "19"
+    asyncio.run(run())
+
+
+def test_failing_socket_is_pruned():
+    async def run():
+        manager = ConnectionManager()
+        ws = FakeWebSocket(fail=True)
+        await manager.connect("u1", ws)
+        for i in range(MAX_SEND_FAILURES):
+            await manager.broadcast({"count": i}, userId="u1")
+        await asyncio.sleep(0.05)
+        assert "u1" not in manager.active_connections
+        assert ws.closed
+    asyncio.run(run())
+
+
+def test_channel_is_dropped_once_its_user_stays_away():
+    async def run():
+        manager = ConnectionManager(tick_interval=60, channel_ttl=10)
+        socket = FakeWebSocket()
+        await manager.connect("u1", socket, protocol=2)
+        await manager.broadcast({"count": 1}, userId="u1", task_id="t1")
+        await manager.broadcast({"count": 2}, userId="u2", task_id="t2") # A user who never connected
+        manager.disconnect("u1", socket)
+        assert set(manager.channels) == {"u1", "u2"} # Kept for a quick reconnect + resync
+
+        idle = manager.idle_since["u1"]
+        manager.expire_channels(now=idle + 5)
+        await manager.connect("u1", FakeWebSocket(), protocol=2)
+        manager.expire_channels(now=idle + 60)
+        assert set(manager.channels) == {"u1"} and manager.idle_since == {}
+        manager._ticker.cancel()
+    asyncio.run(run())
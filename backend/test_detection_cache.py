@@ -0,0 +1,128 @@
+import sys
+import os
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+if project_root not in sys.path:
+    sys.path.insert(0, project_root)
+
+import time
+
+import numpy as np
+
+from backend.app.detection_cache import DetectionCache, DetectionRecorder, detection_key
+
+WIDTH, HEIGHT = 640, 480
+
+
+def sack_frames(n_frames=120):
+    """Two sacks crossing the frame left to right, the second one 40 frames later."""
+    frames = []
+    for i in range(n_frames):
+        boxes, ids = [], []
+        for tid, start in ((1, 0), (2, 40)):
+            x = 20 + (i - start) * 8
+            if 0 <= i - start and x < WIDTH - 20:
+                boxes.append([x, 240, 80, 60])
+                ids.append(tid)
+        frames.append((np.array(boxes, dtype=np.float32).reshape(-1, 4), ids))
+    return frames
+
+
+def record(frames, first_frame=0):
+    recorder = DetectionRecorder()
+    recorder.begin(WIDTH, HEIGHT, 25, first_frame)
+    for i, (boxes, ids) in enumerate(frames):
+        if ids:
+            recorder.add(i, boxes, ids, np.full(len(ids), 0.9), [0] * len(ids))
+        else:
+            recorder.add(i)
+    return recorder
+
+
+def zone_tracker(monkeypatch):
+    from backend.app import zone_tracker as module
+    monkeypatch.setattr(module.registry, "get", lambda path: (None, None)) # Counting only, no weights
+    return module.ModularZoneTracker()
+
+
+def test_round_trip_and_partial_recordings(tmp_path):
+    cache = DetectionCache(str(tmp_path))
+    frames = sack_frames()
+    assert cache.put("key", record(frames))
+    detections = cache.get("key")
+    assert len(detections) == len(frames)
+    assert (detections.width, detections.height, detections.fps) == (WIDTH, HEIGHT, 25)
+    boxes, ids, classes = detections.frame(50)
+    np.testing.assert_array_equal(boxes, frames[50][0])
+    assert ids.tolist() == frames[50][1]
+    assert isinstance(detections.xywh, np.memmap)
+
+    assert not cache.put("resumed", record(frames[10:], first_frame=10))
+    assert cache.get("resumed") is None
+    assert cache.stats()["entries"] == 1
+
+
+def test_least_recently_used_entries_are_evicted(tmp_path):
+    cache = DetectionCache(str(tmp_path))
+    frames = sack_frames()
+    cache.put("a", record(frames))
+    cache.max_bytes = cache.stats()["bytes"] * 2 + 100
+    cache.put("b", record(frames))
+    old = time.time() - 60
+    os.utime(os.path.join(str(tmp_path), "a"), (old, old))
+    cache.get("a") # Used again: "b" is now the oldest
+    cache.put("c", record(frames))
+    assert sorted(os.listdir(str(tmp_path))) == ["a", "c"]
+
+
+def test_key_depends_on_detector_settings():
+    base = detection_key("video", "weights", "pytorch", {"conf": 0.2}, "bytetrack.yaml")
+    assert base == detection_key("video", "weights", "pytorch", {"conf": 0.2}, "bytetrack.yaml")
+    assert base != detection_key("video", "weights", "pytorch", {"conf": 0.3}, "bytetrack.yaml")
+    assert base != detection_key("video", "weights", "onnx", {"conf": 0.2}, "bytetrack.yaml")
+
+
+def test_replay_matches_the_live_counting_path(tmp_path, monkeypatch):
+    tracker = zone_tracker(monkeypatch)
+    frames = sack_frames()
+    # What process_video does per frame, minus decoding and drawing
+    tracker.set_roi(WIDTH, HEIGHT)
+    inside = set()
+    for i, (boxes, ids) in enumerate(frames):
+        tracker.count_frame(boxes, ids, [0] * len(ids), i, WIDTH, HEIGHT, inside)
+    live_count, live_events = tracker.total_count, [e["msg"] for e in tracker.events]
+    assert live_count > 0
+
+    cache = DetectionCache(str(tmp_path))
+    cache.put("video", record(frames))
+    results = tracker.replay(cache.get("video"))
+    assert results["count"] == live_count
+    assert [e["msg"] for e in tracker.events] == live_events
+
+    tracker.min_travel = 10 ** 6 # Nothing moves that far: nothing is counted
+    assert tracker.replay(cache.get("video"))["count"] == 0
+
+
+def test_every_tunable_parameter_is_read_by_the_counting(tmp_path, monkeypatch):
+    tracker = zone_tracker(monkeypatch)
+    read = set()
+
+    class Recording(type(tracker)):
+        def __getattribute__(self, name):
+            read.add(name)
+            return super().__getattribute__(name)
+
+    tracker.__class__ = Recording
+    cache = DetectionCache(str(tmp_path))
+    wide = [(boxes * np.array([1, 1, 2.5, 2.5], dtype=np.float32), ids) for boxes, ids in sack_frames()]
+    for key, frames in (("small", sack_frames()), ("wide", wide)):
+        cache.put(key, record(frames))
+        tracker.replay(cache.get(key))
+    assert set(tracker.TUNABLE_PARAMS) <= read # /recount and the sweep would otherwise change nothing
+
+
+def test_has_does_not_count_a_hit(tmp_path):
+    cache = DetectionCache(str(tmp_path))
+    assert not cache.has("video")
+    cache.put("video", record(sack_frames()))
+    assert cache.has("video")
+    assert cache.stats()["hits"] == 0
@@ -0,0 +1,132 @@
+import sys
+import os
+import threading
+import numpy as np
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+if project_root not in sys.path:
+    sys.path.insert(0, project_root)
+
+import cv2
+import pytest
+from backend.app import encoder
+from backend.app.encoder import AsyncVideoWriter, EncodeStats, open_video_writer
+from backend.app.zone_tracker import ModularZoneTracker
+
+
+class SlowWriter:
+    """Stands in for cv2.VideoWriter: blocks until released, records frames."""
+    def __init__(self, fail_at=None):
+        self.frames = []
+        self.gate = threading.Event()
+        self.fail_at = fail_at
+        self.released = False
+
+    def isOpened(self):
+        return True
+
+    def write(self, frame):
+        self.gate.wait()
+        if len(self.frames) == self.fail_at:
+            raise OSError("disk full")
+        self.frames.append(frame)
+
+    def release(self):
+        self.released = True
+
+
+def test_writes_are_queued_off_the_caller_thread():
+    inner = SlowWriter()
+    out = AsyncVideoWriter(inner, EncodeStats(), max_frames=8)
+    for i in range(5):
+        out.write(i) # Returns although the encoder is stuck
+    assert inner.frames == []
+    inner.gate.set()
+    out.release()
+    assert inner.frames == [0, 1, 2, 3, 4]
+    assert inner.released
+    assert out.stats.frames == 5
+
+
+def test_encoder_failure_surfaces_on_release_without_blocking():
+    inner = SlowWriter(fail_at=2)
+    inner.gate.set()
+    out = AsyncVideoWriter(inner, EncodeStats(), max_frames=2)
+    for i in range(20):
+        out.write(i)
+    with pytest.raises(RuntimeError):
+        out.release()
+    assert inner.frames == [0, 1]
+
+
+def test_opencv_fallback_reports_bitrate(tmp_path):
+    path = str(tmp_path / "out.mp4")
+    stats = EncodeStats()
+    out = open_video_writer(path, 10, (64, 48), stats, encoder="opencv")
+    for i in range(20):
+        out.write(np.full((48, 64, 3), i * 10, dtype=np.uint8))
+    out.release()
+    stats.finish(path, 10)
+    report = stats.as_dict()
+    assert report["backend"].startswith("opencv/")
+    assert report["frames"] == 20
+    assert report["bytes"] > 0 and report["bitrate_kbps"] > 0
+
+
+def test_end_stream_closes_playlist_once(tmp_path):
+    from backend.app.encoder import end_stream, HLS_PLAYLIST
+    playlist = tmp_path / HLS_PLAYLIST
+    playlist.write_text("#EXTM3U\n#EXTINF:2.0,\nseg_00000.ts\n")
+    end_stream(str(tmp_path))
+    end_stream(str(tmp_path))
+    assert playlist.read_text().count("#EXT-X-ENDLIST") == 1
+    end_stream(None) # No stream (OpenCV fallback): nothing to do
+
+
+class StuckWriter(SlowWriter):
+    """Like an ffmpeg pipe that stopped reading: write() blocks until abort() kills it."""
+    def abort(self):
+        self.aborted = True
+        self.gate.set()
+
+
+def test_abort_drops_queued_frames_and_stops_the_thread():
+    inner = StuckWriter()
+    out = AsyncVideoWriter(inner, EncodeStats(), max_frames=4)
+    for i in range(4):
+        out.write(i)
+    out.abort()
+    assert inner.aborted
+    assert not out._thread.is_alive()
+    assert len(inner.frames) <= 1 # At most the frame that was being written
+
+
+def test_ffmpeg_without_libx264_falls_back_to_opencv(tmp_path, monkeypatch):
+    fake = tmp_path / "ffmpeg"
+    fake.write_text("#!/bin/sh\necho \"Unknown encoder 'libx264'\" >&2\nexit 1\n")
+    fake.chmod(0o755)
+    monkeypatch.setattr(encoder, "ffmpeg_path", lambda: str(fake))
+    monkeypatch.setattr(encoder, "_ffmpeg_usable", None)
+    stats = EncodeStats()
+    out = open_video_writer(str(tmp_path / "out.mp4"), 10, (64, 48), stats, encoder="auto")
+    out.write(np.zeros((48, 64, 3), dtype=np.uint8))
+    out.release() # Would raise with the ffmpeg writer
+    assert stats.backend.startswith("opencv/")
+    assert not encoder.hls_supported("auto")
+
+
+def test_failed_job_leaves_no_encoder_thread(tmp_path):
+    class FailingModel:
+        def predict(self, frames, **params):
+            raise RuntimeError("inference failed")
+
+    source = str(tmp_path / "in.mp4")
+    writer = cv2.VideoWriter(source, cv2.VideoWriter_fourcc(*"mp4v"), 10, (64, 48))
+    for _ in range(5):
+        writer.write(np.zeros((48, 64, 3), dtype=np.uint8))
+    writer.release()
+    zone = ModularZoneTracker(None)
+    zone.model = FailingModel()
+    before = sum(t.name == "video-encoder" for t in threading.enumerate())
+    with pytest.raises(RuntimeError):
+        zone.process_video(source, str(tmp_path / "out.mp4"))
+    assert sum(t.name == "video-encoder" for t in threading.enumerate()) == before
@@ -0,0 +1,39 @@
+import sys
+import os
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+if project_root not in sys.path:
+    sys.path.insert(0, project_root)
+
+from backend.app.live_state import CountRollup, LiveCountState
+
+
+def test_track_counted_once_until_it_expires():
+    state = LiveCountState(ttl=10)
+    assert state.count(1, now=0)
+    assert not state.count(1, now=5)
+    # Still visible (touched) at t=5, so not expired at t=12
+    state.touch(2, now=12)
+    assert 1 in state
+    state.touch(2, now=16)
+    assert 1 not in state
+    assert len(state) == 1
+    assert state.expired == 1
+
+
+def test_id_cap_evicts_oldest():
+    state = LiveCountState(ttl=1000, max_ids=3)
+    for track_id in range(10):
+        state.count(track_id, now=track_id)
+    assert len(state) == 3
+    assert [t for t in range(10) if t in state] == [7, 8, 9]
+
+
+def test_rollup_buckets_by_shift_and_stays_bounded():
+    rollup = CountRollup(bucket_seconds=8 * 3600, offset_seconds=6 * 3600, max_buckets=2)
+    rollup.add(ts=6 * 3600)
+    rollup.add(ts=13 * 3600)
+    rollup.add(2, ts=14 * 3600)
+    assert rollup.series() == [{"start": 6 * 3600, "count": 2}, {"start": 14 * 3600, "count": 2}]
+    rollup.add(ts=22 * 3600)
+    assert [b["start"] for b in rollup.series()] == [14 * 3600, 22 * 3600]
+    assert rollup.series(since=20 * 3600) == [{"start": 22 * 3600, "count": 1}]
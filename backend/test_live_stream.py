@@ -0,0 +1,62 @@
+import sys
+import os
+import asyncio
+import threading
+import types
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+if project_root not in sys.path:
+    sys.path.insert(0, project_root)
+
+from backend.app import main
+from backend.app.live_stream import FrameBroadcaster
+
+
+def test_readers_wake_on_publish_from_another_thread():
+    broadcaster = FrameBroadcaster()
+
+    async def run():
+        readers = [asyncio.create_task(broadcaster.next_frame(0, timeout=5)) for _ in range(3)]
+        await asyncio.sleep(0.01)
+        assert len(broadcaster._waiters) == 3
+        threading.Timer(0.05, broadcaster.publish, args=(b"jpeg-1",)).start() # The inference loop's thread
+        return await asyncio.gather(*readers)
+
+    assert asyncio.run(run()) == [(1, b"jpeg-1")] * 3
+    assert broadcaster._waiters == set()
+
+
+def test_slow_reader_skips_to_the_newest_frame():
+    broadcaster = FrameBroadcaster()
+
+    async def run():
+        seq, frame = await broadcaster.next_frame(0, timeout=0.05)
+        assert (seq, frame) == (0, None) # Nothing published yet
+        for i in range(1, 6):
+            broadcaster.publish(f"jpeg-{i}".encode()) # Reader busy sending an older frame meanwhile
+        seq, frame = await broadcaster.next_frame(seq)
+        assert (seq, frame) == (5, b"jpeg-5")
+        assert await broadcaster.next_frame(seq, timeout=0.05) == (5, None) # Already up to date
+        assert broadcaster._waiters == set() # The timed-out wait left nothing behind
+
+    asyncio.run(run())
+
+
+def test_viewer_unsubscribes_when_the_stream_closes(monkeypatch):
+    monkeypatch.setattr(main, "tracker", object())
+    camera = types.SimpleNamespace(camera_id="dock", broadcaster=FrameBroadcaster(), active=True)
+
+    async def run():
+        stream = main.generate_frames(camera)
+        camera.broadcaster.publish(b"jpeg")
+        part = await stream.__anext__()
+        assert part.startswith(b"--frame\r\n") and b"jpeg" in part
+        assert camera.broadcaster.subscribers == 1
+        waiting = asyncio.ensure_future(stream.__anext__()) # Viewer waits for the next frame, then leaves
+        await asyncio.sleep(0.01)
+        waiting.cancel()
+        await asyncio.gather(waiting, return_exceptions=True)
+        await stream.aclose()
+        assert camera.broadcaster.subscribers == 0
+        assert camera.broadcaster._waiters == set()
+
+    asyncio.run(run())
@@ -0,0 +1,52 @@
+import sys
+import os
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+if project_root not in sys.path:
+    sys.path.insert(0, project_root)
+
+from backend.app.metrics_store import CountStore
+
+DAY = 86400
+
+
+def test_query_downsamples_from_rollups():
+    store = CountStore()
+    store.record(2, ts=DAY + 30, camera="dock", user="u1")
+    store.record(1, ts=DAY + 90, camera="dock")
+    store.record(5, ts=DAY + 3700, camera="yard")
+
+    timestamps, values, resolution = store.query(DAY, DAY + 7200, 3600)
+    assert timestamps == [DAY, DAY + 3600]
+    assert values == {"total:all": [3, 5]}
+    assert resolution == 3600
+
+    _, values, resolution = store.query(DAY, DAY + 180, 60, [("camera", "dock"), ("user", "u1")])
+    assert values == {"camera:dock": [2, 1, 0], "user:u1": [2, 0, 0]}
+    assert resolution == 60
+
+
+def test_late_events_and_day_steps():
+    store = CountStore()
+    store.record(1, ts=3 * DAY)
+    store.record(4, ts=DAY + 10) # Out of order
+    _, values, resolution = store.query(0, 4 * DAY, DAY)
+    assert values["total:all"] == [0, 4, 0, 1]
+    assert resolution == DAY
+
+
+def test_trimmed_minutes_fall_back_to_hours():
+    store = CountStore(resolutions=((60, 2), (3600, 100), (DAY, 10)))
+    for minute in range(5):
+        store.record(1, ts=minute * 60)
+    _, values, resolution = store.query(0, 300, 60)
+    assert resolution == 3600
+    assert sum(values["total:all"]) == 5
+
+
+def test_flush_and_reload(tmp_path):
+    path = str(tmp_path / "metrics.npz")
+    store = CountStore(path)
+    store.record(3, ts=DAY, zone="live", camera="a|b")
+    assert store.flush()
+    reloaded = CountStore(path)
+    assert reloaded.query(DAY, DAY + 60, 60, [("camera", "a|b")])[1] == {"camera:a|b": [3]}
@@ -0,0 +1,48 @@
+import sys
+import os
+import threading
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+if project_root not in sys.path:
+    sys.path.insert(0, project_root)
+
+from backend.app import model_registry
+from backend.app.model_registry import ModelRegistry, rss_mb
+
+
+class FakeModel:
+    def __init__(self):
+        self.predictions = 0
+
+    def predict(self, frame, **params):
+        self.predictions += 1
+        return []
+
+
+def test_each_weight_file_loads_once(monkeypatch):
+    loads = []
+
+    def fake_load(path, backend):
+        loads.append(path)
+        return FakeModel(), "pytorch"
+
+    monkeypatch.setattr(model_registry, "load_model", fake_load)
+    registry = ModelRegistry(warmup=True)
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(registry.get("models/a.pt", "pytorch")))
+               for _ in range(4)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert len(loads) == 1
+    assert all(model is results[0][0] for model, _ in results)
+    assert results[0][0].predictions == 1 # Warmed up once
+    assert registry.stats()[0]["users"] == 4
+
+    registry.get("models/b.pt", "pytorch")
+    assert len(loads) == 2
+
+
+def test_rss_is_reported():
+    assert rss_mb() > 0
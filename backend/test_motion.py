@@ -0,0 +1,61 @@
+import sys
+import os
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+if project_root not in sys.path:
+    sys.path.insert(0, project_root)
+
+import numpy as np
+
+from backend.app.motion import MotionGate
+
+WIDTH, HEIGHT = 320, 240
+
+
+def still(noise_seed=None):
+    """Grey conveyor with a fixed dark bag; optional sensor noise well below the pixel delta."""
+    frame = np.full((HEIGHT, WIDTH, 3), 120, dtype=np.uint8)
+    frame[80:160, 40:100] = 40
+    if noise_seed is not None:
+        noise = np.random.default_rng(noise_seed).integers(-6, 7, frame.shape)
+        frame = np.clip(frame.astype(np.int16) + noise, 0, 255).astype(np.uint8)
+    return frame
+
+
+def moving(x):
+    frame = still()
+    frame[60:120, x:x + 50] = 230
+    return frame
+
+
+def test_still_frames_are_skipped_and_motion_wakes_inference():
+    gate = MotionGate(keepalive_frames=1000)
+    assert gate.should_infer(still()) # First frame: no reference yet
+    assert not any(gate.should_infer(still(seed)) for seed in range(10))
+    assert gate.last_motion < gate.min_area
+
+    assert gate.should_infer(moving(150))
+    assert gate.last_gap == 10 # Skipped frames before this inference
+    assert gate.should_infer(moving(170))
+    assert gate.last_gap == 0
+    assert not gate.should_infer(moving(170)) # Stopped: same as the reference
+
+    stats = gate.stats()
+    assert (stats["frames"], stats["inferred"], stats["skipped"]) == (14, 3, 11)
+
+
+def test_slow_motion_accumulates_against_the_last_inferred_frame():
+    gate = MotionGate(min_area=0.01, keepalive_frames=1000)
+    gate.should_infer(moving(100))
+    decisions = [gate.should_infer(moving(100 + step)) for step in range(1, 20)]
+    assert not decisions[0] # A 1 px shift alone is below min_area
+    assert any(decisions) # ...but the drift since the reference frame is not
+
+
+def test_keepalive_forces_inference_on_a_static_scene():
+    gate = MotionGate(keepalive_frames=5)
+    decisions = [gate.should_infer(still()) for _ in range(13)]
+    assert decisions == [True] + ([False] * 5 + [True]) * 2
+    assert gate.last_gap == 5
+
+    gate.reset()
+    assert gate.should_infer(still()) # No reference after a reset
@@ -0,0 +1,55 @@
+import sys
+import os
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+if project_root not in sys.path:
+    sys.path.insert(0, project_root)
+
+import threading
+import time
+
+from backend.app.planner import ExecutionPlan, JobSlot, JobSlots, candidate_shapes
+from backend.app.cancellation import CancelToken
+
+
+def test_execution_plan_shapes_and_job_slots():
+    assert candidate_shapes(32, max_workers=8) == [(1, 32), (2, 16), (4, 8), (8, 4)]
+    assert candidate_shapes(1) == [(1, 1)]
+
+    plan = ExecutionPlan.parse("2x4")
+    plan.cpus = list(range(8))
+    assert plan.affinity() == [{0, 1, 2, 3}, {4, 5, 6, 7}]
+    assert plan.job_slots == 3
+
+    slots = JobSlots(1)
+    assert slots.acquire()
+    token = CancelToken()
+    token.cancel()
+    assert not slots.acquire(token) # Full: a cancelled job gives up instead of waiting
+    slots.release()
+    assert slots.acquire(token)
+
+
+def test_paused_job_lends_its_slot():
+    slots = JobSlots(1)
+    token = CancelToken()
+    first = JobSlot(slots, token)
+    assert first.acquire()
+    token.on_pause, token.on_resume = first.pause, first.resume
+    token.pause()
+    stopped = []
+    loop = threading.Thread(target=lambda: stopped.append(token.should_stop())) # The job's frame loop
+    loop.start()
+
+    second = JobSlot(slots, CancelToken())
+    assert second.acquire() # Would wait forever if the paused job kept its slot
+    assert slots.stats()["paused"] == 1
+    token.resume()
+    time.sleep(0.2)
+    assert loop.is_alive() # Resumed, queued behind the running job
+    second.release()
+    loop.join(5)
+    assert stopped == [False]
+    assert first.held and slots.stats() == {"size": 1, "running": 1, "waiting": 0, "paused": 0}
+    first.release()
+    first.release() # Idempotent (the task's finally block)
+    assert slots.running == 0
@@ -0,0 +1,123 @@
+import sys
+import os
+import asyncio
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+if project_root not in sys.path:
+    sys.path.insert(0, project_root)
+
+import numpy as np
+import pytest
+
+from backend.app import preview
+from backend.app.preview import PREVIEW_HEADER, PreviewHub
+
+FRAME = np.zeros((48, 64, 3), dtype=np.uint8)
+
+
+class FakeWebSocket:
+    def __init__(self):
+        self.sent = []
+        self.gate = None # asyncio.Event holding sends back, like a slow client
+
+    async def accept(self):
+        pass
+
+    async def send_bytes(self, payload):
+        if self.gate is not None:
+            await self.gate.wait()
+        self.sent.append(payload)
+
+
+@pytest.fixture
+def encodes(monkeypatch):
+    """Counts JPEG encodes; the payload is a fixed marker."""
+    calls = []
+
+    def encode(frame, max_width, quality):
+        calls.append(frame.shape)
+        return b"jpeg"
+    monkeypatch.setattr(preview, "encode_preview", encode)
+    return calls
+
+
+async def settle():
+    for _ in range(5):
+        await asyncio.sleep(0)
+
+
+def test_no_subscribers_no_encode(encodes):
+    hub = PreviewHub()
+
+    async def run():
+        assert not hub.publish("t1", FRAME)
+        sub = await hub.subscribe("t1", FakeWebSocket())
+        assert not hub.publish("t2", FRAME) # Viewers of another task do not count
+        hub.unsubscribe(sub)
+        assert not hub.publish("t1", FRAME)
+    asyncio.run(run())
+    assert encodes == [] and hub.encoded == 0
+
+
+def test_binary_frame_header(encodes):
+    hub = PreviewHub(max_fps=1000)
+
+    async def run():
+        socket = FakeWebSocket()
+        await hub.subscribe("t1", socket)
+        assert hub.publish("t1", FRAME, frame_idx=2 ** 32 + 7, count=-3) # Wraps / clamps to uint32
+        await settle()
+        return socket.sent
+    sent = asyncio.run(run())
+    assert len(sent) == 1
+    assert PREVIEW_HEADER.size == 8
+    assert PREVIEW_HEADER.unpack(sent[0][:8]) == (7, 0)
+    assert sent[0][8:] == b"jpeg"
+
+
+def test_busy_subscriber_is_not_ready_until_the_send_completes(encodes):
+    hub = PreviewHub(max_fps=1000)
+
+    async def run():
+        socket = FakeWebSocket()
+        socket.gate = asyncio.Event()
+        sub = await hub.subscribe("t1", socket)
+        assert hub.publish("t1", FRAME, frame_idx=1)
+        await settle()
+        assert sub.pending is None and sub.sending # Taken by the writer, still on the wire
+        assert not sub.ready
+        assert not hub.publish("t1", FRAME, frame_idx=2) # Nobody can take it: not even encoded
+        socket.gate.set()
+        await settle()
+        assert sub.ready and sub.sent == 1
+        hub.last_encode["t1"] -= 1.0 # Past the pacing interval (that send was slow)
+        assert hub.publish("t1", FRAME, frame_idx=3)
+        await settle()
+        return socket.sent
+    sent = asyncio.run(run())
+    assert [PREVIEW_HEADER.unpack(p[:8])[0] for p in sent] == [1, 3]
+    assert len(encodes) == 2
+
+
+def test_pacing_follows_the_fastest_subscriber(encodes):
+    hub = PreviewHub(max_fps=10, min_fps=1)
+
+    async def run():
+        slow = await hub.subscribe("t1", FakeWebSocket())
+        fast = await hub.subscribe("t1", FakeWebSocket())
+        slow.send_time, fast.send_time = 0.8, 0.25
+        assert hub.frame_interval("t1") == 0.25
+        fast.send_time = 0.01
+        assert hub.frame_interval("t1") == pytest.approx(0.1) # Capped at max_fps
+        fast.send_time, slow.send_time = 5.0, 3.0
+        assert hub.frame_interval("t1") == 1.0 # Never below min_fps
+        fast.send_time = 0.0
+
+        assert hub.publish("t1", FRAME)
+        await settle()
+        assert not hub.publish("t1", FRAME) # Within the interval
+        hub.last_encode["t1"] -= 1.0
+        assert hub.publish("t1", FRAME)
+        await settle()
+        assert fast.sent == slow.sent == 2
+    asyncio.run(run())
+    assert len(encodes) == 2
@@ -0,0 +1,44 @@
+import sys
+import os
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+if project_root not in sys.path:
+    sys.path.insert(0, project_root)
+
+from backend.app.protocol import DeltaChannel, SESSION_KEY, split_update
+
+
+def test_only_changed_fields_are_sent():
+    channel = DeltaChannel()
+    channel.apply("t1", {"count": 3, "progress": 10})
+    assert channel.flush()["d"] == {"t1": {"count": 3, "progress": 10}}
+
+    channel.apply("t1", {"count": 3, "progress": 11})
+    batch = channel.flush()
+    assert batch["seq"] == 2
+    assert batch["d"] == {"t1": {"progress": 11}}
+    assert channel.flush() is None
+
+
+def test_updates_within_a_tick_are_coalesced():
+    channel = DeltaChannel()
+    for p in range(50):
+        channel.apply("t1", {"progress": p})
+    channel.apply(None, *split_update({"count": 0, "event": "reset"}))
+    batch = channel.flush()
+    assert batch["d"] == {"t1": {"progress": 49}, SESSION_KEY: {"count": 0}}
+    assert batch["e"] == [{"event": "reset"}]
+
+
+def test_resync_from_history_or_snapshot():
+    channel = DeltaChannel(history_size=2)
+    for c in range(1, 5):
+        channel.apply("t1", {"count": c})
+        channel.flush()
+
+    assert [b["seq"] for b in channel.resync(2)] == [3, 4]
+    assert channel.resync(4) == []
+
+    # seq 1 has fallen out of the history: full snapshot instead
+    snapshot, = channel.resync(0)
+    assert snapshot["t"] == "s" and snapshot["seq"] == 4
+    assert snapshot["s"] == {"t1": {"count": 4}}
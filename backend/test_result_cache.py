@@ -0,0 +1,96 @@
+import sys
+import os
+import threading
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+if project_root not in sys.path:
+    sys.path.insert(0, project_root)
+
+import pytest
+
+from backend.app import backends, main
+from backend.app.metrics_store import CountStore
+from backend.app.result_cache import ResultCache
+
+
+class Tracker:
+    """Just what result_cache_key and the cache-hit path read from a tracker."""
+    TUNABLE_PARAMS = ("exit_threshold",)
+
+    def __init__(self, model_path):
+        self.model = object()
+        self.model_path = model_path
+        self.target_class_id = 0
+        self.exit_threshold = 40
+        self.backend = "pytorch"
+        self.total_count = 0
+
+    def process_video(self, *args, **kwargs):
+        raise AssertionError("a cache hit must not run the model")
+
+
+@pytest.fixture
+def app_state(tmp_path, monkeypatch):
+    """main with its cache, task store and output directory under tmp_path."""
+    weights = tmp_path / "weights.pt"
+    weights.write_bytes(b"weights v1")
+    ready = threading.Event()
+    ready.set()
+    monkeypatch.setattr(main, "models_ready", ready)
+    monkeypatch.setattr(main, "tasks", {})
+    monkeypatch.setattr(main, "TASK_FILE", str(tmp_path / "tasks.json"))
+    monkeypatch.setattr(main, "DETECTION_DIR", str(tmp_path / "detections"))
+    monkeypatch.setattr(main, "result_cache", ResultCache(str(tmp_path / "cache")))
+    monkeypatch.setattr(main, "count_store", CountStore())
+    monkeypatch.setattr(main, "tracker", Tracker(str(weights)))
+    os.makedirs(main.DETECTION_DIR)
+    video = tmp_path / "in.mp4"
+    video.write_bytes(b"input video")
+    return main.tracker, str(video)
+
+
+def test_key_changes_with_weights_mode_and_tunables(app_state, monkeypatch):
+    tracker, video = app_state
+    key = main.result_cache_key("a", video, "static", tracker)
+    assert key == main.result_cache_key("b", video, "static", tracker) # Same file + config, any task
+
+    assert main.result_cache_key("a", video, "zone", tracker) != key
+
+    tracker.exit_threshold = 50
+    assert main.result_cache_key("a", video, "static", tracker) != key
+    tracker.exit_threshold = 40
+
+    keys = {key}
+    for backend in ("onnx", "onnx_int8", "openvino"): # Same .pt weights, different model actually run
+        tracker.backend = backend
+        keys.add(main.result_cache_key("a", video, "static", tracker))
+    assert len(keys) == 4
+    tracker.backend = "onnx_int8"
+    int8_key = main.result_cache_key("a", video, "static", tracker)
+    monkeypatch.setattr(backends, "CALIBRATION_METHOD", "entropy")
+    assert main.result_cache_key("a", video, "static", tracker) != int8_key
+    tracker.backend = "pytorch"
+
+    with open(tracker.model_path, "wb") as f:
+        f.write(b"retrained weights v2")
+    assert main.result_cache_key("a", video, "static", tracker) != key
+
+
+def test_cache_hit_materializes_output_and_result(app_state):
+    tracker, video = app_state
+    key = main.result_cache_key("first", video, "static", tracker)
+    produced = os.path.join(main.DETECTION_DIR, "detected_first.mp4")
+    with open(produced, "wb") as f:
+        f.write(b"annotated output")
+    main.result_cache.put(key, produced, {"count": 7})
+
+    main.process_video_task("second", video, "static", "user")
+
+    task = main.tasks["second"]
+    assert task["status"] == "completed" and task["cache"] == "hit"
+    assert task["count"] == task["results_count"] == 7
+    assert task["video_url"] == "/download/detected_second.mp4"
+    with open(os.path.join(main.DETECTION_DIR, "detected_second.mp4"), "rb") as f:
+        assert f.read() == b"annotated output"
+    assert tracker.total_count == 7
+    assert main.result_cache.stats()["hits"] == 1
+    assert "second" not in main.task_tokens
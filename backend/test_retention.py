@@ -0,0 +1,121 @@
+import sys
+import os
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+if project_root not in sys.path:
+    sys.path.insert(0, project_root)
+
+import time
+
+from backend.app.retention import (RetentionManager, StorageArea, output_task_id, upload_task_id, dir_task_id,
+                                   checkpoint_task_id, DAY)
+
+
+def make_file(directory, name, size, age_days=0.0, data=None):
+    path = os.path.join(directory, name)
+    with open(path, "wb") as f:
+        f.write(data if data is not None else os.urandom(size))
+    stamp = time.time() - age_days * DAY
+    os.utime(path, (stamp, stamp))
+    return path
+
+
+def manager(tmp_path, states, budget=250, **kwargs):
+    changes = []
+    outputs = tmp_path / "detections"
+    outputs.mkdir()
+    retention = RetentionManager(
+        [StorageArea("detections", str(outputs), budget, output_task_id, cold=True)],
+        lambda task_id: states.get(task_id), lambda *change: changes.append(change), **kwargs)
+    return retention, str(outputs), changes
+
+
+def test_task_ids_from_file_names():
+    assert upload_task_id("abc_video.mp4") == "abc"
+    assert upload_task_id(".partial") is None
+    assert output_task_id("detected_abc.mp4") == "abc"
+    assert output_task_id("detected_abc.jpg.gz") == "abc"
+    assert output_task_id("verify_detected.jpg") is None
+    assert output_task_id("detected_abc.mp4.part0003.mp4") == "abc"
+    assert dir_task_id("abc") == "abc"
+    assert checkpoint_task_id("abc.ckpt") == "abc"
+    assert checkpoint_task_id("abc.ckpt.tmp") == "abc"
+    assert checkpoint_task_id("notes.txt") is None
+
+
+def test_least_recently_used_go_first_and_active_tasks_are_kept(tmp_path):
+    states = {"a": "known", "b": "known", "c": "active", "d": "known"}
+    retention, outputs, changes = manager(tmp_path, states, cold_dir="")
+    make_file(outputs, "detected_c.mp4", 100, age_days=4) # Running: never evicted
+    make_file(outputs, "detected_a.mp4", 100, age_days=3)
+    make_file(outputs, "detected_b.mp4", 100, age_days=2)
+    make_file(outputs, "detected_d.mp4", 100, age_days=1)
+    retention.touch("a") # Just downloaded
+
+    done = retention.run_once()
+    assert [d["name"] for d in done] == ["detected_b.mp4", "detected_d.mp4"]
+    assert sorted(os.listdir(outputs)) == ["detected_a.mp4", "detected_c.mp4"]
+    assert changes == [("b", "detections", "delete"), ("d", "detections", "delete")]
+    assert retention.run_once() == []
+
+
+def test_orphans_wait_out_the_grace_period(tmp_path):
+    retention, outputs, _ = manager(tmp_path, {}, budget=10 ** 6, cold_dir="")
+    make_file(outputs, "detected_new.mp4", 10) # Upload still being registered
+    make_file(outputs, "detected_old.mp4", 10, age_days=1)
+    done = retention.run_once()
+    assert [(d["name"], d["reason"]) for d in done] == [("detected_old.mp4", "orphan")]
+
+
+def test_resume_state_of_an_active_task_is_kept(tmp_path):
+    states = {"job": "active"}
+    retention, outputs, _ = manager(tmp_path, states, budget=10 ** 6, cold_dir="")
+    checkpoints = tmp_path / "checkpoints"
+    checkpoints.mkdir()
+    retention.areas.append(StorageArea("checkpoints", str(checkpoints), 10 ** 6, checkpoint_task_id))
+    # A job paused for days: its segments and checkpoint are far past the orphan grace period
+    make_file(outputs, "detected_job.mp4.part0000.mp4", 10, age_days=3)
+    make_file(outputs, "detected_job.mp4.part0001.mp4", 10, age_days=3)
+    make_file(str(checkpoints), "job.ckpt", 10, age_days=3)
+    make_file(str(checkpoints), "job.ckpt.tmp", 10, age_days=3)
+    make_file(str(checkpoints), "gone.ckpt", 10, age_days=3)
+    done = retention.run_once()
+    assert [(d["name"], d["reason"]) for d in done] == [("gone.ckpt", "orphan")]
+    assert len(os.listdir(outputs)) == 2
+    assert sorted(os.listdir(checkpoints)) == ["job.ckpt", "job.ckpt.tmp"]
+
+
+def test_batch_limits_each_pass(tmp_path):
+    states = {str(i): "known" for i in range(5)}
+    retention, outputs, _ = manager(tmp_path, states, budget=0, cold_dir="", batch=2)
+    for i in range(5):
+        make_file(outputs, f"detected_{i}.mp4", 10, age_days=5 - i)
+    assert len(retention.run_once()) == 2
+    assert len(retention.run_once()) == 2
+    assert len(retention.run_once()) == 1
+
+
+def test_old_outputs_move_to_cold_tier_and_come_back(tmp_path):
+    states = {"text": "known", "noise": "known", "fresh": "known", "gone": "known"}
+    cold = str(tmp_path / "cold")
+    retention, outputs, changes = manager(tmp_path, states, budget=10 ** 6, cold_dir=cold,
+                                          cold_after_days=7, max_age_days=30)
+    original = b"frame " * 50000
+    make_file(outputs, "detected_text.mp4", 0, age_days=10, data=original) # Compresses well
+    noise = make_file(outputs, "detected_noise.mp4", 5000, age_days=10) # Does not
+    make_file(outputs, "detected_fresh.mp4", 100, age_days=1)
+    make_file(outputs, "detected_gone.mp4", 100, age_days=40)
+
+    retention.run_once()
+    assert sorted(os.listdir(outputs)) == ["detected_fresh.mp4"]
+    assert sorted(os.listdir(cold)) == ["detected_noise.mp4", "detected_text.mp4.gz"]
+    assert os.path.getsize(os.path.join(cold, "detected_text.mp4.gz")) < len(original) / 10
+    assert ("gone", "detections", "delete") in changes
+    assert ("text", "detections", "cold") in changes
+
+    restored = retention.restore("detected_text.mp4", outputs)
+    with open(restored, "rb") as f:
+        assert f.read() == original
+    assert retention.cold_path("detected_text.mp4") is None
+    assert retention.restore("detected_missing.mp4", outputs) is None
+    assert not os.path.exists(noise)
+    assert retention.stats()["restored"] == 1
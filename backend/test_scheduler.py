@@ -0,0 +1,100 @@
+import sys
+import os
+import threading
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+if project_root not in sys.path:
+    sys.path.insert(0, project_root)
+
+from backend.app.scheduler import InferenceScheduler, LIVE, INTERACTIVE, BATCH
+
+
+class RecordingModel:
+    """Stands in for YOLO: returns one result per frame and records each forward pass."""
+    def __init__(self, gate=None):
+        self.calls = []
+        self.gate = gate
+
+    def predict(self, frames, **params):
+        if self.gate is not None:
+            self.gate.wait()
+        self.calls.append(list(frames))
+        return [f"r{f}" for f in frames]
+
+
+def test_results_are_split_back_per_request():
+    sched = InferenceScheduler(windows_ms={LIVE: 0, INTERACTIVE: 50, BATCH: 50})
+    model = RecordingModel()
+    a = sched.submit(model, [1, 2], INTERACTIVE, conf=0.3)
+    b = sched.submit(model, [3], INTERACTIVE, conf=0.3)
+    assert a.result(5) == ["r1", "r2"]
+    assert b.result(5) == ["r3"]
+    assert model.calls == [[1, 2, 3]] # Micro-batched into one pass
+
+
+def test_live_jumps_ahead_of_batch_chunks():
+    gate = threading.Event()
+    sched = InferenceScheduler(max_batch={LIVE: 8, INTERACTIVE: 8, BATCH: 2},
+                               windows_ms={LIVE: 0, INTERACTIVE: 0, BATCH: 0})
+    model = RecordingModel(gate)
+    job = sched.submit(model, [1, 2, 3, 4, 5, 6], BATCH, conf=0.15)
+    live = sched.submit(model, ["live"], LIVE, conf=0.3)
+    gate.set()
+    assert live.result(5) == ["rlive"]
+    assert job.result(5) == ["r1", "r2", "r3", "r4", "r5", "r6"]
+    # First batch chunk may already be running; live goes right after it
+    assert model.calls.index(["live"]) <= 1
+    assert all(len(call) <= 2 for call in model.calls if call != ["live"])
+
+
+def test_incompatible_params_are_not_merged():
+    sched = InferenceScheduler(windows_ms={LIVE: 0, INTERACTIVE: 50, BATCH: 50})
+    model = RecordingModel()
+    a = sched.submit(model, [1], BATCH, conf=0.15, augment=True)
+    b = sched.submit(model, [2], BATCH, conf=0.45, augment=True)
+    a.result(5), b.result(5)
+    assert sorted(model.calls) == [[1], [2]]
+
+
+def test_cancelled_request_drops_remaining_chunks():
+    from backend.app.cancellation import CancelToken, TaskCancelled
+    gate = threading.Event()
+    sched = InferenceScheduler(max_batch={LIVE: 8, INTERACTIVE: 8, BATCH: 2},
+                               windows_ms={LIVE: 0, INTERACTIVE: 0, BATCH: 0})
+    model = RecordingModel(gate)
+    token = CancelToken()
+    job = sched.submit(model, list(range(10)), BATCH, token, conf=0.15)
+    token.cancel()
+    gate.set()
+    try:
+        job.result(5)
+        assert False, "expected TaskCancelled"
+    except TaskCancelled:
+        pass
+    assert sum(len(call) for call in model.calls) <= 2 # At most the chunk already running
+
+
+def test_parallel_workers_use_replicas_and_keep_frame_order():
+    import time
+
+    class SlowModel(RecordingModel):
+        def predict(self, frames, **params):
+            time.sleep(0.01 * (5 - frames[0] % 5)) # Later chunks finish first
+            return super().predict(frames, **params)
+
+    sched = InferenceScheduler(max_batch={LIVE: 8, INTERACTIVE: 8, BATCH: 1},
+                               windows_ms={LIVE: 0, INTERACTIVE: 0, BATCH: 0})
+    replicas = []
+
+    def replicate(model):
+        replicas.append(SlowModel())
+        return replicas[-1]
+
+    sched.configure(workers=2, replicate=replicate)
+    model = SlowModel()
+    job = sched.submit(model, list(range(10)), BATCH)
+    assert job.result(5) == [f"r{i}" for i in range(10)]
+    assert len(replicas) == 1 and replicas[0].calls # Second worker ran on its own copy
+    assert sched.stats()["workers"] == 2
+
+    sched.configure(workers=1)
+    assert sched.submit(model, [42], BATCH).result(5) == ["r42"]
@@ -0,0 +1,39 @@
+import sys
+import os
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+if project_root not in sys.path:
+    sys.path.insert(0, project_root)
+
+import numpy as np
+
+from backend.app.sweep import grid, load_labels, match, pareto, parse_list
+
+
+def test_grid_and_value_lists():
+    assert parse_list("0.15,0.3") == [0.15, 0.3]
+    assert parse_list("on,off", bool) == [True, False]
+    configs = grid({"conf": [0.15, 0.3], "augment": [True, False]})
+    assert len(configs) == 4
+    assert {"conf": 0.3, "augment": False} in configs
+
+
+def test_labels_are_matched_one_to_one(tmp_path):
+    (tmp_path / "images").mkdir()
+    (tmp_path / "labels").mkdir()
+    (tmp_path / "labels" / "a.txt").write_text("0 0.25 0.5 0.2 0.2\n0 0.75 0.5 0.2 0.2\n")
+    truth = load_labels(str(tmp_path / "images" / "a.jpg"), 100, 100)
+    np.testing.assert_allclose(truth[0], [15, 40, 35, 60])
+
+    pred = np.array([[15, 40, 35, 60], [16, 41, 35, 60], [0, 0, 5, 5]], dtype=np.float32)
+    assert match(pred, truth) == 1 # The near-duplicate cannot claim the same sack
+    assert match(pred[:0], truth) == 0
+
+
+def test_pareto_keeps_only_undominated_rows():
+    rows = [
+        {"count_mae": 1.0, "fps": 2.0},
+        {"count_mae": 2.0, "fps": 8.0},
+        {"count_mae": 2.0, "fps": 1.0}, # Dominated by both
+        {"count_mae": None, "fps": 9.0},
+    ]
+    assert [r["pareto"] for r in pareto(rows)] == [True, True, False, False]
@@ -0,0 +1,140 @@
+import sys
+import os
+import threading
+import time
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+if project_root not in sys.path:
+    sys.path.insert(0, project_root)
+
+import pytest
+from fastapi.testclient import TestClient
+
+from backend.app import main
+from backend.app.cancellation import CancelToken
+
+
+class FakeJob:
+    """A video job's frame loop: one should_stop() per frame, finishing like process_video_task."""
+    def __init__(self, task_id, output_path):
+        self.task_id = task_id
+        self.output_path = output_path
+        self.frames = 0
+        self.may_exit = threading.Event()
+        self.may_exit.set()
+        self.token = main.task_tokens[task_id] = CancelToken()
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+
+    def run(self):
+        while not self.token.should_stop():
+            self.frames += 1
+            time.sleep(0.005)
+        self.may_exit.wait(10) # Still cleaning up
+        main.finish_cancelled(self.task_id, self.output_path, "user")
+        main.task_tokens.pop(self.task_id, None)
+
+
+def wait_for(condition, timeout=5.0):
+    deadline = time.perf_counter() + timeout
+    while not condition():
+        if time.perf_counter() > deadline:
+            return False
+        time.sleep(0.01)
+    return True
+
+
+@pytest.fixture
+def client(tmp_path, monkeypatch):
+    monkeypatch.setattr(main, "tasks", {})
+    monkeypatch.setattr(main, "TASK_FILE", str(tmp_path / "tasks.json"))
+    monkeypatch.setattr(main, "DETECTION_DIR", str(tmp_path / "detections"))
+    monkeypatch.setattr(main, "STREAM_DIR", str(tmp_path / "streams"))
+    monkeypatch.setattr(main, "retention", None)
+    os.makedirs(main.DETECTION_DIR)
+    return TestClient(main.app)
+
+
+def start_job(tmp_path, name="clip.mp4"):
+    task_id = f"control-{time.perf_counter_ns()}"
+    main.set_task(task_id, {"status": "processing", "path": str(tmp_path / name), "user_id": "user"})
+    output = os.path.join(main.DETECTION_DIR, f"detected_{task_id}.mp4")
+    open(output, "wb").close() # Partial output
+    return task_id, FakeJob(task_id, output)
+
+
+def test_pause_parks_the_job_and_resume_continues_it(client, tmp_path):
+    task_id, job = start_job(tmp_path)
+    try:
+        assert client.post(f"/tasks/{task_id}/pause").json() == {"task_id": task_id, "status": "paused"}
+        assert main.tasks[task_id]["status"] == "paused"
+        time.sleep(0.05)
+        parked = job.frames
+        time.sleep(0.1)
+        assert job.frames <= parked + 1 # At most the frame in flight
+
+        assert client.post(f"/tasks/{task_id}/resume").json() == {"task_id": task_id, "status": "processing"}
+        assert main.tasks[task_id]["status"] == "processing"
+        assert wait_for(lambda: job.frames > parked + 5)
+    finally:
+        job.token.cancel()
+        job.thread.join(5)
+
+
+def test_cancel_then_delete(client, tmp_path):
+    task_id, job = start_job(tmp_path)
+    job.may_exit.clear()
+    assert client.delete(f"/tasks/{task_id}").json() == {"task_id": task_id, "status": "cancelling"}
+    assert main.tasks[task_id]["status"] == "cancelling"
+    # Asked again while the job is still winding down: same answer, the record stays
+    assert client.delete(f"/tasks/{task_id}").json() == {"task_id": task_id, "status": "cancelling"}
+    assert task_id in main.tasks
+
+    job.may_exit.set()
+    job.thread.join(5)
+    assert main.tasks[task_id]["status"] == "cancelled"
+    assert not os.path.exists(job.output_path)
+    assert client.post(f"/tasks/{task_id}/resume").status_code == 409
+
+    assert client.delete(f"/tasks/{task_id}").json() == {"task_id": task_id, "status": "deleted"}
+    assert task_id not in main.tasks
+    assert client.delete(f"/tasks/{task_id}").status_code == 404
+
+
+def test_pause_needs_a_running_video_job(client, tmp_path):
+    task_id, job = start_job(tmp_path, name="sacks.jpg")
+    try:
+        assert client.post(f"/tasks/{task_id}/pause").status_code == 409 # Images never check for a pause
+        assert not job.token.paused and main.tasks[task_id]["status"] == "processing"
+    finally:
+        job.token.cancel()
+        job.thread.join(5)
+    assert client.post(f"/tasks/{task_id}/pause").status_code == 409 # Finished
+    assert client.post("/tasks/missing/pause").status_code == 409
+
+
+def test_cancel_token_pause_hooks_and_cancel_while_paused():
+    token = CancelToken()
+    calls = []
+    token.on_pause = lambda: calls.append("pause")
+    token.on_resume = lambda: calls.append("resume")
+    assert not token.should_stop()
+
+    token.pause()
+    stopped = []
+    waiter = threading.Thread(target=lambda: stopped.append(token.should_stop()))
+    waiter.start()
+    assert wait_for(lambda: calls == ["pause"])
+    assert waiter.is_alive() # Blocked while paused
+    token.resume()
+    waiter.join(5)
+    assert stopped == [False] and calls == ["pause", "resume"]
+
+    token.pause()
+    waiter = threading.Thread(target=lambda: stopped.append(token.should_stop()))
+    waiter.start()
+    assert wait_for(lambda: calls == ["pause", "resume", "pause"])
+    token.cancel() # Wakes the paused loop, which must not take its slot back
+    waiter.join(5)
+    assert stopped == [False, True] and calls == ["pause", "resume", "pause"]
+    token.pause()
+    assert not token.paused # A cancelled token cannot be parked again
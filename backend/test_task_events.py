@@ -0,0 +1,131 @@
+import sys
+import os
+import asyncio
+import json
+import threading
+import time
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+if project_root not in sys.path:
+    sys.path.insert(0, project_root)
+
+import pytest
+from fastapi.testclient import TestClient
+
+from backend.app import main
+from backend.app.task_events import TaskWatcher
+
+
+def test_versions_bump_and_stay_monotonic():
+    watcher = TaskWatcher()
+    assert watcher.version("t") == 0
+    assert [watcher.bump("t") for _ in range(3)] == [1, 2, 3]
+    watcher.seed("t", 2) # An older persisted version never moves it back
+    assert watcher.version("t") == 3
+    watcher.seed("u", 7)
+    assert watcher.bump("u") == 8
+    watcher.forget("t")
+    assert watcher.version("t") == 0
+
+
+def test_wait_returns_at_once_times_out_or_wakes_on_bump():
+    watcher = TaskWatcher()
+    watcher.bump("t")
+
+    async def scenario():
+        started = time.perf_counter()
+        assert await watcher.wait_for_change("t", 0, timeout=5) == 1 # Already newer
+        assert time.perf_counter() - started < 1
+
+        started = time.perf_counter()
+        assert await watcher.wait_for_change("t", 1, timeout=0.2) == 1 # Nothing changed
+        assert time.perf_counter() - started >= 0.2
+
+        threading.Timer(0.1, watcher.bump, args=("t",)).start() # A worker thread updates the task
+        started = time.perf_counter()
+        assert await watcher.wait_for_change("t", 1, timeout=5) == 2
+        assert time.perf_counter() - started < 2
+        assert watcher.waiters == {}
+
+    asyncio.run(scenario())
+
+
+@pytest.fixture
+def client(tmp_path, monkeypatch):
+    monkeypatch.setattr(main, "tasks", {})
+    monkeypatch.setattr(main, "TASK_FILE", str(tmp_path / "tasks.json"))
+    return TestClient(main.app)
+
+
+def new_task(status="processing"):
+    task_id = f"events-{time.perf_counter_ns()}"
+    main.set_task(task_id, {"status": status, "progress": 0})
+    return task_id, main.tasks[task_id]["version"]
+
+
+def test_long_poll(client):
+    task_id, version = new_task()
+
+    started = time.perf_counter()
+    response = client.get(f"/tasks/{task_id}", params={"since_version": version - 1})
+    assert response.json()["version"] == version
+    assert time.perf_counter() - started < 1
+
+    started = time.perf_counter()
+    response = client.get(f"/tasks/{task_id}", params={"since_version": version, "timeout": 0.2})
+    assert response.json()["version"] == version
+    assert time.perf_counter() - started >= 0.2
+
+    threading.Timer(0.2, main.update_task, args=(task_id,), kwargs={"progress": 50}).start()
+    started = time.perf_counter()
+    response = client.get(f"/tasks/{task_id}", params={"since_version": version, "timeout": 10})
+    assert response.json()["progress"] == 50 and response.json()["version"] == version + 1
+    assert time.perf_counter() - started < 5
+
+    assert client.get("/tasks/missing", params={"since_version": 0}).status_code == 404
+
+
+def read_events(response):
+    events, event = [], {}
+    for line in response.iter_lines():
+        if not line:
+            if event:
+                events.append(event)
+            event = {}
+        elif line.startswith(":"):
+            events.append({"comment": line[1:].strip()})
+        else:
+            field, _, value = line.partition(": ")
+            event[field] = value
+    return events
+
+
+def test_event_stream_sends_each_version_until_terminal(client, monkeypatch):
+    monkeypatch.setattr(main, "SSE_HEARTBEAT", 0.1)
+    task_id, version = new_task()
+
+    def work():
+        time.sleep(0.3)
+        main.update_task(task_id, progress=50)
+        time.sleep(0.3)
+        main.update_task(task_id, status="completed", progress=100)
+
+    threading.Thread(target=work).start()
+    with client.stream("GET", f"/tasks/{task_id}/events") as response:
+        assert response.headers["content-type"].startswith("text/event-stream")
+        events = read_events(response)
+
+    assert events[0] == {"retry": "3000"}
+    updates = [e for e in events if e.get("event") == "task"]
+    assert [int(e["id"]) for e in updates] == [version, version + 1, version + 2]
+    assert [json.loads(e["data"])["progress"] for e in updates] == [0, 50, 100]
+    assert json.loads(updates[-1]["data"])["status"] == "completed" # And the stream ended there
+    assert {"comment": "keep-alive"} in events
+
+    # Reconnecting with Last-Event-ID only replays what is newer
+    task_id, version = new_task(status="failed")
+    main.update_task(task_id, error="boom")
+    with client.stream("GET", f"/tasks/{task_id}/events", headers={"Last-Event-ID": str(version)}) as response:
+        updates = [e for e in read_events(response) if e.get("event") == "task"]
+    assert [int(e["id"]) for e in updates] == [version + 1]
+
+    assert client.get("/tasks/missing/events").status_code == 404
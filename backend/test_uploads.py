@@ -0,0 +1,122 @@
+import sys
+import os
+import asyncio
+import hashlib
+import time
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+if project_root not in sys.path:
+    sys.path.insert(0, project_root)
+
+import pytest
+from fastapi.testclient import TestClient
+
+from backend.app import main
+from backend.app.uploads import ResumableUploadStore, UploadError, save_upload_stream
+
+
+async def as_stream(data, piece=3):
+    for i in range(0, len(data), piece):
+        yield data[i:i + piece]
+
+
+def test_chunks_in_any_order_then_complete(tmp_path):
+    store = ResumableUploadStore(str(tmp_path / "partial"), chunk_size=10)
+    data = bytes(range(25))
+    status = store.init("../../clip.mp4", len(data), mode="zone")
+    upload_id = status["upload_id"]
+    assert status["total_chunks"] == 3
+
+    async def run():
+        await store.write_chunk(upload_id, 2, as_stream(data[20:]))
+        await store.write_chunk(upload_id, 0, as_stream(data[:10]))
+    asyncio.run(run())
+    assert store.status(upload_id)["missing"] == [1]
+
+    with pytest.raises(UploadError):
+        store.complete(upload_id, str(tmp_path))
+
+    asyncio.run(store.write_chunk(upload_id, 1, as_stream(data[10:20]),
+                                  hashlib.sha256(data[10:20]).hexdigest()))
+    path, sha256, size, meta = store.complete(upload_id, str(tmp_path))
+    assert os.path.dirname(path) == str(tmp_path)
+    assert path.endswith("_clip.mp4")
+    assert open(path, "rb").read() == data
+    assert sha256 == hashlib.sha256(data).hexdigest()
+    assert meta["mode"] == "zone"
+
+
+def test_bad_chunk_is_rejected(tmp_path):
+    store = ResumableUploadStore(str(tmp_path), chunk_size=10)
+    upload_id = store.init("clip.mp4", 20)["upload_id"]
+    with pytest.raises(UploadError):
+        asyncio.run(store.write_chunk(upload_id, 0, as_stream(b"short")))
+    with pytest.raises(UploadError):
+        asyncio.run(store.write_chunk(upload_id, 1, as_stream(b"x" * 10), "00" * 32))
+    assert store.status(upload_id)["missing"] == [0, 1]
+
+
+class Upload:
+    """UploadFile stand-in; `fail_after` bytes in, the client goes away."""
+    def __init__(self, data, fail_after=None):
+        self.data = data
+        self.fail_after = fail_after
+        self.read_bytes = 0
+
+    async def read(self, size):
+        if self.fail_after is not None and self.read_bytes >= self.fail_after:
+            raise OSError("client disconnected")
+        chunk, self.data = self.data[:size], self.data[size:]
+        self.read_bytes += len(chunk)
+        return chunk
+
+
+def test_oversized_uploads_are_refused(tmp_path):
+    store = ResumableUploadStore(str(tmp_path / "partial"), chunk_size=10, max_size=100)
+    store.init("clip.mp4", 100)
+    with pytest.raises(UploadError) as e:
+        store.init("clip.mp4", 101)
+    assert e.value.status_code == 413
+    assert len(os.listdir(tmp_path / "partial")) == 1 # Nothing preallocated for the refused one
+
+    dest = str(tmp_path / "upload.mp4")
+    assert asyncio.run(save_upload_stream(Upload(b"x" * 100), dest, chunk_size=30, max_size=100))[1] == 100
+    with pytest.raises(UploadError) as e:
+        asyncio.run(save_upload_stream(Upload(b"x" * 101), dest, chunk_size=30, max_size=100))
+    assert e.value.status_code == 413
+    assert not os.path.exists(dest)
+
+
+def test_init_endpoint_answers_413(tmp_path, monkeypatch):
+    monkeypatch.setattr(main, "resumable_uploads", ResumableUploadStore(str(tmp_path), max_size=100))
+    client = TestClient(main.app)
+    response = client.post("/uploads", data={"filename": "clip.mp4", "size": 10 ** 12, "mode": "zone"})
+    assert response.status_code == 413
+    assert os.listdir(tmp_path) == []
+
+
+def test_interrupted_upload_leaves_no_partial_file(tmp_path):
+    dest = str(tmp_path / "upload.mp4")
+    with pytest.raises(OSError):
+        asyncio.run(save_upload_stream(Upload(b"x" * 100, fail_after=40), dest, chunk_size=20))
+    assert not os.path.exists(dest)
+
+
+def test_abandoned_uploads_expire_in_the_periodic_sweep(tmp_path, monkeypatch):
+    store = ResumableUploadStore(str(tmp_path), ttl=3600)
+    old = store.init("old.mp4", 10)["upload_id"]
+    fresh = store.init("fresh.mp4", 10)["upload_id"]
+    stamp = time.time() - 7200
+    os.utime(os.path.join(str(tmp_path), old), (stamp, stamp))
+    monkeypatch.setattr(main, "resumable_uploads", store)
+    monkeypatch.setattr(main, "retention", None)
+    monkeypatch.setattr(main, "RETENTION_INTERVAL_SECONDS", 0.01)
+
+    async def run():
+        sweep = asyncio.create_task(main.enforce_retention_periodically())
+        for _ in range(200):
+            await asyncio.sleep(0.01)
+            if len(os.listdir(str(tmp_path))) == 1:
+                break
+        sweep.cancel()
+    asyncio.run(run())
+    assert os.listdir(str(tmp_path)) == [fresh]
@@ -1,4 +1,5 @@
 import { requireAuth, signOut } from './auth.js';
+import { ENDPOINTS, getApiUrl } from './config.js';
 
 // Protect Route & Get User ID
 let userId = null;
@@ -486,6 +487,43 @@ function updateProductionChart(data, range = 'daily') {
         values = dailyCounts;
     }
 
+    drawProductionChart(ctx, labels, values, range);
+
+    // Prefer the server-side count history (covers live cameras and past sessions)
+    fetchCountSeries(range).then(series => {
+        if (series) drawProductionChart(ctx, series.labels, series.values, range);
+    });
+}
+
+// Hourly (last 12h) or daily (last 7 days) totals from /metrics/counts
+async function fetchCountSeries(range) {
+    const now = Math.floor(Date.now() / 1000);
+    const step = range === 'daily' ? 3600 : 86400;
+    const from = now - (range === 'daily' ? 11 : 6) * step;
+    const params = new URLSearchParams({ from, to: now + 1, step });
+    if (userId) params.set('user', userId);
+
+    try {
+        const response = await fetch(getApiUrl(`${ENDPOINTS.METRICS_COUNTS}?${params}`));
+        if (!response.ok) return null;
+        const result = await response.json();
+        const values = Object.values(result.series)[0] || [];
+        if (!values.some(v => v > 0)) return null; // Nothing recorded yet: keep the local view
+
+        const labels = result.timestamps.map(ts => {
+            const date = new Date(ts * 1000);
+            return range === 'daily'
+                ? `${date.getHours()}:00`
+                : date.toLocaleDateString('en-US', { weekday: 'short' });
+        });
+        return { labels, values };
+    } catch (error) {
+        console.warn('Count history unavailable:', error);
+        return null;
+    }
+}
+
+function drawProductionChart(ctx, labels, values, range) {
     if (productionChartInstance) productionChartInstance.destroy();
 
     // Create Gradient
@@ -18,8 +18,10 @@ export const ENDPOINTS = {
     STREAM: '/stream',
     RESET: '/reset',
     WS: '/ws',
+    PREVIEW: '/ws/preview', // Append /:taskId (binary JPEG frames)
     CAMERA_ON: '/camera/on',
-    CAMERA_OFF: '/camera/off'
+    CAMERA_OFF: '/camera/off',
+    METRICS_COUNTS: '/metrics/counts' // ?from=&to=&step= (unix seconds)
 };
 
 // Supabase Configuration
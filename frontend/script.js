@@ -123,6 +123,7 @@ async function handleUpload(file) {
         if (response.ok) {
             uploadItem.querySelector('.status-text').textContent = 'Processing...';
             uploadItem.querySelector('.fill').style.width = '50%';
+            subscribePreview(data.task_id);
             pollTaskStatus(data.task_id, uploadItem);
         } else {
             throw new Error(data.detail || 'Upload failed');
@@ -412,6 +413,35 @@ const connectWebSocket = () => {
     };
 };
 
+// Binary preview channel: 8-byte header (uint32 frame_idx, uint32 count) + JPEG
+let previewSocket = null;
+let previewObjectUrl = null;
+const subscribePreview = (taskId) => {
+    if (previewSocket) previewSocket.close();
+    previewSocket = new WebSocket(`${getWsUrl(ENDPOINTS.PREVIEW)}/${taskId}`);
+    previewSocket.binaryType = 'arraybuffer';
+
+    previewSocket.onmessage = (event) => {
+        if (!(event.data instanceof ArrayBuffer)) return;
+        const view = new DataView(event.data);
+        const count = view.getUint32(4);
+
+        const cameraFeed = document.getElementById('camera-feed');
+        const cameraPlaceholder = document.getElementById('camera-placeholder');
+        if (cameraFeed && cameraPlaceholder) {
+            const blob = new Blob([event.data.slice(8)], { type: 'image/jpeg' });
+            if (previewObjectUrl) URL.revokeObjectURL(previewObjectUrl);
+            previewObjectUrl = URL.createObjectURL(blob);
+            cameraFeed.src = previewObjectUrl;
+            cameraFeed.style.display = 'block';
+            cameraPlaceholder.style.display = 'none';
+        }
+
+        // Count in a preview frame is the LIVE ROI Occupancy (Sacks in ROI)
+        updateROIStatus(count);
+    };
+};
+
 // Update the "Total Bags" card (Session Cumulative)
 function updateTotalCount(newCount) {
     const countElement = document.getElementById('current-count');